@@ -0,0 +1,501 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""On-disk caches shared between openstack command invocations"""
+
+import contextlib
+import datetime
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+LOG = logging.getLogger(__name__)
+
+AUTH_CACHE_FILE = os.path.join(
+    os.path.expanduser('~'),
+    '.openstack-auth-cache.json',
+)
+
+# Tokens expiring within this many seconds are not handed out of the cache
+STALE_TOKEN_DURATION = 300
+
+RESOLUTION_CACHE_FILE = os.path.join(
+    os.path.expanduser('~'),
+    '.openstack-resolution-cache.json',
+)
+DEFAULT_RESOLUTION_TTL = 300
+DEFAULT_RESOLUTION_ENTRIES = 1000
+
+HTTP_CACHE_DIR = os.path.join(
+    os.path.expanduser('~'),
+    '.openstack-http-cache',
+)
+# Total size of the cached response bodies, in bytes
+DEFAULT_HTTP_CACHE_SIZE = 64 * 1024 * 1024
+
+# Seconds between two rewrites of the last use time of an entry, the
+# cache file is only read by lookups in between
+LRU_RESOLUTION = 1.0
+
+HASH_INDEX_FILE = os.path.join(
+    os.path.expanduser('~'),
+    '.openstack-hash-index.sqlite',
+)
+
+
+class FileCache(object):
+    """A JSON dict stored in a file that is safe for concurrent processes
+
+    Readers take a shared lock and writers an exclusive lock on a separate
+    lock file.  Updates are written to a temporary file and renamed into
+    place so a reader never sees a partially written cache.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive=False):
+        dirname = os.path.dirname(self.path)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname, 0o700)
+        fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            # A missing or corrupt cache is simply an empty one
+            return {}
+
+    def _write(self, data):
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(self.path) or '.',
+            prefix='.tmp-',
+        )
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.rename(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, key):
+        """Return the cached value for key or None"""
+        with self._locked():
+            return self._read().get(key)
+
+    def update(self, func):
+        """Call func with the cache contents and store the result
+
+        :param func: a callable that modifies the cache dict in place
+        """
+        with self._locked(exclusive=True):
+            data = self._read()
+            func(data)
+            self._write(data)
+
+    def delete(self, key):
+        """Remove key from the cache"""
+        self.update(lambda data: data.pop(key, None))
+
+    def _touch(self, key, entry, now):
+        """Record that entry was used, unless it was just used"""
+        if now - entry.get('used', 0) < LRU_RESOLUTION:
+            return
+
+        def _used(data):
+            if key in data:
+                data[key]['used'] = now
+        self.update(_used)
+
+
+class AuthCache(FileCache):
+    """Cache of Identity auth_ref data, including the service catalog
+
+    Entries are keyed by auth URL, user, project, region and a digest of
+    the password, see make_key().
+    """
+
+    def __init__(self, path=AUTH_CACHE_FILE,
+                 stale_duration=STALE_TOKEN_DURATION):
+        super(AuthCache, self).__init__(path)
+        self.stale_duration = stale_duration
+
+    @staticmethod
+    def make_key(auth_url, username, project, region_name, secret=None):
+        """Return the cache key for a set of credentials
+
+        secret, the password or token, is part of the key so that a cached
+        token is only used with the credentials it was issued for.
+        """
+        parts = [auth_url, username, project, region_name]
+        if secret:
+            parts.append(
+                hashlib.sha256(secret.encode('utf-8')).hexdigest())
+        key = '\n'.join([p or '' for p in parts])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _is_stale(self, auth_ref):
+        try:
+            return auth_ref.will_expire_soon(self.stale_duration)
+        except Exception:
+            # No parsable expiry, don't trust it
+            return True
+
+    def get(self, key):
+        """Return a valid auth_ref for key or None"""
+        # Deferred so that commands not needing auth don't load keystoneclient
+        from keystoneclient import access
+
+        data = super(AuthCache, self).get(key)
+        if not data:
+            return None
+        try:
+            auth_ref = access.AccessInfo.factory(**data)
+        except Exception as e:
+            LOG.debug('discarding unusable cached token: %s', e)
+            return None
+        if self._is_stale(auth_ref):
+            LOG.debug('cached token is expired or about to expire')
+            return None
+        return auth_ref
+
+    def set(self, key, auth_ref):
+        """Store auth_ref for key, dropping any expired tokens"""
+        def _store(data):
+            now = datetime.datetime.utcnow().isoformat()
+            for k in list(data.keys()):
+                expires = data[k].get(
+                    'expires_at',
+                    data[k].get('token', {}).get('expires', ''),
+                )
+                # ISO 8601 UTC timestamps sort as strings
+                if expires[:19] < now[:19]:
+                    del data[k]
+            data[key] = dict(auth_ref)
+        self.update(_store)
+
+
+class ResolutionCache(FileCache):
+    """Cache of resource IDs by name
+
+    Entries are keyed by cloud, project, resource type and name, see
+    make_key(), and expire ttl seconds after they were stored.  The least
+    recently used entries are evicted once there are more than
+    max_entries.
+    """
+
+    def __init__(self, path=RESOLUTION_CACHE_FILE,
+                 ttl=DEFAULT_RESOLUTION_TTL,
+                 max_entries=DEFAULT_RESOLUTION_ENTRIES):
+        super(ResolutionCache, self).__init__(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    @staticmethod
+    def make_key(scope, resource_type, name):
+        """Return the cache key for a name
+
+        :param scope: sequence identifying the cloud and project
+        """
+        parts = list(scope) + [resource_type, name]
+        key = '\n'.join([p or '' for p in parts])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached ID for key or None"""
+        now = time.time()
+        entry = super(ResolutionCache, self).get(key)
+        if not entry or entry['time'] + self.ttl <= now:
+            return None
+        self._touch(key, entry, now)
+        return entry['id']
+
+    def set(self, key, resource_type, resource_id):
+        """Store the ID for key, dropping expired and excess entries"""
+        def _store(data):
+            now = time.time()
+            for k in list(data.keys()):
+                if data[k]['time'] + self.ttl <= now:
+                    del data[k]
+            data[key] = {
+                'type': resource_type,
+                'id': resource_id,
+                'time': now,
+                'used': now,
+            }
+            excess = len(data) - self.max_entries
+            if excess > 0:
+                lru = sorted(data.keys(), key=lambda k: data[k]['used'])
+                for k in lru[:excess]:
+                    del data[k]
+        self.update(_store)
+
+    def invalidate(self, resource_type, resource_id):
+        """Drop every name cached for a resource"""
+        def _drop(data):
+            for k in list(data.keys()):
+                if (data[k]['type'] == resource_type
+                        and data[k]['id'] == resource_id):
+                    del data[k]
+        self.update(_drop)
+
+
+class HTTPCache(FileCache):
+    """Cache of GET responses for conditional requests
+
+    The index of entries is a FileCache in the cache directory, the body
+    of each entry is stored in a file of its own.  Entries are keyed by
+    scope and URL, see make_key(), and remember the ETag and Last-Modified
+    validators of the response.  Entries younger than max_age seconds are
+    used without asking the server.  The least recently used entries are
+    evicted once the bodies take more than max_size bytes.
+
+    Decoded JSON bodies are kept in memory, so a response that is still
+    valid is only parsed once per process.
+    """
+
+    def __init__(self, path=HTTP_CACHE_DIR, scope=None, max_age=0,
+                 max_size=DEFAULT_HTTP_CACHE_SIZE):
+        super(HTTPCache, self).__init__(os.path.join(path, 'index.json'))
+        self.dir = path
+        self.scope = scope
+        self.max_age = max_age
+        self.max_size = max_size
+        self._decoded = {}
+
+    @staticmethod
+    def make_key(scope, url):
+        """Return the cache key for a URL
+
+        :param scope: sequence identifying the cloud, project and user
+        """
+        parts = list(scope) + [url]
+        key = '\n'.join([p or '' for p in parts])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.dir, key)
+
+    def get(self, key):
+        """Return the entry for key or None"""
+        entry = super(HTTPCache, self).get(key)
+        if entry:
+            self._touch(key, entry, time.time())
+        return entry
+
+    def is_fresh(self, entry):
+        """Whether entry may be used without revalidating it"""
+        return entry['time'] + self.max_age > time.time()
+
+    @staticmethod
+    def validators(entry):
+        """Return the headers that make a request conditional on entry"""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read_body(self, key):
+        with open(self._body_path(key), 'rb') as f:
+            return f.read()
+
+    def decode(self, key, entry, body=None):
+        """Return the JSON decoded body of entry
+
+        The top level list or dict is copied, callers are free to add or
+        remove items without changing the cached form.
+
+        :param body: the body of entry if it has been read already
+        """
+        decoded = self._decoded.get(key)
+        if decoded is None or decoded[0] != entry['version']:
+            if body is None:
+                body = self.read_body(key)
+            if isinstance(body, bytes):
+                body = body.decode('utf-8')
+            decoded = (entry['version'], json.loads(body))
+            self._decoded[key] = decoded
+        value = decoded[1]
+        if isinstance(value, dict):
+            return dict(value)
+        if isinstance(value, list):
+            return list(value)
+        return value
+
+    def set(self, key, url, status, headers, body):
+        """Store a response, dropping the least recently used entries
+
+        Responses without validators are only stored if they may be
+        used without revalidating them, see max_age.
+
+        :returns: the stored entry or None
+        """
+        etag = headers.get('etag')
+        last_modified = headers.get('last-modified')
+        if not (etag or last_modified or self.max_age > 0):
+            return None
+        if 'no-store' in headers.get('cache-control', ''):
+            return None
+        if len(body) > self.max_size:
+            return None
+
+        if not os.path.isdir(self.dir):
+            os.makedirs(self.dir, 0o700)
+        fd, tmp_path = tempfile.mkstemp(dir=self.dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.rename(tmp_path, self._body_path(key))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+        now = time.time()
+        entry = {
+            'url': url,
+            'status': status,
+            'headers': {'content-type': headers.get('content-type', '')},
+            'etag': etag,
+            'last_modified': last_modified,
+            'version': hashlib.sha1(body).hexdigest(),
+            'size': len(body),
+            'time': now,
+            'used': now,
+        }
+
+        def _store(data):
+            data[key] = entry
+            size = sum(e['size'] for e in data.values())
+            for k in sorted(data.keys(), key=lambda k: data[k]['used']):
+                if size <= self.max_size:
+                    break
+                size -= data[k]['size']
+                self._drop(data, k)
+        self.update(_store)
+        return entry
+
+    def refresh(self, key):
+        """Restart the max_age of an entry the server said is unchanged"""
+        def _refresh(data):
+            if key in data:
+                data[key]['time'] = time.time()
+        self.update(_refresh)
+
+    def _drop(self, data, key):
+        del data[key]
+        self._decoded.pop(key, None)
+        try:
+            os.unlink(self._body_path(key))
+        except OSError:
+            pass
+
+    def invalidate(self, url):
+        """Drop the entries of url and of the listing that holds it"""
+        base = url.split('?')[0].rstrip('/')
+        parent = base.rsplit('/', 1)[0]
+
+        def _invalidate(data):
+            for k in list(data.keys()):
+                if data[k]['url'].split('?')[0].rstrip('/') in (base, parent):
+                    self._drop(data, k)
+        self.update(_invalidate)
+
+
+class HashIndex(object):
+    """SQLite index of the MD5 of local files
+
+    Entries are keyed by the absolute path of a file and are only valid
+    while its size and modification time are unchanged.  They also hold
+    the ETag of the object the file was last uploaded to, which is not
+    the MD5 of the data for large objects.
+
+    An index may be shared by threads, changes are committed in batches
+    and on close().
+    """
+
+    # Changes made before they are committed
+    BATCH_SIZE = 100
+
+    def __init__(self, path=HASH_INDEX_FILE):
+        self.path = path
+        self._db = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._db is None:
+            dirname = os.path.dirname(self.path)
+            if dirname and not os.path.isdir(dirname):
+                os.makedirs(dirname, 0o700)
+            # Paths of the user's files are not for other users to read
+            os.close(os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600))
+            self._db = sqlite3.connect(
+                self.path, timeout=30, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS files ('
+                'path TEXT PRIMARY KEY, size INTEGER, mtime REAL, '
+                'md5 TEXT, etag TEXT)'
+            )
+        return self._db
+
+    def get(self, path, size, mtime):
+        """Return the (MD5, ETag) of a file, each None if unknown"""
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT md5, etag FROM files '
+                'WHERE path = ? AND size = ? AND mtime = ?',
+                (os.path.abspath(path), size, mtime),
+            ).fetchone()
+        return tuple(row) if row else (None, None)
+
+    def set(self, path, size, mtime, md5, etag=None):
+        """Store the MD5 and ETag of a file"""
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)',
+                (os.path.abspath(path), size, mtime, md5, etag),
+            )
+            self._pending += 1
+            if self._pending >= self.BATCH_SIZE:
+                db.commit()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.commit()
+                self._db.close()
+                self._db = None
+                self._pending = 0
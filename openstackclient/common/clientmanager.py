@@ -16,41 +16,57 @@
 """Manage access to the clients, including authenticating when needed."""
 
 import logging
+import six
+import threading
 
-from openstackclient.compute import client as compute_client
-from openstackclient.identity import client as identity_client
-from openstackclient.image import client as image_client
-from openstackclient.object import client as object_client
-from openstackclient.volume import client as volume_client
+from openstackclient.common import restapi
+from openstackclient.common import timing
+from openstackclient.common import utils
 
 
 LOG = logging.getLogger(__name__)
 
 
 class ClientCache(object):
-    """Descriptor class for caching created client handles."""
+    """Descriptor class for caching created client handles.
+
+    The factory may be given as a dotted path; it is imported on first
+    access so that only the client libraries actually used get loaded.
+    Handles are cached per instance so that ClientManagers for different
+    credentials never share clients.  Creation is serialized so that
+    commands running in threads get the same handle.
+    """
     def __init__(self, factory):
         self.factory = factory
-        self._handle = None
+        self._lock = threading.Lock()
 
     def __get__(self, instance, owner):
-        # Tell the ClientManager to login to keystone
-        if self._handle is None:
-            self._handle = self.factory(instance)
-        return self._handle
+        if instance is None:
+            return self
+        handles = instance.__dict__.setdefault('_client_handles', {})
+        if self not in handles:
+            with self._lock:
+                # Tell the ClientManager to login to keystone
+                if self not in handles:
+                    with timing.span('make_client', factory=self.factory):
+                        if isinstance(self.factory, six.string_types):
+                            self.factory = utils.import_class(self.factory)
+                        handles[self] = self.factory(instance)
+        return handles[self]
 
 
 class ClientManager(object):
     """Manages access to API clients, including authentication."""
-    compute = ClientCache(compute_client.make_client)
-    identity = ClientCache(identity_client.make_client)
-    image = ClientCache(image_client.make_client)
-    object = ClientCache(object_client.make_client)
-    volume = ClientCache(volume_client.make_client)
+    compute = ClientCache('openstackclient.compute.client.make_client')
+    identity = ClientCache('openstackclient.identity.client.make_client')
+    image = ClientCache('openstackclient.image.client.make_client')
+    object = ClientCache('openstackclient.object.client.make_client')
+    volume = ClientCache('openstackclient.volume.client.make_client')
 
     def __init__(self, token=None, url=None, auth_url=None, project_name=None,
                  project_id=None, username=None, password=None,
-                 region_name=None, api_version=None):
+                 region_name=None, api_version=None, auth_cache=None,
+                 http_adapter=None):
         self._token = token
         self._url = url
         self._auth_url = auth_url
@@ -62,23 +78,73 @@ class ClientManager(object):
         self._api_version = api_version
         self._service_catalog = None
 
+        # The connection pools shared by all of the clients
+        self.http_adapter = http_adapter or restapi.PooledHTTPAdapter()
+
         self.auth_ref = None
+        # Set while the token in use came from auth_cache
+        self._auth_cache = None
+        self._cache_key = None
 
         if not self._url:
+            if auth_cache:
+                cache_key = auth_cache.make_key(
+                    self._auth_url,
+                    self._username,
+                    self._project_id or self._project_name,
+                    self._region_name,
+                    self._password or self._token,
+                )
+                self.auth_ref = auth_cache.get(cache_key)
+                if self.auth_ref:
+                    LOG.debug('using cached token')
+                    self._auth_cache = auth_cache
+                    self._cache_key = cache_key
+
+            if not self.auth_ref:
+                # Authenticate, the identity client populates auth_ref
+                with timing.span('authenticate', auth_url=self._auth_url):
+                    self.auth_ref = self.identity.auth_ref
+                if auth_cache:
+                    auth_cache.set(cache_key, self.auth_ref)
+
             # Populate other password flow attributes
-            self.auth_ref = self.identity.auth_ref
-            self._token = self.identity.auth_token
-            self._service_catalog = self.identity.service_catalog
+            self._token = self.auth_ref.auth_token
+            self._service_catalog = self.auth_ref.service_catalog
 
         return
 
+    def drop_cached_token(self):
+        """Remove the token in use from the auth cache
+
+        Returns True if the token came from the cache, i.e. if
+        authenticating again may give a token that works.
+        """
+        if self._cache_key is None:
+            return False
+        LOG.debug('dropping rejected cached token')
+        self._auth_cache.delete(self._cache_key)
+        self._auth_cache = None
+        self._cache_key = None
+        return True
+
+    def create_http_session(self):
+        """Return a requests.Session using the shared connection pools"""
+        return restapi.create_session(self.http_adapter)
+
     def get_endpoint_for_service_type(self, service_type):
         """Return the endpoint URL for the service type."""
         # See if we are using password flow auth, i.e. we have a
         # service catalog to select endpoints from
         if self._service_catalog:
-            endpoint = self._service_catalog.url_for(
-                service_type=service_type)
+            if self._region_name:
+                endpoint = self._service_catalog.url_for(
+                    service_type=service_type,
+                    attr='region',
+                    filter_value=self._region_name)
+            else:
+                endpoint = self._service_catalog.url_for(
+                    service_type=service_type)
         else:
             # Hope we were given the correct URL.
             endpoint = self._url
@@ -16,22 +16,167 @@
 """Modify Cliff's CommandManager"""
 
 import logging
+import os
 import pkg_resources
+import sys
 
 import cliff.commandmanager
 
+from openstackclient.common import cache
+
 
 LOG = logging.getLogger(__name__)
 
+COMMAND_INDEX_FILE = os.path.join(
+    os.path.expanduser('~'),
+    '.openstack-command-index.json',
+)
+# Bump this when the index layout changes
+COMMAND_INDEX_VERSION = 1
+# Entry point groups collected into the index
+COMMAND_INDEX_PREFIX = 'openstack.'
+
+
+class IndexedEntryPoint(object):
+    """A command entry point read from the command index
+
+    Looks enough like a pkg_resources.EntryPoint for cliff, which only
+    calls load().
+    """
+
+    def __init__(self, name, target):
+        self.name = name
+        self.module_name, _sep, attrs = target.partition(':')
+        self.attrs = attrs.split('.')
+
+    def load(self):
+        __import__(self.module_name)
+        obj = sys.modules[self.module_name]
+        for attr in self.attrs:
+            obj = getattr(obj, attr)
+        return obj
+
+    def __repr__(self):
+        return 'IndexedEntryPoint(%s = %s:%s)' % (
+            self.name, self.module_name, '.'.join(self.attrs))
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class CommandIndex(cache.FileCache):
+    """A generated map of command names to classes for all openstack.* groups
+
+    Scanning entry points with pkg_resources reads the metadata of every
+    installed distribution.  The index records the result of one scan
+    together with the modification times of everything the scan depended
+    on: the sys.path entries (installing or removing a distribution
+    changes its directory) and the metadata of the distributions that
+    provide commands.  Any change invalidates the index and the next
+    command rebuilds it.
+
+    The index file holds one entry per Python installation (sys.prefix).
+    """
+
+    def __init__(self, path=None):
+        super(CommandIndex, self).__init__(path or COMMAND_INDEX_FILE)
+        self._groups = None
+
+    def _is_valid(self, entry):
+        if not entry or entry.get('version') != COMMAND_INDEX_VERSION:
+            return False
+        if entry.get('path') != sys.path:
+            return False
+        for path, mtime in entry.get('sources', {}).items():
+            if _mtime(path) != mtime:
+                return False
+        return True
+
+    def scan(self):
+        """Build a new index entry from the installed distributions"""
+        groups = {}
+        sources = {}
+        for path in sys.path:
+            sources[path] = _mtime(path)
+        for dist in pkg_resources.working_set:
+            contributed = False
+            for group, eps in dist.get_entry_map().items():
+                if not group.startswith(COMMAND_INDEX_PREFIX):
+                    continue
+                contributed = True
+                index = groups.setdefault(group, {})
+                for ep in eps.values():
+                    index[ep.name] = '%s:%s' % (
+                        ep.module_name, '.'.join(ep.attrs))
+            egg_info = getattr(dist, 'egg_info', None)
+            if contributed and egg_info:
+                sources[egg_info] = _mtime(egg_info)
+                entry_points = os.path.join(egg_info, 'entry_points.txt')
+                sources[entry_points] = _mtime(entry_points)
+        return {
+            'version': COMMAND_INDEX_VERSION,
+            'path': sys.path,
+            'sources': sources,
+            'groups': groups,
+        }
+
+    def load(self):
+        """Return the indexed groups, rebuilding the index if it is stale"""
+        if self._groups is not None:
+            return self._groups
+
+        entry = self.get(sys.prefix)
+        if not self._is_valid(entry):
+            LOG.debug('rebuilding command index %s', self.path)
+            entry = self.scan()
+            try:
+                self.update(lambda data: data.update({sys.prefix: entry}))
+            except (IOError, OSError) as e:
+                LOG.debug('unable to save command index: %s', e)
+        self._groups = entry['groups']
+        return self._groups
+
+    def iter_entry_points(self, group):
+        """Return the entry points for a group as IndexedEntryPoints"""
+        return [
+            IndexedEntryPoint(name, target)
+            for name, target in self.load().get(group, {}).items()
+        ]
+
 
 class CommandManager(cliff.commandmanager.CommandManager):
     """Alters Cliff's default CommandManager behaviour to load additiona
        command groups after initialization.
+
+       Groups under openstack.* are looked up in a CommandIndex rather than
+       by scanning the installed distributions for every group.
     """
+    def __init__(self, namespace, convert_underscores=True,
+                 command_index=None):
+        if command_index is None:
+            command_index = CommandIndex()
+        self.command_index = command_index
+        super(CommandManager, self).__init__(
+            namespace,
+            convert_underscores=convert_underscores,
+        )
+
+    def _iter_entry_points(self, group):
+        if self.command_index and group.startswith(COMMAND_INDEX_PREFIX):
+            try:
+                return self.command_index.iter_entry_points(group)
+            except Exception as e:
+                LOG.debug('command index unavailable: %s', e)
+        return pkg_resources.iter_entry_points(group)
+
     def _load_commands(self, group=None):
         if not group:
             group = self.namespace
-        for ep in pkg_resources.iter_entry_points(group):
+        for ep in self._iter_entry_points(group):
             LOG.debug('found command %r' % ep.name)
             self.commands[ep.name.replace('_', ' ')] = ep
         return
@@ -0,0 +1,402 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Long running command daemon and its argv forwarding front end
+
+'openstack daemon' keeps an interpreter with loaded command classes and
+authenticated ClientManagers alive behind a UNIX socket that only its
+owner may connect to.  'openstack-remote' forwards its argv, the OS_*
+environment and any piped stdin to the daemon and streams the command's
+output and exit code back, falling back to running the command itself
+when no daemon is listening.
+
+The front end is deliberately limited to standard library imports.
+"""
+
+import json
+import logging
+import os
+import socket
+import stat
+import struct
+import sys
+
+from cliff import command
+
+
+LOG = logging.getLogger(__name__)
+
+DAEMON_SOCKET = os.path.join(
+    os.path.expanduser('~'),
+    '.openstack-daemon.sock',
+)
+DEFAULT_IDLE_TIMEOUT = 600
+
+# Forwarded environment variables
+ENV_PREFIX = 'OS_'
+
+# Linux value, not exported by the socket module on Python 2
+SO_PEERCRED = getattr(socket, 'SO_PEERCRED', 17)
+
+_HEADER = struct.Struct('!I')
+
+
+def send_frame(sock, message):
+    """Send a length prefixed JSON message"""
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError('connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def recv_frame(sock):
+    """Receive a message sent with send_frame()"""
+    size = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))[0]
+    return json.loads(_recv_exactly(sock, size).decode('utf-8'))
+
+
+def _text(data):
+    if isinstance(data, bytes):
+        return data.decode('utf-8', 'replace')
+    return data
+
+
+class FrameWriter(object):
+    """A file-like object that sends everything written as frames"""
+
+    def __init__(self, sock, name):
+        self.sock = sock
+        self.name = name
+
+    def write(self, data):
+        if data:
+            send_frame(self.sock, {self.name: _text(data)})
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+class Daemon(object):
+    """Run forwarded commands one at a time in fresh shells
+
+    Every command gets a new OpenStackShell so that no option state leaks
+    between commands, but all shells share the daemon's authenticated
+    ClientManagers.  Those are keyed by the complete set of credentials,
+    so commands using different users or projects never share a token.
+    """
+
+    def __init__(self, path=DAEMON_SOCKET, idle_timeout=DEFAULT_IDLE_TIMEOUT,
+                 app_factory=None):
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self.app_factory = app_factory or self._make_shell
+        self.client_managers = {}
+        self.sock = None
+
+    def _make_shell(self, stdin, stdout, stderr):
+        # Deferred to keep the front end free of the client libraries
+        from openstackclient import shell
+
+        app = shell.OpenStackShell(stdin=stdin, stdout=stdout, stderr=stderr)
+        app.client_managers = self.client_managers
+        # cliff takes the name from the daemon's own command line
+        app.NAME = 'openstack'
+        return app
+
+    def bind(self):
+        """Create the listening socket, replacing a stale one"""
+        if os.path.exists(self.path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except socket.error:
+                os.unlink(self.path)
+            else:
+                raise RuntimeError(
+                    'a daemon is already listening on %s' % self.path)
+            finally:
+                probe.close()
+
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old_umask = os.umask(0o077)
+        try:
+            self.sock.bind(self.path)
+        finally:
+            os.umask(old_umask)
+        self.sock.listen(5)
+        if self.idle_timeout:
+            self.sock.settimeout(self.idle_timeout)
+
+    def preload(self):
+        """Import every command class up front"""
+        from openstackclient.common import commandmanager
+
+        index = commandmanager.CommandIndex()
+        for group in index.load():
+            for ep in index.iter_entry_points(group):
+                try:
+                    ep.load()
+                except Exception as e:
+                    LOG.debug('unable to load %r: %s', ep, e)
+
+    def serve_forever(self):
+        """Handle connections until idle for idle_timeout seconds"""
+        if self.sock is None:
+            self.bind()
+        LOG.info('listening on %s', self.path)
+        try:
+            while True:
+                try:
+                    conn, _addr = self.sock.accept()
+                except socket.timeout:
+                    LOG.info('idle for %d seconds, exiting', self.idle_timeout)
+                    return
+                conn.settimeout(None)
+                try:
+                    self.handle(conn)
+                except Exception as e:
+                    LOG.debug('request failed: %s', e)
+                finally:
+                    conn.close()
+        finally:
+            self.close()
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def _check_peer(self, conn):
+        try:
+            creds = conn.getsockopt(
+                socket.SOL_SOCKET, SO_PEERCRED, struct.calcsize('3i'))
+        except (socket.error, AttributeError):
+            # No peer credentials here, rely on the socket file mode
+            return True
+        _pid, uid, _gid = struct.unpack('3i', creds)
+        return uid == os.getuid()
+
+    def handle(self, conn):
+        """Run the command sent on conn"""
+        if not self._check_peer(conn):
+            LOG.warning('rejected connection from another user')
+            return
+        request = recv_frame(conn)
+        stdout = FrameWriter(conn, 'stdout')
+        stderr = FrameWriter(conn, 'stderr')
+        code = self.run_command(
+            request.get('argv', []),
+            request.get('env', {}),
+            request.get('stdin', ''),
+            stdout,
+            stderr,
+            cwd=request.get('cwd'),
+        )
+        send_frame(conn, {'exit': code})
+
+    def run_command(self, argv, env, stdin_data, stdout, stderr, cwd=None):
+        """Run one command with the caller's environment and streams
+
+        Relative paths are resolved against cwd, the caller's working
+        directory, when it is given.
+        """
+        # Deferred, only the daemon needs it
+        import six
+
+        if six.PY2:
+            # Native strings, as on a real command line
+            argv = [a.encode('utf-8') for a in argv]
+            env = dict(
+                (k.encode('utf-8'), v.encode('utf-8')) for k, v in env.items()
+            )
+            if cwd is not None:
+                cwd = cwd.encode('utf-8')
+
+        stdin = six.StringIO(stdin_data)
+        saved_environ = dict(os.environ)
+        saved_argv = sys.argv
+        saved_streams = sys.stdin, sys.stdout, sys.stderr
+        root_logger = logging.getLogger('')
+        saved_handlers = root_logger.handlers[:]
+        saved_level = root_logger.level
+        saved_cwd = os.getcwd()
+
+        for key in list(os.environ.keys()):
+            if key.startswith(ENV_PREFIX):
+                del os.environ[key]
+        os.environ.update(env)
+        # argparse takes the program name from sys.argv
+        sys.argv = ['openstack'] + list(argv)
+        sys.stdin, sys.stdout, sys.stderr = stdin, stdout, stderr
+        # The shell sets up its own logging to the caller's stderr
+        root_logger.handlers[:] = []
+        try:
+            if cwd is not None:
+                os.chdir(cwd)
+            app = self.app_factory(stdin, stdout, stderr)
+            return app.run(argv)
+        except SystemExit as e:
+            # argparse exits on bad arguments and --help
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            return 1
+        except Exception as e:
+            stderr.write('%s\n' % e)
+            return 1
+        finally:
+            sys.stdin, sys.stdout, sys.stderr = saved_streams
+            sys.argv = saved_argv
+            os.environ.clear()
+            os.environ.update(saved_environ)
+            root_logger.handlers[:] = saved_handlers
+            root_logger.setLevel(saved_level)
+            os.chdir(saved_cwd)
+
+
+class RunDaemon(command.Command):
+    """Serve commands forwarded by openstack-remote"""
+
+    auth_required = False
+    log = logging.getLogger(__name__ + '.RunDaemon')
+
+    def get_parser(self, prog_name):
+        parser = super(RunDaemon, self).get_parser(prog_name)
+        parser.add_argument(
+            '--socket',
+            metavar='<path>',
+            default=os.environ.get('OS_DAEMON_SOCKET', DAEMON_SOCKET),
+            help='UNIX socket to listen on (Env: OS_DAEMON_SOCKET)',
+        )
+        parser.add_argument(
+            '--idle-timeout',
+            metavar='<seconds>',
+            type=int,
+            default=DEFAULT_IDLE_TIMEOUT,
+            help='Exit after this many seconds without a command, '
+                 '0 to never exit (default: %d)' % DEFAULT_IDLE_TIMEOUT,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        self.log.debug('take_action(%s)' % parsed_args)
+
+        daemon = Daemon(parsed_args.socket, parsed_args.idle_timeout)
+        daemon.client_managers = self.app.client_managers
+        daemon.bind()
+        daemon.preload()
+        daemon.serve_forever()
+
+
+def _read_stdin():
+    """Return piped or redirected stdin, never block on a terminal"""
+    try:
+        mode = os.fstat(sys.stdin.fileno()).st_mode
+    except (AttributeError, OSError, ValueError):
+        return ''
+    if not (stat.S_ISFIFO(mode) or stat.S_ISREG(mode)):
+        return ''
+    return _text(sys.stdin.read())
+
+
+def _write(stream, text):
+    stream = getattr(stream, 'buffer', stream)
+    stream.write(text.encode('utf-8'))
+    stream.flush()
+
+
+def forward(argv, path=DAEMON_SOCKET):
+    """Run argv in the daemon listening on path and return the exit code
+
+    Raises socket.error if no daemon is listening.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except socket.error:
+        sock.close()
+        raise
+    try:
+        env = dict(
+            (k, v) for k, v in os.environ.items() if k.startswith(ENV_PREFIX)
+        )
+        send_frame(sock, {
+            'argv': list(argv),
+            'env': env,
+            'stdin': _read_stdin(),
+            'cwd': _text(os.getcwd()),
+        })
+        while True:
+            message = recv_frame(sock)
+            if 'stdout' in message:
+                _write(sys.stdout, message['stdout'])
+            elif 'stderr' in message:
+                _write(sys.stderr, message['stderr'])
+            elif 'exit' in message:
+                return message['exit']
+    except (socket.error, EOFError) as e:
+        # The command may have run, don't run it again locally
+        _write(sys.stderr, u'lost connection to daemon: %s\n' % e)
+        return 1
+    finally:
+        sock.close()
+
+
+def _needs_local_shell(argv):
+    """Commands that need the caller's terminal run locally"""
+    if not argv:
+        # Interactive mode
+        return True
+    if sys.stdin.isatty():
+        # The shell may need to prompt for a password
+        credentials = ('OS_PASSWORD', 'OS_TOKEN')
+        options = ('--os-password', '--os-token')
+        if not any(os.environ.get(v) for v in credentials) and not any(
+                a.split('=')[0] in options for a in argv):
+            return True
+    return False
+
+
+def main(argv=sys.argv[1:]):
+    if not _needs_local_shell(argv):
+        path = os.environ.get('OS_DAEMON_SOCKET', DAEMON_SOCKET)
+        try:
+            return forward(argv, path)
+        except socket.error:
+            # No daemon running
+            pass
+    from openstackclient import shell
+    return shell.main(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,310 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""HTTP request tracing
+
+An HTTPTracer hands a record of every request and its response to a set
+of sinks: the curl style debug log, a JSON lines file or a HAR file.
+Records are only built when at least one sink is enabled, so a tracer
+with no enabled sinks costs one check per request.
+"""
+
+import datetime
+import json
+import logging
+import re
+import threading
+import time
+
+import six
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+
+LOG = logging.getLogger(__name__)
+
+# Longest body kept in a trace, in bytes
+DEFAULT_BODY_LIMIT = 4096
+
+REDACTED = '<redacted>'
+
+# Headers carrying credentials, compared in lower case
+REDACTED_HEADERS = frozenset([
+    'authorization',
+    'x-auth-key',
+    'x-auth-token',
+    'x-service-token',
+    'x-storage-token',
+    'x-subject-token',
+])
+
+# String values of JSON body keys that hold credentials
+_REDACTED_BODY = re.compile(
+    r'("(?:password|secret|adminPass)"\s*:\s*)"(?:[^"\\]|\\.)*"')
+
+
+def _redact_headers(headers):
+    return dict(
+        (k, REDACTED if k.lower() in REDACTED_HEADERS else v)
+        for k, v in six.iteritems(headers)
+    )
+
+
+def _get_header(headers, name, default=''):
+    """Look up a header in a plain dict regardless of the name's case"""
+    name = name.lower()
+    for k, v in six.iteritems(headers):
+        if k.lower() == name:
+            return v
+    return default
+
+
+def _format_body(body, limit, redact=True):
+    """Return body as text of at most limit bytes, or None"""
+    if body is None or hasattr(body, 'read'):
+        # Files are not read again for the trace
+        return None
+    if isinstance(body, six.text_type):
+        body = body.encode('utf-8')
+    elif not isinstance(body, bytes):
+        body = six.text_type(body).encode('utf-8')
+    size = len(body)
+    text = body[:limit].decode('utf-8', 'replace')
+    if redact:
+        text = _REDACTED_BODY.sub(r'\1"%s"' % REDACTED, text)
+    if size > limit:
+        text += u'... [%d bytes truncated]' % (size - limit)
+    return text
+
+
+class TraceSink(object):
+    """Base class of the sinks of an HTTPTracer"""
+
+    def enabled(self):
+        return True
+
+    def request(self, trace):
+        """Called with the trace of a request before it is sent"""
+
+    def response(self, trace):
+        """Called with the completed trace of a request"""
+
+    def close(self):
+        pass
+
+
+class CurlSink(TraceSink):
+    """Log requests as curl commands, to the debug log or to a file"""
+
+    def __init__(self, stream=None, logger=LOG):
+        self.stream = stream
+        self.logger = logger
+        self._lock = threading.Lock()
+
+    def enabled(self):
+        return (self.stream is not None or
+                self.logger.isEnabledFor(logging.DEBUG))
+
+    def _emit(self, text):
+        if self.stream is None:
+            self.logger.debug(text)
+        else:
+            with self._lock:
+                self.stream.write(text + '\n')
+                self.stream.flush()
+
+    def request(self, trace):
+        parts = [
+            "curl -i",
+            "-X '%s'" % trace['method'],
+            "'%s'" % trace['url'],
+        ]
+        for name, value in sorted(six.iteritems(trace['request_headers'])):
+            parts.append("-H '%s: %s'" % (name, value))
+        self._emit("REQ: %s" % " ".join(parts))
+        if trace['request_body'] is not None:
+            self._emit("REQ BODY: %s" % trace['request_body'])
+
+    def response(self, trace):
+        if trace['error'] is not None:
+            self._emit("RESP: %s" % trace['error'])
+            return
+        self._emit("RESP: [%s] %s" % (
+            trace['status'], trace['response_headers']))
+        if trace['response_body'] is not None:
+            self._emit("RESP BODY: %s" % trace['response_body'])
+
+
+class JSONLinesSink(TraceSink):
+    """Write every completed request as one line of JSON"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def response(self, trace):
+        line = json.dumps(trace, sort_keys=True)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+class HARSink(TraceSink):
+    """Collect completed requests and write them as a HAR log on close"""
+
+    def __init__(self, stream, creator='python-openstackclient', version=''):
+        self.stream = stream
+        self.creator = {'name': creator, 'version': version}
+        self.entries = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _headers(headers):
+        return [
+            {'name': k, 'value': v} for k, v in sorted(six.iteritems(headers))
+        ]
+
+    def response(self, trace):
+        headers = trace['response_headers'] or {}
+        entry = {
+            'startedDateTime': datetime.datetime.utcfromtimestamp(
+                trace['started']).isoformat() + 'Z',
+            'time': trace['elapsed'] * 1000,
+            'request': {
+                'method': trace['method'],
+                'url': trace['url'],
+                'httpVersion': 'HTTP/1.1',
+                'headers': self._headers(trace['request_headers']),
+                'queryString': [],
+                'cookies': [],
+                'headersSize': -1,
+                'bodySize': -1,
+            },
+            'response': {
+                'status': trace['status'] or 0,
+                'statusText': trace['error'] or '',
+                'httpVersion': 'HTTP/1.1',
+                'headers': self._headers(headers),
+                'cookies': [],
+                'content': {
+                    'size': -1,
+                    'mimeType': _get_header(headers, 'Content-Type'),
+                    'text': trace['response_body'] or '',
+                },
+                'redirectURL': '',
+                'headersSize': -1,
+                'bodySize': -1,
+            },
+            'cache': {},
+            'timings': {
+                'send': 0,
+                'wait': trace['elapsed'] * 1000,
+                'receive': 0,
+            },
+        }
+        if trace['request_body'] is not None:
+            entry['request']['postData'] = {
+                'mimeType': _get_header(trace['request_headers'],
+                                        'Content-Type'),
+                'text': trace['request_body'],
+            }
+        with self._lock:
+            self.entries.append(entry)
+
+    def close(self):
+        with self._lock:
+            entries, self.entries = self.entries, []
+        json.dump({
+            'log': {
+                'version': '1.2',
+                'creator': self.creator,
+                'entries': entries,
+            }
+        }, self.stream, indent=1, sort_keys=True)
+        self.stream.write('\n')
+        self.stream.flush()
+
+
+class HTTPTracer(object):
+    """Hands traces of requests to the enabled sinks
+
+    A trace is a dict holding the method, url, redacted headers and
+    truncated bodies of a request and its response, its status or error
+    and how long it took.
+    """
+
+    def __init__(self, sinks=None, body_limit=DEFAULT_BODY_LIMIT,
+                 redact=True):
+        self.sinks = list(sinks or [])
+        self.body_limit = body_limit
+        self.redact = redact
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def start(self, method, url, headers, params=None, data=None):
+        """Return the trace of a request about to be sent, None if off"""
+        sinks = [s for s in self.sinks if s.enabled()]
+        if not sinks:
+            return None
+        if params:
+            url += '?' + urlencode(params)
+        trace = {
+            'started': time.time(),
+            'method': method,
+            'url': url,
+            'request_headers': (_redact_headers(headers) if self.redact
+                                else dict(headers)),
+            'request_body': _format_body(data, self.body_limit, self.redact),
+            'status': None,
+            'response_headers': None,
+            'response_body': None,
+            'elapsed': None,
+            'error': None,
+        }
+        for sink in sinks:
+            sink.request(trace)
+        # The sinks that saw the request also get the response
+        return trace, sinks
+
+    def finish(self, started, response=None, error=None):
+        """Complete the trace returned by start()
+
+        Bodies of streamed responses are not read for the trace.
+        """
+        trace, sinks = started
+        trace['elapsed'] = time.time() - trace['started']
+        if error is not None:
+            trace['error'] = six.text_type(error) or error.__class__.__name__
+        if response is not None:
+            trace['status'] = response.status_code
+            headers = dict(response.headers)
+            trace['response_headers'] = (
+                _redact_headers(headers) if self.redact else headers)
+            if response._content_consumed:
+                trace['response_body'] = _format_body(
+                    response.content, self.body_limit, self.redact)
+        for sink in sinks:
+            sink.response(trace)
+
+    def close(self):
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                LOG.warning('unable to close HTTP trace: %s', e)
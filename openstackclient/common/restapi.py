@@ -15,9 +15,18 @@
 
 """REST API bits"""
 
+import codecs
+from email import utils as email_utils
 import json
 import logging
+import random
 import requests
+from requests import adapters
+import threading
+import time
+
+from openstackclient.common import httptrace
+from openstackclient.common import timing
 
 try:
     from urllib.parse import urlencode
@@ -27,6 +36,314 @@ except ImportError:
 
 _logger = logging.getLogger(__name__)
 
+# Maximum number of connections kept alive per host
+DEFAULT_POOL_SIZE = 10
+
+DEFAULT_RETRIES = 3
+
+# Bytes read from the socket at a time when decoding a streamed response
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Requests that may be repeated without changing the outcome
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+# Requests that change the resource, dropping its cached responses
+MUTATING_METHODS = frozenset(['PUT', 'POST', 'DELETE', 'PATCH'])
+# Transient failures, retried for idempotent requests
+RETRY_STATUSES = frozenset([408, 500, 502, 503, 504])
+# The server refused to process the request, retried for any request
+REJECTED_STATUSES = frozenset([429, 498])
+# Either a rate limit or a request entity too large, only retried for
+# any request when the server sends Retry-After
+OVER_LIMIT_STATUSES = frozenset([413])
+
+
+class PooledHTTPAdapter(adapters.HTTPAdapter):
+    """An HTTPAdapter meant to be shared by the sessions of all clients
+
+    Mounting one adapter in several requests.Session objects lets them
+    share its keep-alive connection pools while keeping their own headers
+    and auth.  The adapter also counts the connections it opens.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, **kwargs):
+        self._pools = []
+        super(PooledHTTPAdapter, self).__init__(
+            pool_maxsize=pool_size or DEFAULT_POOL_SIZE,
+            **kwargs
+        )
+
+    def get_connection(self, url, proxies=None):
+        pool = super(PooledHTTPAdapter, self).get_connection(url, proxies)
+        # Hang on to pools evicted by the pool manager so their
+        # connections are still counted
+        if pool not in self._pools:
+            self._pools.append(pool)
+        return pool
+
+    def send(self, request, **kwargs):
+        if not timing.tracing():
+            return super(PooledHTTPAdapter, self).send(request, **kwargs)
+        with timing.span(
+            '%s %s' % (request.method, timing.url_template(request.url)),
+            'http',
+            url=request.url,
+        ) as args:
+            response = super(PooledHTTPAdapter, self).send(request, **kwargs)
+            args['status'] = response.status_code
+            return response
+
+    @property
+    def connections_opened(self):
+        """Number of new TCP (and TLS) connections opened so far"""
+        return sum(pool.num_connections for pool in self._pools)
+
+
+def create_session(adapter=None, **kwargs):
+    """Return a requests.Session that sends requests through adapter"""
+    session = requests.Session(**kwargs)
+    if adapter:
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+    return session
+
+
+def create_tracer(**kwargs):
+    """Return an HTTPTracer that logs requests at debug level"""
+    return httptrace.HTTPTracer([httptrace.CurlSink(logger=_logger)], **kwargs)
+
+
+class RetryPolicy(object):
+    """Decides whether and when to retry a failed request
+
+    Connection errors and transient server errors are retried for
+    idempotent methods only, rate limiting responses (which mean the
+    request was not processed) for all methods.  A 413 is only a rate
+    limit when it comes with Retry-After, otherwise the request is too
+    large and sending it again would not help.  Retries back off
+    exponentially with jitter, or wait as long as the server asks with
+    Retry-After, as long as the total time spent on a request stays
+    below max_elapsed seconds.
+
+    The policy counts the retries it allowed and the time spent waiting.
+    """
+
+    def __init__(
+        self,
+        retries=DEFAULT_RETRIES,
+        backoff=0.5,
+        max_backoff=30.0,
+        max_elapsed=120.0,
+        idempotent_methods=IDEMPOTENT_METHODS,
+        retry_statuses=RETRY_STATUSES,
+        rejected_statuses=REJECTED_STATUSES,
+        over_limit_statuses=OVER_LIMIT_STATUSES,
+    ):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_elapsed = max_elapsed
+        self.idempotent_methods = idempotent_methods
+        self.retry_statuses = retry_statuses
+        self.rejected_statuses = rejected_statuses
+        self.over_limit_statuses = over_limit_statuses
+
+        self.retry_count = 0
+        self.sleep_time = 0.0
+        self._lock = threading.Lock()
+
+    def is_retryable(self, method, response=None):
+        """Whether a failed request may be sent again
+
+        :param response: the error response, None for a connection error
+        """
+        idempotent = method.upper() in self.idempotent_methods
+        if response is None:
+            return idempotent
+        if response.status_code in self.rejected_statuses:
+            return True
+        if response.status_code in self.over_limit_statuses:
+            return bool(response.headers.get('Retry-After'))
+        return idempotent and response.status_code in self.retry_statuses
+
+    def retry_after(self, response):
+        """Return the delay the server asked for in seconds, or None"""
+        if response is None:
+            return None
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        date = email_utils.parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0.0, email_utils.mktime_tz(date) - time.time())
+
+    def get_delay(self, method, attempt, elapsed, response=None):
+        """Return the seconds to wait before the next attempt, or None
+
+        :param attempt: number of retries done for this request so far
+        :param elapsed: seconds spent on this request so far
+        :param response: the error response, None for a connection error
+        """
+        if attempt >= self.retries or not self.is_retryable(method, response):
+            return None
+        delay = self.retry_after(response)
+        if delay is None:
+            # Exponential backoff with "equal jitter"
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            delay = delay / 2 + random.uniform(0, delay / 2)
+        if elapsed + delay > self.max_elapsed:
+            return None
+        return delay
+
+    def sleep(self, delay):
+        with self._lock:
+            self.retry_count += 1
+            self.sleep_time += delay
+        time.sleep(delay)
+
+
+class _JSONReader(object):
+    """Decode JSON values one at a time from an iterator of byte chunks
+
+    Only the undecoded tail of the data read so far is buffered.
+    """
+
+    WHITESPACE = u' \t\n\r'
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.decoder = json.JSONDecoder()
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buf = u''
+        self.pos = 0
+        self.eof = False
+
+    def _read(self):
+        """Append the next chunk to the buffer, False once all is read"""
+        if self.eof:
+            return False
+        try:
+            text = self.utf8.decode(next(self.chunks))
+        except StopIteration:
+            self.eof = True
+            text = self.utf8.decode(b'', True)
+        self.buf = self.buf[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character, '' at the end"""
+        while True:
+            while (self.pos < len(self.buf) and
+                   self.buf[self.pos] in self.WHITESPACE):
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._read():
+                return ''
+
+    def expect(self, chars):
+        """Consume and return the next character, one of chars"""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError('expected %s, found %r' % (
+                ' or '.join(chars), char or 'end of data'))
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Consume and return the next value"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError:
+                # Incomplete, unless there is nothing more to read
+                if not self._read():
+                    raise
+                continue
+            # A number may go on in the next chunk
+            if end < len(self.buf) or not self._read():
+                self.pos = end
+                return value
+
+
+def iter_json_list(response, key=None, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield the elements of a JSON list body as they are received
+
+    Unlike response.json(), neither the whole body nor the whole list is
+    kept in memory.  The response is closed once the list has been read.
+
+    :param response: response to a request made with stream=True
+    :param key: key of the list in the top level object of the body, None
+                if the body is the list
+    :param chunk_size: number of bytes to read from the socket at a time
+    """
+    reader = _JSONReader(response.iter_content(chunk_size))
+    try:
+        if key is not None:
+            reader.expect('{')
+            while True:
+                if reader.peek() == '}':
+                    raise KeyError(key)
+                name = reader.value()
+                reader.expect(':')
+                if name == key:
+                    break
+                reader.value()
+                if reader.expect(',}') == '}':
+                    raise KeyError(key)
+        reader.expect('[')
+        if reader.peek() == ']':
+            return
+        while True:
+            yield reader.value()
+            if reader.expect(',]') == ']':
+                return
+    finally:
+        response.close()
+
+
+class CachedResponse(requests.Response):
+    """A response served from an HTTPCache entry
+
+    The body is only read from the cache if it is used, and json() hands
+    out the decoded body kept by the cache instead of parsing it again.
+    """
+
+    def __init__(self, http_cache, key, entry, url):
+        super(CachedResponse, self).__init__()
+        self.http_cache = http_cache
+        self.key = key
+        self.entry = entry
+        self.status_code = entry['status']
+        self.headers.update(entry['headers'])
+        self.url = url
+        self._content_consumed = True
+
+    @property
+    def content(self):
+        if self._content is False:
+            self._content = self.http_cache.read_body(self.key)
+        return self._content
+
+    def close(self):
+        # No connection to release
+        pass
+
+    def iter_content(self, *args, **kwargs):
+        # Load the body to iterate over
+        self.content
+        return super(CachedResponse, self).iter_content(*args, **kwargs)
+
+    def json(self, **kwargs):
+        return self.http_cache.decode(
+            self.key, self.entry, self._content or None)
+
 
 class RESTApi(object):
     """A REST api client that handles the interface from us to the server
@@ -53,11 +370,22 @@ class RESTApi(object):
         os_auth=None,
         user_agent=USER_AGENT,
         debug=None,
+        adapter=None,
+        retry_policy=None,
+        tracer=None,
+        http_cache=None,
         **kwargs
     ):
         self.set_auth(os_auth)
         self.debug = debug
-        self.session = requests.Session(**kwargs)
+        self.session = create_session(adapter, **kwargs)
+        if retry_policy is None:
+            retry_policy = RetryPolicy()
+        self.retry_policy = retry_policy
+        if tracer is None:
+            tracer = create_tracer()
+        self.tracer = tracer
+        self.http_cache = http_cache
 
         self.set_header('User-Agent', user_agent)
         self.set_header('Content-Type', 'application/json')
@@ -81,10 +409,102 @@ class RESTApi(object):
             self.session.headers.setdefault('X-Auth-Token', self.os_auth)
         if 'data' in kwargs and isinstance(kwargs['data'], type({})):
             kwargs['data'] = json.dumps(kwargs['data'])
-        log_request(method, url, headers=self.session.headers, **kwargs)
-        response = self.session.request(method, url, **kwargs)
-        log_response(response)
-        return self._error_handler(response)
+
+        if self.http_cache is None:
+            return self._request(method, url, **kwargs)
+        if method == 'GET' and 'Range' not in (kwargs.get('headers') or {}):
+            # The whole body is needed to store it
+            kwargs.pop('stream', None)
+            return self._cached_get(url, **kwargs)
+        response = self._request(method, url, **kwargs)
+        if method.upper() in MUTATING_METHODS:
+            self.http_cache.invalidate(url)
+        return response
+
+    def _cached_get(self, url, **kwargs):
+        """GET url, revalidating or re-using a cached response"""
+        full_url = url
+        if kwargs.get('params'):
+            full_url += '?' + urlencode(sorted(kwargs['params'].items()))
+        key = self.http_cache.make_key(
+            self.http_cache.scope or (self.os_auth,), full_url)
+        entry = self.http_cache.get(key)
+        if entry is not None:
+            if self.http_cache.is_fresh(entry):
+                _logger.debug("using cached response for %s", full_url)
+                return CachedResponse(self.http_cache, key, entry, url)
+            headers = dict(kwargs.get('headers') or {})
+            headers.update(self.http_cache.validators(entry))
+            kwargs['headers'] = headers
+
+        response = self._request('GET', url, **kwargs)
+        if response.status_code == 304 and entry is not None:
+            _logger.debug("cached response for %s is still valid", full_url)
+            self.http_cache.refresh(key)
+            return CachedResponse(self.http_cache, key, entry, url)
+        if response.status_code == 200:
+            self.http_cache.set(
+                key,
+                full_url,
+                response.status_code,
+                response.headers,
+                response.content,
+            )
+        return response
+
+    def _request(self, method, url, **kwargs):
+        # File-like bodies can only be sent again if they can be rewound
+        data = kwargs.get('data')
+        position = None
+        rewindable = True
+        if hasattr(data, 'read'):
+            try:
+                position = data.tell()
+            except (AttributeError, IOError):
+                rewindable = False
+
+        start = time.time()
+        attempt = 0
+        while True:
+            trace = self.tracer.start(
+                method,
+                url,
+                self.session.headers,
+                params=kwargs.get('params'),
+                data=kwargs.get('data'),
+            )
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.ConnectionError as e:
+                error, response = e, None
+            else:
+                error = None
+            if trace is not None:
+                self.tracer.finish(trace, response, error)
+            if response is not None and 200 <= response.status_code < 300:
+                return response
+
+            delay = None
+            if rewindable:
+                delay = self.retry_policy.get_delay(
+                    method, attempt, time.time() - start, response)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return self._error_handler(response)
+
+            attempt += 1
+            _logger.debug(
+                "retrying %s %s in %.2fs (retry %d) after %s",
+                method, url, delay, attempt,
+                error or response.status_code,
+            )
+            if response is not None:
+                # Hand the connection back to the pool
+                response.close()
+            self.retry_policy.sleep(delay)
+            if position is not None:
+                data.seek(position)
 
     def create(self, url, data=None, response_key=None, **kwargs):
         response = self.request('POST', url, data=data, **kwargs)
@@ -100,13 +520,23 @@ class RESTApi(object):
     def delete(self, url):
         self.request('DELETE', url)
 
-    def list(self, url, data=None, response_key=None, **kwargs):
+    def list(self, url, data=None, response_key=None, stream=False,
+             **kwargs):
+        """Return the list in response_key of the response body
+
+        :param stream: return an iterator that decodes the elements of the
+                       list as they are received
+        """
+        if stream:
+            kwargs['stream'] = True
         if data:
             response = self.request('POST', url, data=data, **kwargs)
         else:
             kwargs.setdefault('allow_redirects', True)
             response = self.request('GET', url, **kwargs)
 
+        if stream:
+            return iter_json_list(response, response_key)
         return response.json()[response_key]
 
         ###hack this for keystone!!!
@@ -143,46 +573,10 @@ class RESTApi(object):
 
     def _error_handler(self, response):
         if response.status_code < 200 or response.status_code >= 300:
-            _logger.debug(
-                "ERROR: %s",
-                response.text,
-            )
+            if _logger.isEnabledFor(logging.DEBUG):
+                _logger.debug(
+                    "ERROR: %s",
+                    response.text,
+                )
             response.raise_for_status()
         return response
-
-
-def log_request(method, url, **kwargs):
-    # put in an early exit if debugging is not enabled?
-    if 'params' in kwargs and kwargs['params'] != {}:
-        url += '?' + urlencode(kwargs['params'])
-
-    string_parts = [
-        "curl -i",
-        "-X '%s'" % method,
-        "'%s'" % url,
-    ]
-
-    for element in kwargs['headers']:
-        header = " -H '%s: %s'" % (element, kwargs['headers'][element])
-        string_parts.append(header)
-
-    _logger.debug("REQ: %s" % " ".join(string_parts))
-    if 'data' in kwargs:
-        _logger.debug("REQ BODY: %s\n" % (kwargs['data']))
-
-
-def log_response(response):
-    _logger.debug(
-        "RESP: [%s] %s\n",
-        response.status_code,
-        response.headers,
-    )
-    if response._content_consumed:
-        _logger.debug(
-            "RESP BODY: %s\n",
-            response.text,
-        )
-    _logger.debug(
-        "encoding: %s",
-        response.encoding,
-    )
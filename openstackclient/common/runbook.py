@@ -0,0 +1,412 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Runbook Action Implementation
+
+A runbook lists commands as named steps.  A step may name the steps it
+must run after; all other steps run concurrently on a pool of worker
+threads that share the shell's ClientManager::
+
+    {"steps": [
+        {"name": "vol1", "command": "volume create --size 1 vol1"},
+        {"name": "attach1",
+         "command": "server add volume server1 vol1",
+         "after": ["vol1"],
+         "retries": 2}
+    ]}
+
+Runbooks are JSON, or YAML if PyYAML is installed.
+"""
+
+import json
+import logging
+import os
+import shlex
+import threading
+import time
+
+from cliff import lister
+import six
+
+from openstackclient.common import exceptions
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+DEFAULT_WORKERS = 10
+
+# Step states
+PENDING = 'pending'
+OK = 'ok'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+
+class Step(object):
+    """One command of a runbook and the outcome of running it"""
+
+    def __init__(self, name, argv, after=None, retries=None):
+        self.name = name
+        self.argv = argv
+        self.after = after or []
+        self.retries = retries
+        self.status = PENDING
+        self.attempts = 0
+        self.duration = 0.0
+        self.output = ''
+        self.error = None
+
+
+def _native(text):
+    """Return text as the native string type, like sys.argv"""
+    if six.PY2 and isinstance(text, six.text_type):
+        return text.encode('utf-8')
+    return text
+
+
+def _parse_step(number, data):
+    if not isinstance(data, dict):
+        raise exceptions.CommandError('step %d is not a mapping' % number)
+    name = six.text_type(data.get('name', number))
+    command = data.get('command')
+    if isinstance(command, six.string_types):
+        try:
+            argv = shlex.split(_native(command))
+        except ValueError as e:
+            raise exceptions.CommandError(
+                'step %s: unable to parse command: %s' % (name, e))
+    elif isinstance(command, list):
+        argv = [_native(six.text_type(a)) for a in command]
+    else:
+        raise exceptions.CommandError('step %s has no command' % name)
+    # Allow commands pasted from a shell
+    if argv and argv[0] == 'openstack':
+        argv = argv[1:]
+    after = data.get('after', [])
+    if isinstance(after, six.string_types):
+        after = [after]
+    return Step(
+        name,
+        argv,
+        after=[six.text_type(a) for a in after],
+        retries=data.get('retries'),
+    )
+
+
+def load_runbook(path):
+    """Read a runbook file and return its steps in file order"""
+    with open(path) as f:
+        text = f.read()
+    if os.path.splitext(path)[1] in ('.yaml', '.yml'):
+        if yaml is None:
+            raise exceptions.CommandError(
+                'PyYAML is required to read %s' % path)
+        data = yaml.safe_load(text)
+    else:
+        try:
+            data = json.loads(text)
+        except ValueError as e:
+            raise exceptions.CommandError(
+                'unable to parse %s: %s' % (path, e))
+    if isinstance(data, dict):
+        data = data.get('steps')
+    if not isinstance(data, list):
+        raise exceptions.CommandError('%s has no list of steps' % path)
+    return [_parse_step(i, s) for i, s in enumerate(data, 1)]
+
+
+def check_steps(steps):
+    """Make sure the steps form a DAG of uniquely and safely named steps"""
+    names = set()
+    separators = set([os.sep, os.altsep or os.sep, '/'])
+    for step in steps:
+        # The name is used as a file name by --output-dir
+        if (not step.name or '..' in step.name
+                or separators.intersection(step.name)):
+            raise exceptions.CommandError(
+                'step name %r must not be empty or contain / or ..'
+                % step.name)
+        if step.name in names:
+            raise exceptions.CommandError(
+                'step %s is defined more than once' % step.name)
+        names.add(step.name)
+    for step in steps:
+        for name in step.after:
+            if name not in names:
+                raise exceptions.CommandError(
+                    'step %s runs after unknown step %s' % (step.name, name))
+
+    # Kahn's algorithm, whatever can not be ordered is part of a cycle
+    waiting = dict((s.name, set(s.after)) for s in steps)
+    done = True
+    while done:
+        done = [n for n, after in waiting.items() if not after]
+        for name in done:
+            del waiting[name]
+        for after in waiting.values():
+            after.difference_update(done)
+    if waiting:
+        raise exceptions.CommandError(
+            'steps %s depend on each other' % ', '.join(sorted(waiting)))
+
+
+class _StepApp(object):
+    """The shell as seen by the command of one step
+
+    Everything but stdout is shared with the shell, so that concurrent
+    steps use one ClientManager without mixing up their output.
+    """
+
+    def __init__(self, app, stdout):
+        self._app = app
+        self.stdout = stdout
+
+    def __getattr__(self, name):
+        return getattr(self._app, name)
+
+
+class RunbookExecutor(object):
+    """Run runbook steps on a pool of worker threads
+
+    A step starts as soon as all the steps it runs after have succeeded.
+    When a step fails after its retries, every step that depends on it,
+    directly or not, is skipped; unrelated steps keep running.
+    """
+
+    log = logging.getLogger(__name__ + '.RunbookExecutor')
+
+    def __init__(self, app, steps, workers=DEFAULT_WORKERS, retries=0,
+                 retry_delay=1.0):
+        self.app = app
+        self.steps = steps
+        self.workers = max(1, workers)
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._commands = {}
+
+    def _find_command(self, step):
+        try:
+            return self.app.command_manager.find_command(step.argv)
+        except ValueError as e:
+            raise exceptions.CommandError('step %s: %s' % (step.name, e))
+
+    def prepare(self):
+        """Check the steps and authenticate once for all of them"""
+        check_steps(self.steps)
+        auth_required = False
+        for step in self.steps:
+            self._commands[step.name] = self._find_command(step)
+            cmd_factory = self._commands[step.name][0]
+            auth_required |= getattr(cmd_factory, 'auth_required', True)
+        if auth_required:
+            self.app.authenticate_user()
+            self.app.restapi.set_auth(self.app.client_manager._token)
+
+    def _run_command(self, step):
+        cmd_factory, cmd_name, sub_argv = self._commands[step.name]
+        stdout = six.StringIO()
+        cmd = cmd_factory(_StepApp(self.app, stdout), self.app.options)
+        configure = getattr(self.app, 'configure_resolution_cache', None)
+        if configure:
+            # Per thread, the shell only set up the main thread
+            configure(cmd)
+        parsed_args = cmd.get_parser(cmd_name).parse_args(sub_argv)
+        result = cmd.run(parsed_args)
+        if result:
+            raise exceptions.CommandError('exit status %s' % result)
+        return stdout.getvalue()
+
+    def run_step(self, step):
+        """Run one step, retrying it if it fails"""
+        retries = step.retries if step.retries is not None else self.retries
+        start = time.time()
+        while True:
+            step.attempts += 1
+            try:
+                step.output = self._run_command(step)
+            except SystemExit as e:
+                # argparse exits on bad arguments
+                step.error = 'invalid arguments (exit status %s)' % e.code
+                step.status = FAILED
+                break
+            except Exception as e:
+                step.error = six.text_type(e) or e.__class__.__name__
+                if step.attempts > retries:
+                    step.status = FAILED
+                    break
+                self.log.info('step %s failed, retrying: %s',
+                              step.name, step.error)
+                time.sleep(self.retry_delay * step.attempts)
+            else:
+                step.error = None
+                step.status = OK
+                break
+        step.duration = time.time() - start
+        self.log.info('step %s %s after %.2fs', step.name, step.status,
+                      step.duration)
+
+    def _worker(self, ready, done):
+        while True:
+            step = ready.get()
+            if step is None:
+                return
+            try:
+                self.run_step(step)
+            except Exception as e:
+                step.status, step.error = FAILED, six.text_type(e)
+            done.put(step)
+
+    def _skip_dependents(self, failed, dependents):
+        count = 0
+        todo = list(dependents[failed.name])
+        while todo:
+            step = todo.pop()
+            if step.status != PENDING:
+                continue
+            step.status = SKIPPED
+            step.error = 'step %s failed' % failed.name
+            count += 1
+            todo.extend(dependents[step.name])
+        return count
+
+    def run(self):
+        """Run all of the steps, return the number that did not succeed"""
+        if not self._commands:
+            self.prepare()
+
+        dependents = dict((s.name, []) for s in self.steps)
+        waiting = {}
+        for step in self.steps:
+            waiting[step.name] = len(step.after)
+            for name in step.after:
+                dependents[name].append(step)
+
+        ready = queue.Queue()
+        done = queue.Queue()
+        threads = []
+        for i in range(min(self.workers, len(self.steps))):
+            thread = threading.Thread(target=self._worker, args=(ready, done))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        for step in self.steps:
+            if not step.after:
+                ready.put(step)
+        remaining = len(self.steps)
+        try:
+            while remaining:
+                try:
+                    step = done.get(timeout=1)
+                except queue.Empty:
+                    continue
+                remaining -= 1
+                if step.status == OK:
+                    for child in dependents[step.name]:
+                        waiting[child.name] -= 1
+                        if not waiting[child.name] and child.status == PENDING:
+                            ready.put(child)
+                else:
+                    remaining -= self._skip_dependents(step, dependents)
+        finally:
+            for thread in threads:
+                ready.put(None)
+        for thread in threads:
+            thread.join()
+        return len([s for s in self.steps if s.status != OK])
+
+
+class RunRunbook(lister.Lister):
+    """Run the commands of a runbook concurrently"""
+
+    # The executor authenticates if any of the steps needs it
+    auth_required = False
+    log = logging.getLogger(__name__ + '.RunRunbook')
+
+    def get_parser(self, prog_name):
+        parser = super(RunRunbook, self).get_parser(prog_name)
+        parser.add_argument(
+            'runbook',
+            metavar='<runbook>',
+            help='Runbook file, JSON or YAML')
+        parser.add_argument(
+            '--workers',
+            metavar='<count>',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help='Number of steps to run at once (default: %d)' %
+                 DEFAULT_WORKERS)
+        parser.add_argument(
+            '--retries',
+            metavar='<count>',
+            type=int,
+            default=0,
+            help='Number of times to retry a failed step unless the step '
+                 'sets its own retries (default: 0)')
+        parser.add_argument(
+            '--retry-delay',
+            metavar='<seconds>',
+            type=float,
+            default=1.0,
+            help='Wait this long before the first retry, twice as long '
+                 'before the second and so on (default: 1)')
+        parser.add_argument(
+            '--output-dir',
+            metavar='<directory>',
+            help='Save the output of each step in <directory>/<step>.out')
+        return parser
+
+    def take_action(self, parsed_args):
+        self.log.debug('take_action(%s)' % parsed_args)
+
+        executor = RunbookExecutor(
+            self.app,
+            load_runbook(parsed_args.runbook),
+            workers=parsed_args.workers,
+            retries=parsed_args.retries,
+            retry_delay=parsed_args.retry_delay,
+        )
+        self.failed = executor.run()
+
+        if parsed_args.output_dir:
+            if not os.path.isdir(parsed_args.output_dir):
+                os.makedirs(parsed_args.output_dir)
+            for step in executor.steps:
+                if step.attempts:
+                    path = os.path.join(
+                        parsed_args.output_dir, '%s.out' % step.name)
+                    output = step.output
+                    if isinstance(output, six.text_type):
+                        output = output.encode('utf-8')
+                    with open(path, 'wb') as f:
+                        f.write(output)
+
+        columns = ('Step', 'Status', 'Attempts', 'Seconds', 'Error')
+        return (columns,
+                ((s.name, s.status, s.attempts, '%.2f' % s.duration,
+                  s.error or '') for s in executor.steps))
+
+    def run(self, parsed_args):
+        self.failed = 0
+        super(RunRunbook, self).run(parsed_args)
+        return 1 if self.failed else 0
@@ -0,0 +1,403 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Timing of HTTP requests and command phases
+
+While a Timer is installed it records every request sent through a
+requests HTTPAdapter, which covers RESTApi and the compute, identity and
+volume clients, and through the glance client's own HTTP client, for
+--timing.
+
+span() marks a section of code as a span of the trace written by
+--trace-file, as Chrome trace events.  When no trace is being recorded a
+span costs a single check.
+"""
+
+import contextlib
+import json
+import os
+import re
+import threading
+import time
+
+from requests import adapters
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+
+# Phase of the requests made outside of Timer.phase()
+API = 'api'
+AUTH = 'auth'
+
+# Path segments that identify a resource rather than a collection, with
+# the prefix of Swift account names
+_ID_SEGMENT = re.compile(
+    r'^((?:[A-Z]+_)?)([0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?'
+    r'[0-9a-fA-F]{4}-?[0-9a-fA-F]{12}|[0-9a-fA-F]{32,64}|\d+)$')
+
+
+def url_template(url):
+    """Return url with IDs replaced by {id} and query values dropped"""
+    parts = urlsplit(url)
+    path = '/'.join(
+        _ID_SEGMENT.sub(r'\1{id}', s) for s in parts.path.split('/')
+    )
+    template = '%s://%s%s' % (parts.scheme, parts.netloc, path)
+    if parts.query:
+        keys = [q.split('=')[0] for q in parts.query.split('&')]
+        template += '?' + '&'.join(k + '=' for k in keys)
+    return template
+
+
+def _body_size(body, headers):
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, type(u''))):
+        return len(body)
+    try:
+        return int(headers.get('Content-Length', 0))
+    except ValueError:
+        return 0
+
+
+class Request(object):
+    """Timing of one HTTP request"""
+
+    def __init__(self, method, url, phase, bytes_out=0):
+        self.method = method
+        self.url = url
+        self.phase = phase
+        self.bytes_out = bytes_out
+        self.bytes_in = 0
+        self.status = None
+        self.start = time.time()
+        self.first_byte = None
+        self.end = None
+
+    @property
+    def ttfb(self):
+        if self.first_byte is None:
+            return None
+        return self.first_byte - self.start
+
+    @property
+    def elapsed(self):
+        return (self.end or time.time()) - self.start
+
+
+def _wall_time(intervals):
+    """Return the time covered by a set of possibly overlapping intervals"""
+    total = 0.0
+    last_end = None
+    for start, end in sorted(intervals):
+        if last_end is not None and start < last_end:
+            if end > last_end:
+                total += end - last_end
+                last_end = end
+        else:
+            total += end - start
+            last_end = end
+    return total
+
+
+class Timer(object):
+    """Collects the HTTP requests and phase times of a shell"""
+
+    def __init__(self):
+        self.requests = []
+        self.phases = {}
+        self.command_time = 0.0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._saved = None
+
+    def install(self):
+        """Start recording the requests of every client"""
+        if self._saved is not None:
+            return
+        # The plain functions, not methods, so that they can be put back
+        original_send = vars(adapters.HTTPAdapter)['send']
+        original_build_response = vars(adapters.HTTPAdapter)['build_response']
+        saved = [
+            (adapters.HTTPAdapter, 'send', original_send),
+            (adapters.HTTPAdapter, 'build_response', original_build_response),
+        ]
+        timer = self
+
+        def send(adapter, request, **kwargs):
+            record = timer.start_request(
+                request.method,
+                request.url,
+                _body_size(request.body, request.headers),
+            )
+            try:
+                response = original_send(adapter, request, **kwargs)
+            except Exception as e:
+                timer.end_request(record, e.__class__.__name__)
+                raise
+            if response._content_consumed:
+                record.bytes_in = len(response.content or b'')
+            else:
+                # Streamed, the body is read later
+                record.bytes_in = int(
+                    response.headers.get('content-length') or 0)
+            timer.end_request(record, response.status_code)
+            return response
+
+        def build_response(adapter, req, resp):
+            # Called as soon as the response headers have been read
+            record = getattr(timer._local, 'request', None)
+            if record is not None:
+                record.first_byte = time.time()
+            return original_build_response(adapter, req, resp)
+
+        adapters.HTTPAdapter.send = send
+        adapters.HTTPAdapter.build_response = build_response
+
+        try:
+            from glanceclient.common import http as glance_http
+        except ImportError:
+            glance_http = None
+        if glance_http is not None:
+            original = vars(glance_http.HTTPClient)['_http_request']
+            saved.append((glance_http.HTTPClient, '_http_request', original))
+
+            def _http_request(client, url, method, **kwargs):
+                record = timer.start_request(
+                    method,
+                    client.endpoint + url,
+                    _body_size(kwargs.get('body'), kwargs.get('headers', {})),
+                )
+                try:
+                    resp, body = original(client, url, method, **kwargs)
+                except Exception as e:
+                    timer.end_request(record, e.__class__.__name__)
+                    raise
+                record.bytes_in = int(resp.getheader('content-length') or 0)
+                timer.end_request(record, resp.status)
+                return resp, body
+
+            glance_http.HTTPClient._http_request = _http_request
+        self._saved = saved
+
+    def uninstall(self):
+        """Stop recording requests"""
+        for cls, name, original in self._saved or []:
+            setattr(cls, name, original)
+        self._saved = None
+
+    def start_request(self, method, url, bytes_out=0):
+        record = Request(
+            method,
+            url,
+            getattr(self._local, 'phase', API),
+            bytes_out,
+        )
+        self._local.request = record
+        with self._lock:
+            self.requests.append(record)
+        return record
+
+    def end_request(self, record, status):
+        record.end = time.time()
+        record.status = status
+        if getattr(self._local, 'request', None) is record:
+            self._local.request = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Count the time spent and the requests made as part of name"""
+        previous = getattr(self._local, 'phase', API)
+        self._local.phase = name
+        start = time.time()
+        try:
+            yield
+        finally:
+            elapsed = time.time() - start
+            self._local.phase = previous
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def add_command(self, elapsed):
+        """Count the run time of a command, including its phases"""
+        with self._lock:
+            self.command_time += elapsed
+
+    def totals(self):
+        """Return (phase, seconds) pairs for auth, API and local work
+
+        The API time is the wall time during which at least one request
+        was in flight outside of the other phases; local time is the rest
+        of the command run time, mostly formatting the output.
+        """
+        api = _wall_time([
+            (r.start, r.end) for r in self.requests
+            if r.phase == API and r.end is not None
+        ])
+        auth = self.phases.get(AUTH, 0.0)
+        local = max(0.0, self.command_time - auth - api)
+        return [('auth', auth), ('api', api), ('local', local)]
+
+    def report(self, retries=0, retry_wait=0.0):
+        """Return the requests sorted by cost and the totals as text"""
+        header = ('Phase', 'Method', 'URL', 'Status', 'Sent', 'Received',
+                  'TTFB', 'Time')
+        rows = [header]
+        for r in sorted(self.requests, key=lambda r: r.elapsed,
+                        reverse=True):
+            rows.append((
+                r.phase,
+                r.method,
+                url_template(r.url),
+                str(r.status),
+                str(r.bytes_out),
+                str(r.bytes_in),
+                '%.3f' % r.ttfb if r.ttfb is not None else '-',
+                '%.3f' % r.elapsed,
+            ))
+        widths = [max(len(row[i]) for row in rows)
+                  for i in range(len(header))]
+        lines = [
+            '  '.join(c.ljust(w) for c, w in zip(row, widths)).rstrip()
+            for row in rows
+        ]
+        lines.append('')
+        lines.append('%d request(s), %d retried, %.3fs waiting to retry' % (
+            len(self.requests), retries, retry_wait))
+        for name, seconds in self.totals():
+            lines.append('%-6s %.3fs' % (name, seconds))
+        lines.append('%-6s %.3fs' % ('total', self.command_time))
+        return '\n'.join(lines) + '\n'
+
+
+# The TraceRecorder spans go to, see start_trace()
+_recorder = None
+
+
+class _NoSpan(object):
+    """The span used while no trace is recorded"""
+
+    def __enter__(self):
+        # Span args set by the caller are dropped
+        return {}
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name, category='command', **args):
+    """Return a context manager recording name as a span of the trace
+
+    The context manager returns the args dict, which may be updated with
+    results before the span ends.
+
+    :param category: groups spans in the trace viewer, e.g. 'http'
+    :param args: shown with the span in the trace viewer
+    """
+    recorder = _recorder
+    if recorder is None:
+        return _NO_SPAN
+    return recorder.span(name, category, args)
+
+
+def tracing():
+    """Whether spans are being recorded"""
+    return _recorder is not None
+
+
+def start_trace():
+    """Start recording spans, return the TraceRecorder"""
+    global _recorder
+    _recorder = TraceRecorder()
+    return _recorder
+
+
+def stop_trace():
+    """Stop recording spans, return the TraceRecorder or None"""
+    global _recorder
+    recorder, _recorder = _recorder, None
+    return recorder
+
+
+class TraceRecorder(object):
+    """Collects spans as Chrome trace events
+
+    The events are complete ('X') events; spans of the same thread nest by
+    time in the viewer, spans of other threads show on their own tracks.
+    """
+
+    def __init__(self):
+        self.events = []
+        self.pid = os.getpid()
+        self.start = time.time()
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def _tid(self):
+        thread = threading.current_thread()
+        with self._lock:
+            if thread.ident not in self._threads:
+                self._threads[thread.ident] = (len(self._threads) + 1,
+                                               thread.name)
+            return self._threads[thread.ident][0]
+
+    @contextlib.contextmanager
+    def span(self, name, category, args):
+        tid = self._tid()
+        start = time.time()
+        try:
+            yield args
+        except BaseException as e:
+            args['error'] = '%s: %s' % (e.__class__.__name__, e)
+            raise
+        finally:
+            end = time.time()
+            event = {
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': int((start - self.start) * 1000000),
+                'dur': int((end - start) * 1000000),
+                'pid': self.pid,
+                'tid': tid,
+                'args': args,
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def write(self, stream):
+        """Write the trace as JSON"""
+        with self._lock:
+            events = list(self.events)
+            threads = list(self._threads.values())
+        for tid, name in threads:
+            events.append({
+                'name': 'thread_name',
+                'ph': 'M',
+                'pid': self.pid,
+                'tid': tid,
+                'args': {'name': name},
+            })
+        json.dump(
+            {'traceEvents': events, 'displayTimeUnit': 'ms'},
+            stream,
+            default=str,
+        )
@@ -15,65 +15,269 @@
 
 """Common client utilities"""
 
+import inspect
+import logging
 import os
 import six
 import sys
+import threading
 import time
 import uuid
 
 from openstackclient.common import exceptions
+from openstackclient.common import timing
 from openstackclient.openstack.common import strutils
 
 
-def find_resource(manager, name_or_id):
-    """Helper for the _find_* methods."""
-
-    # Try to get entity as integer id
+LOG = logging.getLogger(__name__)
+
+# Managers that accept a server-side name filter in list(), by class.
+# The filters may be inexact (nova matches a regular expression) or
+# ignored by older servers, so the results are always matched again
+# against the name on the client side.
+_NAME_FILTERS = {
+    'novaclient.v1_1.servers.ServerManager':
+    lambda name: {'search_opts': {'name': name}},
+    'cinderclient.v1.volumes.VolumeManager':
+    lambda name: {'search_opts': {'display_name': name}},
+    'cinderclient.v1.volume_snapshots.SnapshotManager':
+    lambda name: {'search_opts': {'display_name': name}},
+    'glanceclient.v1.images.ImageManager':
+    lambda name: {'filters': {'name': name}},
+}
+
+# Managers whose resource IDs are always UUIDs, anything else is a name
+_UUID_ID_MANAGERS = (
+    'novaclient.v1_1.servers.ServerManager',
+    'cinderclient.v1.volumes.VolumeManager',
+    'cinderclient.v1.volume_snapshots.SnapshotManager',
+    'glanceclient.v1.images.ImageManager',
+)
+
+# Characters that make a name unusable as a nova name filter, which is
+# a regular expression
+_REGEX_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+
+def _manager_names(manager):
+    """Return the dotted names of the manager's class and its bases"""
+    return ['%s.%s' % (cls.__module__, cls.__name__)
+            for cls in type(manager).__mro__]
+
+
+def _name_filter(manager, name):
+    """Return the list() arguments that filter by name, or None"""
+    for class_name in _manager_names(manager):
+        if class_name in _NAME_FILTERS:
+            if (class_name.startswith('novaclient.')
+                    and _REGEX_CHARS.intersection(name)):
+                return None
+            return _NAME_FILTERS[class_name](name)
+    if hasattr(manager, 'build_url') and _accepts_kwargs(manager.list):
+        # keystoneclient v3 CrudManager passes list() arguments as filters,
+        # unless a subclass overrides list() without them
+        return {'name': name}
+    return None
+
+
+def _accepts_kwargs(func):
+    """Whether func takes arbitrary keyword arguments"""
     try:
-        if isinstance(name_or_id, int) or name_or_id.isdigit():
-            return manager.get(int(name_or_id))
-    except exceptions.NotFound:
-        pass
+        if hasattr(inspect, 'getfullargspec'):
+            return inspect.getfullargspec(func).varkw is not None
+        return inspect.getargspec(func).keywords is not None
+    except TypeError:
+        return False
 
-    # Try to get entity as uuid
-    try:
-        uuid.UUID(str(name_or_id))
-        return manager.get(name_or_id)
-    except (ValueError, exceptions.NotFound):
-        pass
 
-    # Try directly using the passed value
-    try:
-        return manager.get(name_or_id)
-    except Exception:
-        pass
+def _is_not_found(ex):
+    # NOTE(dtroyer): Each client library has its own NotFound exception
+    return (type(ex).__name__ in ('NotFound', 'HTTPNotFound')
+            or getattr(ex, 'http_status', None) == 404
+            or getattr(ex, 'code', None) == 404)
 
-    kwargs = {}
+
+def _name_attrs(manager):
+    name_attrs = ['name', 'display_name']
     if 'NAME_ATTR' in manager.resource_class.__dict__:
         # novaclient does this for oddball resources
-        kwargs[manager.resource_class.NAME_ATTR] = name_or_id
+        name_attrs.insert(0, manager.resource_class.NAME_ATTR)
+    return name_attrs
+
+
+def _has_name(resource, name, name_attrs):
+    return any(getattr(resource, attr, None) == name for attr in name_attrs)
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
+
+
+def _resolve(manager, name_or_id, call):
+    """Return (resource, True if it was found by name)"""
+
+    # Try to get entity as integer id
+    if isinstance(name_or_id, int) or name_or_id.isdigit():
+        try:
+            return call(manager.get, int(name_or_id)), False
+        except Exception as ex:
+            if not _is_not_found(ex):
+                raise
+        name_or_id = str(name_or_id)
+    else:
+        is_uuid = _is_uuid(name_or_id)
+
+        # Try to get entity as uuid or directly using the passed value,
+        # unless the manager's IDs are always UUIDs
+        if is_uuid or not set(_UUID_ID_MANAGERS).intersection(
+                _manager_names(manager)):
+            try:
+                return call(manager.get, name_or_id), False
+            except Exception as ex:
+                if is_uuid and not _is_not_found(ex):
+                    raise
+
+    # Finally try to find entity by name
+    kwargs = _name_filter(manager, name_or_id)
+    if kwargs is None:
+        candidates = call(manager.list)
     else:
-        kwargs['name'] = name_or_id
+        candidates = call(manager.list, **kwargs)
 
-    # finally try to find entity by name
+    name_attrs = _name_attrs(manager)
+    matches = [r for r in candidates if _has_name(r, name_or_id, name_attrs)]
+    if len(matches) == 1:
+        return matches[0], True
+
+    resource_name = manager.resource_class.__name__.lower()
+    if not matches:
+        msg = "No %s with a name or ID of '%s' exists." % \
+            (resource_name, name_or_id)
+    else:
+        msg = "More than one %s exists with the name '%s'." % \
+            (resource_name, name_or_id)
+    raise exceptions.CommandError(msg)
+
+
+# The resolution cache used by find_resource() in this thread
+_resolution = threading.local()
+
+
+def set_resolution_cache(cache, scope=None, invalidate=False):
+    """Set up the resolution cache for find_resource() in this thread
+
+    :param cache: a cache.ResolutionCache or None to not cache
+    :param scope: sequence identifying the cloud and project
+    :param invalidate: drop the cached names of all resources found
+                       rather than using the cache, for commands that
+                       delete or modify resources
+    """
+    _resolution.cache = cache
+    _resolution.scope = scope or ()
+    _resolution.invalidate = invalidate
+
+
+def _get_cached(manager, cache, key, name, call):
+    """Return the resource cached for key if it still has its name"""
+    try:
+        resource_id = cache.get(key)
+    except (IOError, OSError) as e:
+        LOG.debug('unable to read resolution cache: %s', e)
+        return None
+    if resource_id is None:
+        return None
     try:
-        return manager.find(**kwargs)
-    # FIXME(dtroyer): The exception to catch here is dependent on which
-    #                 client library the manager passed in belongs to.
-    #                 Eventually this should be pulled from a common set
-    #                 of client exceptions.
+        resource = call(manager.get, resource_id)
     except Exception as ex:
+        if _is_not_found(ex):
+            return None
+        raise
+    if _has_name(resource, name, _name_attrs(manager)):
+        return resource
+    return None
+
+
+def find_resource(manager, name_or_id):
+    """Helper for the _find_* methods.
+
+    The argument is classified locally so that it usually takes a single
+    request to resolve: a get() for things that look like IDs and a list()
+    with a server-side name filter for names.  Only managers without such
+    a filter fall back to listing the whole collection.  Names found by
+    listing are remembered in the resolution cache, if one is set up with
+    set_resolution_cache(), and later fetched directly by ID.
+    """
+
+    calls = [0]
+
+    def call(func, *args, **kwargs):
+        calls[0] += 1
+        return func(*args, **kwargs)
+
+    cache = getattr(_resolution, 'cache', None)
+    resource_type = _manager_names(manager)[0]
+    key = None
+    if (cache is not None and not isinstance(name_or_id, int)
+            and not name_or_id.isdigit() and not _is_uuid(name_or_id)):
+        key = cache.make_key(_resolution.scope, resource_type, name_or_id)
+
+    resource = None
+    by_name = False
+    with timing.span('find_resource', manager=resource_type,
+                     name_or_id=name_or_id) as args:
+        if key and not _resolution.invalidate:
+            resource = _get_cached(manager, cache, key, name_or_id, call)
         try:
-            return manager.find(display_name=name_or_id)
-        except Exception:
-            pass
-
-        if type(ex).__name__ == 'NotFound':
-            msg = "No %s with a name or ID of '%s' exists." % \
-                (manager.resource_class.__name__.lower(), name_or_id)
-            raise exceptions.CommandError(msg)
-        else:
-            raise
+            if resource is None:
+                resource, by_name = _resolve(manager, name_or_id, call)
+        finally:
+            args['calls'] = calls[0]
+            LOG.debug('resolution of %s took %d call(s)',
+                      name_or_id, calls[0])
+
+    resource_id = getattr(resource, 'id', None)
+    if cache is not None and resource_id is not None:
+        try:
+            if _resolution.invalidate:
+                cache.invalidate(resource_type, resource_id)
+            elif by_name and key:
+                cache.set(key, resource_type, resource_id)
+        except (IOError, OSError) as e:
+            LOG.debug('unable to update resolution cache: %s', e)
+    return resource
+
+
+def join_resources(items, manager, foreign_key, attrs):
+    """Copy attributes of related resources onto items
+
+    Lists the related resources once and joins them to the items locally,
+    rather than looking up the related resource of every item.  Related
+    resources missing from the listing are looked up once each with
+    find_resource().
+
+    :param items: resources to decorate
+    :param manager: manager of the related resources
+    :param foreign_key: attribute of the items holding the related ID
+    :param attrs: dict mapping the attribute to set on the items to the
+                  attribute of the related resource to copy
+    :returns: the items as a list
+    """
+    items = list(items)
+    if not items:
+        return items
+
+    related = dict((r.id, r) for r in manager.list())
+    for item in items:
+        related_id = getattr(item, foreign_key)
+        if related_id not in related:
+            related[related_id] = find_resource(manager, related_id)
+        for attr, related_attr in six.iteritems(attrs):
+            setattr(item, attr, getattr(related[related_id], related_attr))
+    return items
 
 
 def format_dict(data):
@@ -202,8 +406,10 @@ def wait_for_status(status_f,
     :rtype: True on success
     """
     while True:
-        res = status_f(res_id)
-        status = getattr(res, status_field, '').lower()
+        with timing.span('wait_for_status poll', id=res_id) as args:
+            res = status_f(res_id)
+            status = getattr(res, status_field, '').lower()
+            args['status'] = status
         if status in success_status:
             retval = True
             break
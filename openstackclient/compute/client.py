@@ -59,4 +59,7 @@ def make_client(instance):
             API_NAME)
         client.client.service_catalog = instance._service_catalog
     client.client.auth_token = instance._token
+
+    # Share the ClientManager connection pools
+    client.client.http = instance.create_http_session()
     return client
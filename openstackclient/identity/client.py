@@ -47,7 +47,9 @@ def make_client(instance):
             tenant_name=instance._project_name,
             tenant_id=instance._project_id,
             auth_url=instance._auth_url,
-            region_name=instance._region_name)
+            region_name=instance._region_name,
+            # Re-use a token already obtained, i.e. from the auth cache
+            auth_ref=instance.auth_ref)
         instance.auth_ref = client.auth_ref
     return client
 
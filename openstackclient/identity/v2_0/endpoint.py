@@ -117,13 +117,12 @@ class ListEndpoint(lister.Lister):
                        'PublicURL', 'AdminURL', 'InternalURL')
         else:
             columns = ('ID', 'Region', 'Service Name', 'Service Type')
-        data = identity_client.endpoints.list()
-
-        for ep in data:
-            service = utils.find_resource(
-                identity_client.services, ep.service_id)
-            ep.service_name = service.name
-            ep.service_type = service.type
+        data = utils.join_resources(
+            identity_client.endpoints.list(),
+            identity_client.services,
+            'service_id',
+            {'service_name': 'name', 'service_type': 'type'},
+        )
         return (columns,
                 (utils.get_item_properties(
                     s, columns,
@@ -19,11 +19,58 @@
 import logging
 import six
 
+from cliff import command
 from cliff import lister
 from cliff import show
 
+from openstackclient.common import exceptions
 from openstackclient.common import utils
 from openstackclient.object.v1.lib import container as lib_container
+from openstackclient.object.v1.lib import object as lib_object
+
+
+class DeleteContainer(command.Command):
+    """Delete containers"""
+
+    log = logging.getLogger(__name__ + '.DeleteContainer')
+
+    def get_parser(self, prog_name):
+        parser = super(DeleteContainer, self).get_parser(prog_name)
+        parser.add_argument(
+            'containers',
+            metavar='<container>',
+            nargs='+',
+            help='Container(s) to delete',
+        )
+        parser.add_argument(
+            '--recursive',
+            action='store_true',
+            default=False,
+            help='Delete the objects of the container(s) first, use -v to '
+                 'show the progress',
+        )
+        parser.add_argument(
+            '--workers',
+            metavar='<count>',
+            type=int,
+            default=lib_object.DEFAULT_DELETE_WORKERS,
+            help='Number of objects to delete at the same time when the '
+                 'cluster has no bulk delete (default %d)' %
+                 lib_object.DEFAULT_DELETE_WORKERS,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        self.log.debug('take_action(%s)' % parsed_args)
+
+        for container in parsed_args.containers:
+            lib_container.delete_container(
+                self.app.restapi,
+                self.app.client_manager.object.endpoint,
+                container,
+                recursive=parsed_args.recursive,
+                workers=parsed_args.workers,
+            )
 
 
 class ListContainer(lister.Lister):
@@ -87,6 +134,8 @@ class ListContainer(lister.Lister):
             kwargs['limit'] = parsed_args.limit
         if parsed_args.all:
             kwargs['full_listing'] = True
+        # Rows are formatted as the listing is received
+        kwargs['stream'] = True
 
         data = lib_container.list_containers(
             self.app.restapi,
@@ -101,6 +150,95 @@ class ListContainer(lister.Lister):
                 ) for s in data))
 
 
+class ListContainerDetails(lister.Lister):
+    """List the information of many containers"""
+
+    log = logging.getLogger(__name__ + '.ListContainerDetails')
+
+    def get_parser(self, prog_name):
+        parser = super(ListContainerDetails, self).get_parser(prog_name)
+        parser.add_argument(
+            'containers',
+            metavar='<container>',
+            nargs='*',
+            help='Container name(s) to display',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            default=False,
+            help='Display all containers',
+        )
+        parser.add_argument(
+            '--prefix',
+            metavar='<prefix>',
+            help='Display the containers whose name starts with <prefix>',
+        )
+        parser.add_argument(
+            '--workers',
+            metavar='<count>',
+            type=int,
+            default=lib_object.DEFAULT_SHOW_WORKERS,
+            help='Number of containers to look up at the same time '
+                 '(default %d)' % lib_object.DEFAULT_SHOW_WORKERS,
+        )
+        parser.add_argument(
+            '--unordered',
+            action='store_true',
+            default=False,
+            help='Display the containers as they are looked up rather '
+                 'than in order',
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        self.log.debug('take_action(%s)' % parsed_args)
+
+        names = parsed_args.containers
+        if parsed_args.all or parsed_args.prefix:
+            names = (c['name'] for c in lib_container.iter_containers(
+                self.app.restapi,
+                self.app.client_manager.object.endpoint,
+                prefix=parsed_args.prefix,
+            ))
+        elif not names:
+            raise exceptions.CommandError(
+                'Specify the containers to display, --all or --prefix')
+
+        columns = (
+            'Account',
+            'Container',
+            'Object Count',
+            'Bytes Used',
+            'Read ACL',
+            'Write ACL',
+            'Sync To',
+            'Sync Key',
+        )
+        results = lib_container.show_containers(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            names,
+            workers=parsed_args.workers,
+            ordered=not parsed_args.unordered,
+        )
+
+        def _rows():
+            failed = 0
+            for name, data, error in results:
+                if error is not None:
+                    self.log.error('unable to show %s: %s', name, error)
+                    failed += 1
+                    continue
+                yield utils.get_dict_properties(data, columns)
+            if failed:
+                raise exceptions.CommandError(
+                    '%d of the containers could not be displayed' % failed)
+
+        # Rows are written as the containers are looked up
+        return (columns, _rows())
+
+
 class ShowContainer(show.ShowOne):
     """Show container information"""
 
@@ -16,6 +16,10 @@
 
 """Object v1 API library"""
 
+from openstackclient.common import exceptions
+from openstackclient.common import restapi
+from openstackclient.object.v1.lib import object as lib_object
+
 try:
     from urllib.parse import urlparse
 except ImportError:
@@ -30,6 +34,7 @@ def list_containers(
     end_marker=None,
     prefix=None,
     full_listing=False,
+    stream=False,
 ):
     """Get containers in an account
 
@@ -41,47 +46,116 @@ def list_containers(
     :param prefix: prefix query
     :param full_listing: if True, return a full listing, else returns a max
                          of 10000 listings
+    :param stream: if True, return an iterator that decodes the containers
+                   as they are received instead of a list
     :returns: list of containers
     """
 
     if full_listing:
-        data = listing = list_containers(
+        rows = iter_containers(
             api,
             url,
-            marker,
-            limit,
-            end_marker,
-            prefix,
+            marker=marker,
+            limit=limit,
+            end_marker=end_marker,
+            prefix=prefix,
+            stream=stream,
         )
-        while listing:
-            marker = listing[-1]['name']
-            listing = list_containers(
-                api,
-                url,
-                marker,
-                limit,
-                end_marker,
-                prefix,
-            )
-            if listing:
-                data.extend(listing)
-        return data
+        return rows if stream else list(rows)
 
     object_url = url
     query = "format=json"
     if marker:
-        query += '&marker=%s' % marker
+        query += '&marker=%s' % lib_object.quote_value(marker)
     if limit:
         query += '&limit=%d' % limit
     if end_marker:
-        query += '&end_marker=%s' % end_marker
+        query += '&end_marker=%s' % lib_object.quote_value(end_marker)
     if prefix:
-        query += '&prefix=%s' % prefix
+        query += '&prefix=%s' % lib_object.quote_value(prefix)
     url = "%s?%s" % (object_url, query)
+    if stream:
+        response = api.request('GET', url, stream=True)
+        return restapi.iter_json_list(response)
     response = api.request('GET', url)
     return response.json()
 
 
+def iter_containers(
+    api,
+    url,
+    marker=None,
+    limit=None,
+    end_marker=None,
+    prefix=None,
+    stream=True,
+):
+    """Iterate over all containers in an account, one page at a time
+
+    :param limit: number of containers per page, the server default if None
+    :param stream: if True, decode each page as it is received
+    :returns: a generator of containers
+    """
+
+    while True:
+        last = None
+        count = 0
+        for last in list_containers(
+            api,
+            url,
+            marker,
+            limit,
+            end_marker,
+            prefix,
+            stream=stream,
+        ):
+            count += 1
+            yield last
+        if last is None or (limit and count < limit):
+            # A short page is the last one
+            return
+        marker = last['name']
+
+
+def delete_container(
+    api,
+    url,
+    container,
+    recursive=False,
+    workers=lib_object.DEFAULT_DELETE_WORKERS,
+):
+    """Delete a container
+
+    With recursive, the objects of the container are deleted first, with
+    the bulk-delete middleware if the cluster has it, as they are listed.
+
+    :param api: a restapi object
+    :param url: endpoint
+    :param container: name of container to delete
+    :param recursive: delete the objects of the container
+    :param workers: number of objects deleted at the same time without the
+                    bulk-delete middleware
+    :returns: dict of the numbers of objects deleted, not found and failed
+    """
+
+    summary = {'deleted': 0, 'not-found': 0, 'failed': 0}
+    if recursive:
+        summary = lib_object.delete_objects(
+            api,
+            url,
+            container,
+            (o['name'] for o in lib_object.iter_objects(api, url, container)),
+            bulk=True,
+            workers=workers,
+        )
+        if summary['failed']:
+            raise exceptions.CommandError(
+                '%d objects of %s could not be deleted' % (
+                    summary['failed'], container))
+    api.request('DELETE', "%s/%s" % (url, container))
+    return summary
+
+
 def show_container(
     api,
     url,
@@ -111,3 +185,29 @@ def show_container(
     data['sync_key'] = response.headers.get('x-container-sync-key', None)
 
     return data
+
+
+def show_containers(
+    api,
+    url,
+    containers,
+    workers=lib_object.DEFAULT_SHOW_WORKERS,
+    ordered=True,
+):
+    """Get the details of many containers, on up to workers threads
+
+    :param api: a restapi object
+    :param url: endpoint
+    :param containers: iterable of container names, e.g. of a listing
+    :param workers: number of containers shown at the same time
+    :param ordered: if False, return the containers as their details arrive
+    :returns: a generator of (container, dict of returned headers,
+              exception) tuples, with the dict None if the HEAD failed
+    """
+
+    return lib_object.imap_workers(
+        lambda container: show_container(api, url, container),
+        containers,
+        workers,
+        ordered=ordered,
+    )
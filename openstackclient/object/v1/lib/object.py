@@ -16,14 +16,81 @@
 
 """Object v1 API library"""
 
+import binascii
+import errno
+import hashlib
+import itertools
+import json
+import logging
+import mimetypes
+import mmap
+import os
+import stat
+import threading
+
 import six
 
+from openstackclient.common import exceptions
+from openstackclient.common import restapi
+from openstackclient.common import timing
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
 try:
+    from urllib.parse import quote
+    from urllib.parse import unquote
     from urllib.parse import urlparse
 except ImportError:
+    from urllib import quote
+    from urllib import unquote
     from urlparse import urlparse
 
 
+LOG = logging.getLogger(__name__)
+
+# Files larger than this are uploaded in segments of this size
+DEFAULT_SEGMENT_SIZE = 512 * 1024 * 1024
+
+DEFAULT_UPLOAD_WORKERS = 10
+
+# Objects are downloaded in ranges of at most this size
+DEFAULT_RANGE_SIZE = 64 * 1024 * 1024
+
+DEFAULT_DOWNLOAD_WORKERS = 10
+
+DEFAULT_SHOW_WORKERS = 10
+
+DEFAULT_USAGE_WORKERS = 10
+
+# Objects deleted per bulk-delete request when the cluster does not say,
+# the Swift default
+DEFAULT_BULK_DELETE_SIZE = 10000
+
+DEFAULT_DELETE_WORKERS = 10
+
+# Objects handed at once to the workers deleting one object at a time
+DELETE_BATCH_SIZE = 1000
+
+# Bytes read from a file at a time
+READ_CHUNK_SIZE = 64 * 1024
+
+# Pages of each shard listed ahead of the one being returned
+SHARD_READ_AHEAD = 10
+
+# Most single object listings made to find the shard boundaries
+MAX_SAMPLE_REQUESTS = 100
+
+# Sorts after every character of an object name
+_MAX_CHAR = u'\U0010ffff'
+
+# Sorts before every character allowed in an object name, names can not
+# contain NUL.  Like _MAX_CHAR it is percent-encoded by quote_value().
+_MIN_CHAR = u'\x01'
+
+
 def list_objects(
     api,
     url,
@@ -35,6 +102,8 @@ def list_objects(
     prefix=None,
     path=None,
     full_listing=False,
+    stream=False,
+    shards=None,
 ):
     """Get objects in a container
 
@@ -49,61 +118,314 @@ def list_objects(
     :param path: path query (equivalent: "delimiter=/" and "prefix=path/")
     :param full_listing: if True, return a full listing, else returns a max
                          of 10000 listings
+    :param stream: if True, return an iterator that decodes the objects as
+                   they are received instead of a list
+    :param shards: with full_listing, list up to this many ranges of the
+                   container concurrently, see iter_objects_sharded()
     :returns: a tuple of (response headers, a list of objects) The response
               headers will be a dict and all header names will be lowercase.
     """
 
+    if full_listing and shards and shards > 1 and not path:
+        rows = iter_objects_sharded(
+            api,
+            url,
+            container,
+            shards,
+            marker=marker,
+            limit=limit,
+            end_marker=end_marker,
+            delimiter=delimiter,
+            prefix=prefix,
+        )
+        return rows if stream else list(rows)
+
     if full_listing:
-        data = listing = list_objects(
+        rows = iter_objects(
             api,
             url,
             container,
-            marker,
-            limit,
-            end_marker,
-            delimiter,
-            prefix,
-            path,
+            marker=marker,
+            limit=limit,
+            end_marker=end_marker,
+            delimiter=delimiter,
+            prefix=prefix,
+            path=path,
+            stream=stream,
         )
-        while listing:
-            if delimiter:
-                marker = listing[-1].get('name', listing[-1].get('subdir'))
-            else:
-                marker = listing[-1]['name']
-            listing = list_objects(
-                api,
-                url,
-                container,
-                marker,
-                limit,
-                end_marker,
-                delimiter,
-                prefix,
-                path,
-            )
-            if listing:
-                data.extend(listing)
-        return data
+        return rows if stream else list(rows)
 
     object_url = url
     query = "format=json"
     if marker:
-        query += '&marker=%s' % marker
+        query += '&marker=%s' % quote_value(marker)
     if limit:
         query += '&limit=%d' % limit
     if end_marker:
-        query += '&end_marker=%s' % end_marker
+        query += '&end_marker=%s' % quote_value(end_marker)
     if delimiter:
-        query += '&delimiter=%s' % delimiter
+        query += '&delimiter=%s' % quote_value(delimiter)
     if prefix:
-        query += '&prefix=%s' % prefix
+        query += '&prefix=%s' % quote_value(prefix)
     if path:
-        query += '&path=%s' % path
+        query += '&path=%s' % quote_value(path)
     url = "%s/%s?%s" % (object_url, container, query)
+    if stream:
+        response = api.request('GET', url, stream=True)
+        return restapi.iter_json_list(response)
     response = api.request('GET', url)
     return response.json()
 
 
+def iter_objects(
+    api,
+    url,
+    container,
+    marker=None,
+    limit=None,
+    end_marker=None,
+    delimiter=None,
+    prefix=None,
+    path=None,
+    stream=True,
+):
+    """Iterate over all objects in a container, one page at a time
+
+    Each page is requested with the name of the last object, or subdir, of
+    the previous page as marker, so only one page is held in memory.
+
+    :param limit: number of objects per page, the server default if None
+    :param stream: if True, decode each page as it is received
+    :returns: a generator of objects
+    """
+
+    while True:
+        last = None
+        count = 0
+        for last in list_objects(
+            api,
+            url,
+            container,
+            marker,
+            limit,
+            end_marker,
+            delimiter,
+            prefix,
+            path,
+            stream=stream,
+        ):
+            count += 1
+            yield last
+        if last is None or (limit and count < limit):
+            # A short page is the last one
+            return
+        marker = last.get('name', last.get('subdir'))
+
+
+def _next_cells(api, url, container, base, after, end_marker, budget):
+    """Return the names, one character longer than base, starting objects
+
+    Each object listing of one name skips to the next character.
+
+    :param after: list the names after this one only
+    :param budget: one item list, the number of listings left
+    """
+    cells = []
+    marker = max(base, after or u'')
+    while budget[0] > 0:
+        budget[0] -= 1
+        page = list_objects(api, url, container, marker, 1, end_marker)
+        if not page or not page[0]['name'].startswith(base):
+            break
+        name = page[0]['name']
+        cell = name[:len(base) + 1]
+        if cell in cells:
+            # A name with _MAX_CHAR after cell, step over it
+            marker = name
+            continue
+        cells.append(cell)
+        marker = cell + _MAX_CHAR
+    return cells
+
+
+def shard_markers(
+    api,
+    url,
+    container,
+    shards,
+    marker=None,
+    end_marker=None,
+    delimiter=None,
+    prefix=None,
+):
+    """Return names that split the objects of a container into shards
+
+    The container is sampled with listings of a single object to find the
+    characters that follow the prefix, and the characters after those when
+    there are too few of them, up to MAX_SAMPLE_REQUESTS listings.  The
+    boundaries are spread over the names found.  They never contain the
+    delimiter after the prefix, so a subdir always falls in one shard.
+
+    :returns: a sorted list of at most shards - 1 names
+    """
+
+    prefix = prefix or u''
+    if not isinstance(prefix, six.text_type):
+        prefix = prefix.decode('utf-8')
+    if marker and not isinstance(marker, six.text_type):
+        marker = marker.decode('utf-8')
+
+    def usable(cell):
+        return not delimiter or delimiter not in cell[len(prefix):]
+
+    budget = [MAX_SAMPLE_REQUESTS]
+    base = prefix
+    while True:
+        cells = _next_cells(
+            api, url, container, base, marker, end_marker, budget)
+        # Skip the characters all names have in common
+        if len(cells) == 1 and usable(cells[0]):
+            base = cells[0]
+            continue
+        break
+
+    if len(cells) < shards:
+        refined = []
+        for cell in cells:
+            refined.append(cell)
+            if usable(cell):
+                refined.extend(_next_cells(
+                    api, url, container, cell, marker, end_marker, budget))
+        cells = refined
+
+    candidates = [c for c in cells if usable(c) and c > (marker or u'')]
+    if len(candidates) < 2:
+        return []
+    # No objects come before the first one
+    candidates = sorted(set(candidates))[1:]
+    count = len(candidates) + 1
+    if count > shards:
+        candidates = sorted(set(
+            candidates[(i * count) // shards - 1] for i in range(1, shards)
+        ))
+    return candidates
+
+
+def iter_objects_sharded(
+    api,
+    url,
+    container,
+    shards,
+    marker=None,
+    limit=None,
+    end_marker=None,
+    delimiter=None,
+    prefix=None,
+):
+    """Iterate over all objects in a container, listing shards concurrently
+
+    The container is split into ranges of names by shard_markers() and each
+    range is listed page by page on a thread of its own.  The objects are
+    returned in the same order as iter_objects(), reading up to
+    SHARD_READ_AHEAD pages of each of the following shards ahead.
+
+    :param shards: most ranges to list concurrently
+    :returns: a generator of objects
+    """
+
+    boundaries = shard_markers(
+        api,
+        url,
+        container,
+        shards,
+        marker=marker,
+        end_marker=end_marker,
+        delimiter=delimiter,
+        prefix=prefix,
+    )
+    if not boundaries:
+        for obj in iter_objects(
+            api,
+            url,
+            container,
+            marker=marker,
+            limit=limit,
+            end_marker=end_marker,
+            delimiter=delimiter,
+            prefix=prefix,
+        ):
+            yield obj
+        return
+
+    # Marker and end marker of each shard, a shard includes its boundary
+    ranges = []
+    start = marker
+    for boundary in boundaries:
+        ranges.append((start, boundary + _MIN_CHAR))
+        start = boundary
+    ranges.append((start, end_marker))
+
+    pages = [queue.Queue(SHARD_READ_AHEAD) for r in ranges]
+    stop = threading.Event()
+
+    def _put(shard, item):
+        while not stop.is_set():
+            try:
+                pages[shard].put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _list_shard(shard):
+        shard_marker, shard_end_marker = ranges[shard]
+        try:
+            with timing.span('list shard', marker=shard_marker,
+                             end_marker=shard_end_marker):
+                while True:
+                    page = list_objects(
+                        api,
+                        url,
+                        container,
+                        shard_marker,
+                        limit,
+                        shard_end_marker,
+                        delimiter,
+                        prefix,
+                    )
+                    if page and not _put(shard, page):
+                        return
+                    if not page or (limit and len(page) < limit):
+                        break
+                    shard_marker = page[-1].get(
+                        'name', page[-1].get('subdir'))
+        except Exception as e:
+            _put(shard, e)
+            return
+        _put(shard, None)
+
+    for shard in range(len(ranges)):
+        thread = threading.Thread(target=_list_shard, args=(shard,))
+        thread.daemon = True
+        thread.start()
+
+    try:
+        for shard in range(len(ranges)):
+            while True:
+                try:
+                    page = pages[shard].get(timeout=1)
+                except queue.Empty:
+                    continue
+                if page is None:
+                    break
+                if isinstance(page, Exception):
+                    raise page
+                for obj in page:
+                    yield obj
+    finally:
+        stop.set()
+
+
 def show_object(
     api,
     url,
@@ -118,7 +440,7 @@ def show_object(
     :returns: dict of object properties
     """
 
-    object_url = "%s/%s/%s" % (url, container, obj)
+    object_url = _object_url(url, container, obj)
     url_parts = urlparse(url)
     response = api.request('HEAD', object_url)
     data = {
@@ -146,3 +468,993 @@ def show_object(
             data[key.title()] = value
 
     return data
+
+
+def show_objects(
+    api,
+    url,
+    container,
+    objects,
+    workers=DEFAULT_SHOW_WORKERS,
+    ordered=True,
+):
+    """Get the details of many objects, on up to workers threads
+
+    :param api: a restapi object
+    :param url: endpoint
+    :param container: container of the objects
+    :param objects: iterable of object names, e.g. of a listing
+    :param workers: number of objects shown at the same time
+    :param ordered: if False, return the objects as their details arrive
+    :returns: a generator of (object, dict of object properties, exception)
+              tuples, with the dict None if the HEAD failed
+    """
+
+    return imap_workers(
+        lambda obj: show_object(api, url, container, obj),
+        objects,
+        workers,
+        ordered=ordered,
+    )
+
+
+class _FileRange(object):
+    """A file-like object of length bytes of a file, from offset
+
+    The data is read from the file as it is sent and its MD5 computed on
+    the way.  Seeking back to the start restarts the MD5, so a request can
+    be sent again.
+    """
+
+    def __init__(self, path, offset, length):
+        self.offset = offset
+        self.length = length
+        self._file = open(path, 'rb')
+        self._file.seek(offset)
+        self._position = 0
+        self._md5 = hashlib.md5()
+
+    def read(self, size=-1):
+        remaining = self.length - self._position
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        data = self._file.read(size)
+        self._position += len(data)
+        self._md5.update(data)
+        return data
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=0):
+        if whence == 1:
+            offset += self._position
+        elif whence == 2:
+            offset += self.length
+        self._position = max(0, min(offset, self.length))
+        self._file.seek(self.offset + self._position)
+        if self._position == 0:
+            self._md5 = hashlib.md5()
+
+    def hexdigest(self):
+        """Return the MD5 of the data, once all of it has been read"""
+        return self._md5.hexdigest()
+
+    def close(self):
+        self._file.close()
+
+
+def _file_md5(path, offset, length):
+    body = _FileRange(path, offset, length)
+    try:
+        while body.read(READ_CHUNK_SIZE):
+            pass
+    finally:
+        body.close()
+    return body.hexdigest()
+
+
+def _put_file_range(api, object_url, path, offset, length, headers):
+    """PUT length bytes of path from offset, return their MD5
+
+    :raises: CommandError if the server got different data
+    """
+    body = _FileRange(path, offset, length)
+    try:
+        response = api.request('PUT', object_url, data=body, headers=headers)
+    finally:
+        body.close()
+    md5 = body.hexdigest()
+    etag = response.headers.get('etag', '').strip('"')
+    if etag and etag != md5:
+        raise exceptions.CommandError(
+            'Upload of %s was corrupted: sent MD5 %s, stored %s' % (
+                object_url, md5, etag))
+    return md5
+
+
+def _run_workers(func, items, workers):
+    """Call func with each item on up to workers threads
+
+    :returns: the results, in the order of items
+    :raises: the first exception raised by func, once the calls in
+             progress have returned
+    """
+
+    results = [None] * len(items)
+    todo = queue.Queue()
+    for index in range(len(items)):
+        todo.put(index)
+    errors = []
+
+    def _worker():
+        while not errors:
+            try:
+                index = todo.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[index] = func(items[index])
+            except Exception as e:
+                errors.append(e)
+
+    threads = []
+    for i in range(min(max(1, workers), len(items))):
+        thread = threading.Thread(target=_worker)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+    try:
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(1)
+    except BaseException:
+        # Stop the workers from starting on more items
+        errors.append(None)
+        raise
+    if errors:
+        raise errors[0]
+    return results
+
+
+def imap_workers(func, items, workers, ordered=True):
+    """Call func with each item on up to workers threads, as a generator
+
+    items may be an iterator, e.g. of a listing; it is read as the
+    workers free up, so only about workers items are held at a time when
+    not ordered.
+
+    :param ordered: if True, return the results in the order of items,
+                    else as the calls complete
+    :returns: a generator of (item, result, exception) tuples, with the
+              exception raised by func or None
+    :raises: the exception raised reading items
+    """
+
+    items = iter(items)
+    lock = threading.Lock()
+    done = queue.Queue(maxsize=max(1, workers) * 2)
+    stop = threading.Event()
+    counter = itertools.count()
+
+    def _put(value):
+        while not stop.is_set():
+            try:
+                done.put(value, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def _worker():
+        while not stop.is_set():
+            try:
+                with lock:
+                    index = next(counter)
+                    item = next(items)
+            except StopIteration:
+                break
+            except Exception as e:
+                _put((None, None, None, e))
+                break
+            try:
+                _put((index, item, func(item), None))
+            except Exception as e:
+                _put((index, item, None, e))
+        _put(None)
+
+    threads = []
+    for i in range(max(1, workers)):
+        thread = threading.Thread(target=_worker)
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    pending = {}
+    next_index = 0
+    running = len(threads)
+    try:
+        while running:
+            # A timeout keeps the waits on worker threads interruptible
+            # on Python 2
+            try:
+                value = done.get(timeout=1)
+            except queue.Empty:
+                continue
+            if value is None:
+                running -= 1
+                continue
+            index, item, result, error = value
+            if index is None:
+                raise error
+            if not ordered:
+                yield item, result, error
+                continue
+            pending[index] = (item, result, error)
+            while next_index in pending:
+                yield pending.pop(next_index)
+                next_index += 1
+    finally:
+        stop.set()
+
+
+def _upload_segments(
+    api,
+    url,
+    path,
+    segment_container,
+    segments,
+    existing,
+    workers,
+):
+    """Upload segments concurrently, return their MD5s
+
+    :param segments: list of (name, offset, length) tuples
+    :param existing: dict of the segments already stored by name
+    """
+
+    headers = {'Content-Type': 'application/octet-stream'}
+
+    def _upload(segment):
+        name, offset, length = segment
+        stored = existing.get(name)
+        if stored is not None and stored['bytes'] == length:
+            md5 = _file_md5(path, offset, length)
+            if md5 == stored['hash']:
+                LOG.debug('segment %s is already uploaded', name)
+                return md5
+        with timing.span('upload segment', segment=name, bytes=length):
+            return _put_file_range(
+                api,
+                _object_url(url, segment_container, name),
+                path,
+                offset,
+                length,
+                headers,
+            )
+
+    return _run_workers(_upload, segments, workers)
+
+
+def create_object(
+    api,
+    url,
+    container,
+    path,
+    obj=None,
+    segment_size=DEFAULT_SEGMENT_SIZE,
+    segment_container=None,
+    manifest='slo',
+    workers=DEFAULT_UPLOAD_WORKERS,
+):
+    """Upload a file, in segments if it is larger than segment_size
+
+    Segments are uploaded concurrently, straight from the file, and named
+    after the size and modification time of the file, so that uploading
+    the same file again only sends the segments that are missing or
+    differ.  The segments are then joined by a manifest.
+
+    :param api: a restapi object
+    :param url: endpoint
+    :param container: name of the container to upload to
+    :param path: name of the file to upload
+    :param obj: object name, the file name if None
+    :param segment_size: size of the segments in bytes, 0 to never segment
+    :param segment_container: container of the segments, default is
+                              <container>_segments
+    :param manifest: 'slo' for a static large object manifest, 'dlo' for a
+                     dynamic one
+    :param workers: number of segments uploaded at the same time
+    :returns: dict of object properties
+    """
+
+    obj = obj or path
+    size = os.path.getsize(path)
+    content_type = (mimetypes.guess_type(path)[0] or
+                    'application/octet-stream')
+    object_url = _object_url(url, container, obj)
+    data = {
+        'container': container,
+        'object': obj,
+        'content-length': size,
+        'content-type': content_type,
+    }
+
+    if not segment_size or size <= segment_size:
+        data['etag'] = _put_file_range(
+            api,
+            object_url,
+            path,
+            0,
+            size,
+            {'Content-Type': content_type},
+        )
+        return data
+
+    segment_container = segment_container or container + '_segments'
+    prefix = '%s/%f/%d/%d/' % (obj, os.path.getmtime(path), size,
+                               segment_size)
+    segments = [
+        ('%s%08d' % (prefix, index), offset, min(segment_size, size - offset))
+        for index, offset in enumerate(range(0, size, segment_size))
+    ]
+
+    api.request('PUT', _object_url(url, segment_container))
+    existing = dict(
+        (o['name'], o) for o in iter_objects(
+            api, url, segment_container, prefix=prefix)
+    )
+    etags = _upload_segments(
+        api,
+        url,
+        path,
+        segment_container,
+        segments,
+        existing,
+        workers,
+    )
+
+    if manifest == 'dlo':
+        response = api.request(
+            'PUT',
+            object_url,
+            headers={
+                'Content-Type': content_type,
+                'X-Object-Manifest': quote_value(
+                    u'%s/%s' % (_text(segment_container), _text(prefix))),
+            },
+        )
+    else:
+        body = [
+            {
+                'path': '/%s/%s' % (segment_container, name),
+                'etag': etag,
+                'size_bytes': length,
+            }
+            for (name, offset, length), etag in zip(segments, etags)
+        ]
+        response = api.request(
+            'PUT',
+            object_url + '?multipart-manifest=put',
+            data=json.dumps(body),
+            headers={'Content-Type': content_type},
+        )
+    data['etag'] = response.headers.get('etag', '').strip('"')
+    data['segments'] = len(segments)
+    data['segment-container'] = segment_container
+    return data
+
+
+def _object_segments(api, url, container, obj, data):
+    """Return the (url, bytes, MD5) of the parts of an object, in order
+
+    The segments of large objects are fetched directly and each one is
+    verified against its own MD5.  The MD5 is None if it is not known.
+
+    :param data: the object properties returned by show_object()
+    """
+
+    object_url = _object_url(url, container, obj)
+    size = int(data.get('content-length') or 0)
+
+    manifest = data.get('x-object-manifest')
+    if manifest:
+        segment_container, prefix = unquote(manifest).split('/', 1)
+        return [
+            (_object_url(url, segment_container, o['name']),
+             o['bytes'],
+             o['hash'])
+            for o in iter_objects(api, url, segment_container, prefix=prefix)
+        ]
+
+    if data.get('X-Static-Large-Object', '').lower() == 'true':
+        response = api.request('GET', object_url + '?multipart-manifest=get')
+        segments = response.json()
+        if not any(s.get('sub_slo') or s.get('range') for s in segments):
+            return [(url + quote(_text(s['name']).encode('utf-8')),
+                     s['bytes'],
+                     s['hash'])
+                    for s in segments]
+        # Nested manifests and segment ranges are left to the server, the
+        # ETag of the manifest is not the MD5 of the data
+        return [(object_url, size, None)]
+
+    return [(object_url, size, (data.get('etag') or '').strip('"') or None)]
+
+
+def _fetch_range(api, source, offset, length, target, position):
+    """GET length bytes of source from offset into target at position"""
+
+    headers = {'Range': 'bytes=%d-%d' % (offset, offset + length - 1)}
+    response = api.request('GET', source, headers=headers, stream=True)
+    try:
+        if response.status_code != 206 and offset != 0:
+            raise exceptions.CommandError(
+                '%s does not support range requests' % source)
+        end = position + length
+        for chunk in response.iter_content(READ_CHUNK_SIZE):
+            chunk = chunk[:end - position]
+            target[position:position + len(chunk)] = chunk
+            position += len(chunk)
+            if position == end:
+                break
+    finally:
+        response.close()
+    if position != end:
+        raise exceptions.CommandError(
+            '%s ended %d bytes early' % (source, end - position))
+
+
+def save_object(
+    api,
+    url,
+    container,
+    obj,
+    file=None,
+    range_size=DEFAULT_RANGE_SIZE,
+    workers=DEFAULT_DOWNLOAD_WORKERS,
+):
+    """Download an object into a file with concurrent range requests
+
+    The file is preallocated and memory-mapped, each range is written in
+    place as it is received.  The data is checked against the MD5 of the
+    object, or of each of its segments for large objects, in order as the
+    ranges complete.  The file is only replaced once all of the data has
+    been received and verified.
+
+    :param api: a restapi object
+    :param url: endpoint
+    :param container: name of the container of the object
+    :param obj: name of the object to download
+    :param file: name of the file to write, the object name if None
+    :param range_size: largest range requested at a time, in bytes
+    :param workers: number of ranges downloaded at the same time
+    :returns: the name of the file
+    """
+
+    file = file or obj
+    data = show_object(api, url, container, obj)
+    segments = _object_segments(api, url, container, obj, data)
+    size = sum(length for source, length, md5 in segments)
+
+    # (source, offset, length, position) of the ranges, and the position
+    # each segment ends at with its MD5
+    ranges = []
+    checks = []
+    position = 0
+    for source, length, md5 in segments:
+        for offset in range(0, length, range_size):
+            count = min(range_size, length - offset)
+            ranges.append((source, offset, count, position + offset))
+        position += length
+        checks.append((position, md5, source))
+
+    dirname = os.path.dirname(file)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+    fd, tmp_path = _mkstemp(
+        dirname or '.',
+        '.' + os.path.basename(file) + '-',
+    )
+    target = None
+    try:
+        if size:
+            if hasattr(os, 'posix_fallocate'):
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+            target = mmap.mmap(fd, size)
+
+        def _fetch(index):
+            source, offset, length, position = ranges[index]
+            with timing.span('download range', source=source,
+                             offset=offset, bytes=length):
+                _fetch_range(api, source, offset, length, target, position)
+
+        # Hash the data in order while the following ranges download
+        results = imap_workers(_fetch, range(len(ranges)), workers)
+        try:
+            next_check = 0
+            hashed = 0
+            md5 = hashlib.md5()
+            for index, result, error in itertools.chain(
+                    results, [(None, None, None)]):
+                while (next_check < len(checks) and
+                       checks[next_check][0] == hashed):
+                    end, expected, source = checks[next_check]
+                    if expected is not None and md5.hexdigest() != expected:
+                        raise exceptions.CommandError(
+                            'Download of %s was corrupted: MD5 %s, '
+                            'expected %s' % (source, md5.hexdigest(),
+                                             expected))
+                    md5 = hashlib.md5()
+                    next_check += 1
+                if error is not None:
+                    raise error
+                if index is None:
+                    break
+                source, offset, length, position = ranges[index]
+                end = position + length
+                for start in range(position, end, READ_CHUNK_SIZE):
+                    md5.update(target[start:min(start + READ_CHUNK_SIZE,
+                                                end)])
+                hashed = end
+        finally:
+            # Stop the workers from starting more ranges
+            results.close()
+
+        if target is not None:
+            target.flush()
+        os.close(fd)
+        fd = None
+        os.rename(tmp_path, file)
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        os.unlink(tmp_path)
+        raise
+    finally:
+        if target is not None:
+            target.close()
+    return file
+
+
+def _mkstemp(dirname, prefix):
+    """Create a temporary file like tempfile.mkstemp()
+
+    mkstemp() only lets the owner read the file.  Creating it with mode
+    0666 lets the umask decide instead, without changing the umask of the
+    whole process.
+
+    :returns: the file descriptor and the name of the file
+    """
+    for attempt in range(100):
+        path = os.path.join(
+            dirname,
+            prefix + binascii.hexlify(os.urandom(6)).decode('ascii'),
+        )
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o666)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+            continue
+        return fd, path
+    raise IOError(errno.EEXIST, 'No usable temporary file name found')
+
+
+def _local_files(directory):
+    """Return the (name, path, size, mtime) of the files under directory
+
+    Names are relative to directory with / as separator.
+    """
+
+    if not isinstance(directory, six.text_type):
+        directory = directory.decode('utf-8')
+    files = []
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            try:
+                st = os.stat(path)
+            except OSError:
+                # Removed, or a dangling link
+                continue
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            name = os.path.relpath(path, directory).replace(os.sep, '/')
+            files.append((name, path, st.st_size, st.st_mtime))
+    return files
+
+
+def sync_objects(
+    api,
+    url,
+    container,
+    directory,
+    prefix=None,
+    delete=False,
+    dry_run=False,
+    hash_index=None,
+    segment_size=DEFAULT_SEGMENT_SIZE,
+    workers=DEFAULT_UPLOAD_WORKERS,
+):
+    """Upload the files of a directory that differ from a container
+
+    A file is unchanged if an object of the same name has the ETag the
+    file was last uploaded with, or has the same size and an ETag that is
+    the MD5 of the file.  The MD5 of a file is only computed again once
+    its size or modification time change, see cache.HashIndex.  Files are
+    compared and uploaded on up to workers threads, an upload that fails
+    does not stop the others.
+
+    :param api: a restapi object
+    :param url: endpoint
+    :param container: name of the container to sync to
+    :param directory: local directory to sync from
+    :param prefix: prefix of the object names of the files
+    :param delete: delete the objects under prefix with no file
+    :param dry_run: only count the changes
+    :param hash_index: a cache.HashIndex or None
+    :param segment_size: see create_object()
+    :param workers: number of files compared or uploaded at the same time
+    :returns: dict of the numbers of objects and bytes uploaded, deleted,
+              unchanged and failed
+    """
+
+    prefix = prefix or u''
+    if not isinstance(prefix, six.text_type):
+        prefix = prefix.decode('utf-8')
+    remote = dict(
+        (o['name'], o) for o in iter_objects(
+            api, url, container, prefix=prefix or None)
+    )
+    summary = {
+        'uploaded': 0,
+        'uploaded-bytes': 0,
+        'deleted': 0,
+        'deleted-bytes': 0,
+        'unchanged': 0,
+        'unchanged-bytes': 0,
+        'failed': 0,
+    }
+    lock = threading.Lock()
+
+    def _count(action, size):
+        with lock:
+            summary[action] += 1
+            if action != 'failed':
+                summary[action + '-bytes'] += size
+
+    def _unchanged(stored, path, size, mtime):
+        md5, etag = (None, None)
+        if hash_index is not None:
+            md5, etag = hash_index.get(path, size, mtime)
+        stored_etag = stored['hash'].strip('"')
+        if etag and etag == stored_etag:
+            return True
+        if stored['bytes'] != size:
+            return False
+        if md5 is None:
+            md5 = _file_md5(path, 0, size)
+            if hash_index is not None:
+                hash_index.set(path, size, mtime, md5, etag)
+        return md5 == stored_etag
+
+    def _sync(item):
+        name, path, size, mtime = item
+        try:
+            stored = remote.get(name)
+            if stored is not None and _unchanged(stored, path, size, mtime):
+                _count('unchanged', size)
+                return
+            LOG.info('%supload %s', 'would ' if dry_run else '', name)
+            if not dry_run:
+                data = create_object(
+                    api,
+                    url,
+                    container,
+                    path,
+                    obj=name,
+                    segment_size=segment_size,
+                    workers=1,
+                )
+                if hash_index is not None:
+                    hash_index.set(
+                        path,
+                        size,
+                        mtime,
+                        None if 'segments' in data else data['etag'],
+                        data['etag'],
+                    )
+            _count('uploaded', size)
+        except Exception as e:
+            LOG.error('unable to upload %s: %s', name, e)
+            _count('failed', size)
+
+    def _delete(stored):
+        name = stored['name']
+        try:
+            LOG.info('%sdelete %s', 'would ' if dry_run else '', name)
+            if not dry_run:
+                api.request('DELETE', _object_url(url, container, name))
+            _count('deleted', stored['bytes'])
+        except Exception as e:
+            LOG.error('unable to delete %s: %s', name, e)
+            _count('failed', stored['bytes'])
+
+    files = [
+        (prefix + name, path, size, mtime)
+        for name, path, size, mtime in _local_files(directory)
+    ]
+    _run_workers(_sync, files, workers)
+    if delete:
+        names = set(f[0] for f in files)
+        _run_workers(
+            _delete,
+            [o for n, o in sorted(remote.items()) if n not in names],
+            workers,
+        )
+    return summary
+
+
+def _object_url(url, container, obj=None):
+    """Return the URL of an object, or of the container if obj is None
+
+    The names are percent-encoded so that #, ? and % are sent as part of
+    the path rather than ending it or being decoded by Swift.
+    """
+    path = _text(container)
+    if obj is not None:
+        path = u'%s/%s' % (path, _text(obj))
+    return '%s/%s' % (url, quote(path.encode('utf-8')))
+
+
+def quote_value(value):
+    """Percent-encode a query string value, text or UTF-8 bytes"""
+    return quote(_text(value).encode('utf-8'))
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    return value
+
+
+def bulk_delete_size(api, url):
+    """Return the most objects deleted per bulk-delete request
+
+    The limit is read from the /info of the cluster.  If the cluster does
+    not publish its /info the Swift default is returned, delete_objects()
+    then learns whether the middleware is there from its first request.
+
+    :param api: a restapi object
+    :param url: endpoint
+    :returns: the limit, 0 if the cluster has no bulk-delete middleware
+    """
+
+    url_parts = urlparse(url)
+    info_url = '%s://%s%s/info' % (
+        url_parts.scheme,
+        url_parts.netloc,
+        # Drop the version and account
+        url_parts.path.rstrip('/').rsplit('/', 2)[0],
+    )
+    try:
+        info = api.request('GET', info_url).json()
+    except Exception as e:
+        LOG.debug('unable to read %s: %s', info_url, e)
+        return DEFAULT_BULK_DELETE_SIZE
+    if 'bulk_delete' not in info:
+        return 0
+    return int(info['bulk_delete'].get(
+        'max_deletes_per_request', DEFAULT_BULK_DELETE_SIZE))
+
+
+def _bulk_delete(api, url, container, names):
+    """Delete names with one bulk-delete request
+
+    :returns: the decoded response, None if the middleware is absent
+    """
+
+    container = _text(container)
+    body = '\n'.join(
+        quote((u'/%s/%s' % (container, _text(n))).encode('utf-8'))
+        for n in names
+    )
+    try:
+        response = api.request(
+            'POST',
+            url + '?bulk-delete',
+            data=body,
+            headers={
+                'Content-Type': 'text/plain',
+                'Accept': 'application/json',
+            },
+        )
+        result = response.json()
+    except Exception as e:
+        LOG.debug('bulk delete failed: %s', e)
+        return None
+    if not isinstance(result, dict) or 'Number Deleted' not in result:
+        # The account answered the POST itself
+        return None
+    return result
+
+
+def delete_objects(
+    api,
+    url,
+    container,
+    names,
+    bulk=False,
+    workers=DEFAULT_DELETE_WORKERS,
+):
+    """Delete objects from a container
+
+    names may be a generator, e.g. of a listing, it is read one batch at a
+    time.  With bulk, each batch is deleted with one request to the
+    bulk-delete middleware, as large as the cluster allows; without it, or
+    when the cluster has no such middleware, the objects of a batch are
+    deleted one at a time on up to workers threads.  Objects that can not
+    be deleted are logged and do not stop the others.
+
+    :param api: a restapi object
+    :param url: endpoint
+    :param container: name of the container of the objects
+    :param names: iterable of object names
+    :param bulk: use the bulk-delete middleware if available
+    :param workers: number of objects deleted at the same time
+    :returns: dict of the numbers of objects deleted, not found and failed
+    """
+
+    summary = {'deleted': 0, 'not-found': 0, 'failed': 0}
+    batch_size = bulk_delete_size(api, url) if bulk else 0
+    if not batch_size:
+        bulk = False
+        batch_size = DELETE_BATCH_SIZE
+
+    def _delete(name):
+        try:
+            api.request('DELETE', _object_url(url, container, name))
+        except Exception as e:
+            response = getattr(e, 'response', None)
+            if response is not None and response.status_code == 404:
+                return 'not-found'
+            LOG.error('unable to delete %s: %s', name, e)
+            return 'failed'
+        return 'deleted'
+
+    names = iter(names)
+    while True:
+        batch = list(itertools.islice(names, batch_size))
+        if not batch:
+            break
+        result = None
+        if bulk:
+            with timing.span('bulk delete', objects=len(batch)):
+                result = _bulk_delete(api, url, container, batch)
+            if result is None:
+                LOG.info('bulk delete is not available, deleting objects '
+                         'one at a time')
+                bulk = False
+                batch_size = DELETE_BATCH_SIZE
+        if result is None:
+            for status in _run_workers(_delete, batch, workers):
+                summary[status] += 1
+        else:
+            deleted = result['Number Deleted']
+            not_found = result.get('Number Not Found', 0)
+            errors = result.get('Errors') or []
+            prefix = u'/%s/' % _text(container)
+            for name, status in errors:
+                name = _text(unquote(name))
+                if name.startswith(prefix):
+                    name = name[len(prefix):]
+                LOG.error('unable to delete %s: %s', name, status)
+            failed = len(batch) - deleted - not_found
+            if failed > len(errors):
+                LOG.error('unable to delete %d objects: %s %s',
+                          failed - len(errors),
+                          result.get('Response Status'),
+                          result.get('Response Body'))
+            summary['deleted'] += deleted
+            summary['not-found'] += not_found
+            summary['failed'] += failed
+        LOG.info('deleted %d objects from %s, %d not found, %d failed',
+                 summary['deleted'], container, summary['not-found'],
+                 summary['failed'])
+    return summary
+
+
+def object_usage(
+    api,
+    url,
+    container,
+    prefix=None,
+    delimiter='/',
+    depth=None,
+    workers=DEFAULT_USAGE_WORKERS,
+):
+    """Total the objects and bytes under each pseudo-directory
+
+    The pseudo-directories are found by listing with delimiter, each one
+    is listed on its own on up to workers threads.  Below depth levels a
+    pseudo-directory is listed without delimiter and totalled as a whole.
+
+    :param api: a restapi object
+    :param url: endpoint
+    :param container: name of the container
+    :param prefix: only total the objects whose name starts with prefix
+    :param delimiter: separator of the pseudo-directories in object names
+    :param depth: most levels of pseudo-directories below prefix reported
+    :param workers: number of pseudo-directories listed at the same time
+    :returns: a generator of (prefix, objects, bytes) tuples, each returned
+              once all of its pseudo-directories are totalled; the last
+              one is the total of prefix
+    """
+
+    todo = queue.Queue()
+    # Prefix: [objects, bytes, listings still running, parent prefix]
+    nodes = {}
+
+    def _prefixes():
+        while True:
+            item = todo.get()
+            if item is None:
+                return
+            yield item
+
+    def _add(node_prefix, level, parent):
+        nodes[node_prefix] = [0, 0, 1, parent]
+        todo.put((node_prefix, level))
+
+    def _list(item):
+        node_prefix, level = item
+        flat = depth is not None and level >= depth
+        objects = 0
+        size = 0
+        subdirs = []
+        with timing.span('list usage', prefix=node_prefix):
+            for obj in iter_objects(
+                api,
+                url,
+                container,
+                prefix=node_prefix or None,
+                delimiter=None if flat else delimiter,
+            ):
+                if 'subdir' in obj:
+                    subdirs.append(obj['subdir'])
+                else:
+                    objects += 1
+                    size += obj['bytes']
+        return objects, size, subdirs
+
+    _add(prefix or '', 0, None)
+    results = imap_workers(_list, _prefixes(), workers, ordered=False)
+    try:
+        for (node_prefix, level), result, error in results:
+            if error is not None:
+                raise error
+            objects, size, subdirs = result
+            node = nodes[node_prefix]
+            node[0] += objects
+            node[1] += size
+            node[2] += len(subdirs) - 1
+            for subdir in subdirs:
+                _add(subdir, level + 1, node_prefix)
+            # Roll the finished subtrees up into their parents
+            while node_prefix is not None and nodes[node_prefix][2] == 0:
+                objects, size, running, parent = nodes.pop(node_prefix)
+                yield node_prefix, objects, size
+                if parent is not None:
+                    nodes[parent][0] += objects
+                    nodes[parent][1] += size
+                    nodes[parent][2] -= 1
+                node_prefix = parent
+            if not nodes:
+                break
+    finally:
+        results.close()
+        # Lets the worker waiting for a prefix finish
+        todo.put(None)
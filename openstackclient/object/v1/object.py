@@ -19,13 +19,141 @@
 import logging
 import six
 
+from cliff import command
 from cliff import lister
 from cliff import show
 
+from openstackclient.common import cache
+from openstackclient.common import exceptions
 from openstackclient.common import utils
 from openstackclient.object.v1.lib import object as lib_object
 
 
+class CreateObject(show.ShowOne):
+    """Upload object to container"""
+
+    log = logging.getLogger(__name__ + '.CreateObject')
+
+    def get_parser(self, prog_name):
+        parser = super(CreateObject, self).get_parser(prog_name)
+        parser.add_argument(
+            'container',
+            metavar='<container>',
+            help='Container to upload to',
+        )
+        parser.add_argument(
+            'file',
+            metavar='<file>',
+            help='Local file to upload',
+        )
+        parser.add_argument(
+            '--name',
+            metavar='<name>',
+            help='Object name (default is <file>)',
+        )
+        parser.add_argument(
+            '--segment-size',
+            metavar='<bytes>',
+            type=int,
+            default=lib_object.DEFAULT_SEGMENT_SIZE,
+            help='Upload files larger than <bytes> in segments of <bytes>, '
+                 '0 to never segment (default %d)' %
+                 lib_object.DEFAULT_SEGMENT_SIZE,
+        )
+        parser.add_argument(
+            '--segment-container',
+            metavar='<container>',
+            help='Container for the segments (default is '
+                 '<container>_segments)',
+        )
+        parser.add_argument(
+            '--manifest',
+            metavar='<type>',
+            choices=['slo', 'dlo'],
+            default='slo',
+            help='Join segments with a static (slo, default) or dynamic '
+                 '(dlo) large object manifest',
+        )
+        parser.add_argument(
+            '--workers',
+            metavar='<count>',
+            type=int,
+            default=lib_object.DEFAULT_UPLOAD_WORKERS,
+            help='Number of segments to upload at the same time '
+                 '(default %d)' % lib_object.DEFAULT_UPLOAD_WORKERS,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        self.log.debug('take_action(%s)' % parsed_args)
+
+        data = lib_object.create_object(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            parsed_args.container,
+            parsed_args.file,
+            obj=parsed_args.name,
+            segment_size=parsed_args.segment_size,
+            segment_container=parsed_args.segment_container,
+            manifest=parsed_args.manifest,
+            workers=parsed_args.workers,
+        )
+
+        return zip(*sorted(six.iteritems(data)))
+
+
+class DeleteObject(command.Command):
+    """Delete objects"""
+
+    log = logging.getLogger(__name__ + '.DeleteObject')
+
+    def get_parser(self, prog_name):
+        parser = super(DeleteObject, self).get_parser(prog_name)
+        parser.add_argument(
+            'container',
+            metavar='<container>',
+            help='Container of the objects',
+        )
+        parser.add_argument(
+            'objects',
+            metavar='<object>',
+            nargs='+',
+            help='Object(s) to delete',
+        )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            default=False,
+            help='Delete the objects with bulk delete requests if the '
+                 'cluster supports them',
+        )
+        parser.add_argument(
+            '--workers',
+            metavar='<count>',
+            type=int,
+            default=lib_object.DEFAULT_DELETE_WORKERS,
+            help='Number of objects to delete at the same time without '
+                 'bulk delete (default %d)' %
+                 lib_object.DEFAULT_DELETE_WORKERS,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        self.log.debug('take_action(%s)' % parsed_args)
+
+        data = lib_object.delete_objects(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            parsed_args.container,
+            parsed_args.objects,
+            bulk=parsed_args.bulk,
+            workers=parsed_args.workers,
+        )
+        if data['failed']:
+            raise exceptions.CommandError(
+                '%d of the objects could not be deleted' % data['failed'])
+
+
 class ListObject(lister.Lister):
     """List objects"""
 
@@ -76,6 +204,13 @@ class ListObject(lister.Lister):
             default=False,
             help='List all objects in container (default is 10000)',
         )
+        parser.add_argument(
+            '--shards',
+            metavar='<shards>',
+            type=int,
+            help='With --all, list up to <shards> ranges of the container '
+                 'concurrently',
+        )
         return parser
 
     def take_action(self, parsed_args):
@@ -105,6 +240,10 @@ class ListObject(lister.Lister):
             kwargs['limit'] = parsed_args.limit
         if parsed_args.all:
             kwargs['full_listing'] = True
+            if parsed_args.shards:
+                kwargs['shards'] = parsed_args.shards
+        # Rows are formatted as the listing is received
+        kwargs['stream'] = True
 
         data = lib_object.list_objects(
             self.app.restapi,
@@ -120,6 +259,215 @@ class ListObject(lister.Lister):
                 ) for s in data))
 
 
+class ListObjectDetails(lister.Lister):
+    """List the information of many objects"""
+
+    log = logging.getLogger(__name__ + '.ListObjectDetails')
+
+    def get_parser(self, prog_name):
+        parser = super(ListObjectDetails, self).get_parser(prog_name)
+        parser.add_argument(
+            'container',
+            metavar='<container>',
+            help='Container name for objects to display',
+        )
+        parser.add_argument(
+            'objects',
+            metavar='<object>',
+            nargs='*',
+            help='Object name(s) to display',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            default=False,
+            help='Display all objects of the container',
+        )
+        parser.add_argument(
+            '--prefix',
+            metavar='<prefix>',
+            help='Display the objects whose name starts with <prefix>',
+        )
+        parser.add_argument(
+            '--workers',
+            metavar='<count>',
+            type=int,
+            default=lib_object.DEFAULT_SHOW_WORKERS,
+            help='Number of objects to look up at the same time '
+                 '(default %d)' % lib_object.DEFAULT_SHOW_WORKERS,
+        )
+        parser.add_argument(
+            '--unordered',
+            action='store_true',
+            default=False,
+            help='Display the objects as they are looked up rather than '
+                 'in order',
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        self.log.debug('take_action(%s)' % parsed_args)
+
+        names = parsed_args.objects
+        if parsed_args.all or parsed_args.prefix:
+            names = (o['name'] for o in lib_object.iter_objects(
+                self.app.restapi,
+                self.app.client_manager.object.endpoint,
+                parsed_args.container,
+                prefix=parsed_args.prefix,
+            ))
+        elif not names:
+            raise exceptions.CommandError(
+                'Specify the objects to display, --all or --prefix')
+
+        columns = (
+            'Account',
+            'Container',
+            'Object',
+            'Content-Type',
+            'Content-Length',
+            'Last-Modified',
+            'ETag',
+            'X-Object-Manifest',
+        )
+        results = lib_object.show_objects(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            parsed_args.container,
+            names,
+            workers=parsed_args.workers,
+            ordered=not parsed_args.unordered,
+        )
+
+        def _rows():
+            failed = 0
+            for name, data, error in results:
+                if error is not None:
+                    self.log.error('unable to show %s: %s', name, error)
+                    failed += 1
+                    continue
+                yield utils.get_dict_properties(data, columns)
+            if failed:
+                raise exceptions.CommandError(
+                    '%d of the objects could not be displayed' % failed)
+
+        # Rows are written as the objects are looked up
+        return (columns, _rows())
+
+
+class ListObjectUsage(lister.Lister):
+    """List the objects and bytes under each pseudo-directory"""
+
+    log = logging.getLogger(__name__ + '.ListObjectUsage')
+
+    def get_parser(self, prog_name):
+        parser = super(ListObjectUsage, self).get_parser(prog_name)
+        parser.add_argument(
+            'container',
+            metavar='<container>',
+            help='Container to report on',
+        )
+        parser.add_argument(
+            '--prefix',
+            metavar='<prefix>',
+            help='Only count the objects whose name starts with <prefix>',
+        )
+        parser.add_argument(
+            '--delimiter',
+            metavar='<delimiter>',
+            default='/',
+            help='Separator of the pseudo-directories in object names '
+                 '(default /)',
+        )
+        parser.add_argument(
+            '--depth',
+            metavar='<depth>',
+            type=int,
+            help='Only list pseudo-directories up to <depth> levels below '
+                 '<prefix>',
+        )
+        parser.add_argument(
+            '--workers',
+            metavar='<count>',
+            type=int,
+            default=lib_object.DEFAULT_USAGE_WORKERS,
+            help='Number of pseudo-directories to list at the same time '
+                 '(default %d)' % lib_object.DEFAULT_USAGE_WORKERS,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        self.log.debug('take_action(%s)' % parsed_args)
+
+        data = lib_object.object_usage(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            parsed_args.container,
+            prefix=parsed_args.prefix,
+            delimiter=parsed_args.delimiter,
+            depth=parsed_args.depth,
+            workers=parsed_args.workers,
+        )
+
+        # Rows are written as subtrees are totalled, the last is the total
+        return (('Prefix', 'Objects', 'Bytes'), data)
+
+
+class SaveObject(command.Command):
+    """Save object locally"""
+
+    log = logging.getLogger(__name__ + '.SaveObject')
+
+    def get_parser(self, prog_name):
+        parser = super(SaveObject, self).get_parser(prog_name)
+        parser.add_argument(
+            'container',
+            metavar='<container>',
+            help='Container name for object to save',
+        )
+        parser.add_argument(
+            'object',
+            metavar='<object>',
+            help='Object name to save',
+        )
+        parser.add_argument(
+            '--file',
+            metavar='<filename>',
+            help='Destination filename (default is <object>)',
+        )
+        parser.add_argument(
+            '--range-size',
+            metavar='<bytes>',
+            type=int,
+            default=lib_object.DEFAULT_RANGE_SIZE,
+            help='Download the object in ranges of at most <bytes> '
+                 '(default %d)' % lib_object.DEFAULT_RANGE_SIZE,
+        )
+        parser.add_argument(
+            '--workers',
+            metavar='<count>',
+            type=int,
+            default=lib_object.DEFAULT_DOWNLOAD_WORKERS,
+            help='Number of ranges to download at the same time '
+                 '(default %d)' % lib_object.DEFAULT_DOWNLOAD_WORKERS,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        self.log.debug('take_action(%s)' % parsed_args)
+
+        lib_object.save_object(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            parsed_args.container,
+            parsed_args.object,
+            file=parsed_args.file,
+            range_size=parsed_args.range_size,
+            workers=parsed_args.workers,
+        )
+        return
+
+
 class ShowObject(show.ShowOne):
     """Show object information"""
 
@@ -150,3 +498,88 @@ class ShowObject(show.ShowOne):
         )
 
         return zip(*sorted(six.iteritems(data)))
+
+
+class SyncObject(show.ShowOne):
+    """Upload the changed files of a directory to a container"""
+
+    log = logging.getLogger(__name__ + '.SyncObject')
+
+    def get_parser(self, prog_name):
+        parser = super(SyncObject, self).get_parser(prog_name)
+        parser.add_argument(
+            'container',
+            metavar='<container>',
+            help='Container to sync to',
+        )
+        parser.add_argument(
+            'directory',
+            metavar='<directory>',
+            help='Local directory to sync from',
+        )
+        parser.add_argument(
+            '--object-prefix',
+            metavar='<prefix>',
+            help='Prefix the object names of the files with <prefix>',
+        )
+        parser.add_argument(
+            '--delete',
+            action='store_true',
+            default=False,
+            help='Delete objects under <prefix> that have no local file',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            default=False,
+            help='Only report the changes, use -v to list them',
+        )
+        parser.add_argument(
+            '--segment-size',
+            metavar='<bytes>',
+            type=int,
+            default=lib_object.DEFAULT_SEGMENT_SIZE,
+            help='Upload files larger than <bytes> in segments of <bytes>, '
+                 '0 to never segment (default %d)' %
+                 lib_object.DEFAULT_SEGMENT_SIZE,
+        )
+        parser.add_argument(
+            '--workers',
+            metavar='<count>',
+            type=int,
+            default=lib_object.DEFAULT_UPLOAD_WORKERS,
+            help='Number of files to compare or upload at the same time '
+                 '(default %d)' % lib_object.DEFAULT_UPLOAD_WORKERS,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        self.log.debug('take_action(%s)' % parsed_args)
+
+        hash_index = cache.HashIndex()
+        try:
+            data = lib_object.sync_objects(
+                self.app.restapi,
+                self.app.client_manager.object.endpoint,
+                parsed_args.container,
+                parsed_args.directory,
+                prefix=parsed_args.object_prefix,
+                delete=parsed_args.delete,
+                dry_run=parsed_args.dry_run,
+                hash_index=hash_index,
+                segment_size=parsed_args.segment_size,
+                workers=parsed_args.workers,
+            )
+        finally:
+            hash_index.close()
+
+        # The summary is written before the command fails
+        self.failed = data['failed']
+        if self.failed:
+            self.log.error('%d of the files could not be synced', self.failed)
+        return zip(*sorted(six.iteritems(data)))
+
+    def run(self, parsed_args):
+        self.failed = 0
+        super(SyncObject, self).run(parsed_args)
+        return 1 if self.failed else 0
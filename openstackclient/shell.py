@@ -17,20 +17,28 @@
 
 import argparse
 import getpass
+import json
 import logging
 import os
+import shlex
 import sys
+import time
+
+import six
 
 from cliff import app
 from cliff import command
 from cliff import help
 
 import openstackclient
+from openstackclient.common import cache
 from openstackclient.common import clientmanager
 from openstackclient.common import commandmanager
 from openstackclient.common import exceptions as exc
+from openstackclient.common import httptrace
 from openstackclient.common import openstackkeyring
 from openstackclient.common import restapi
+from openstackclient.common import timing
 from openstackclient.common import utils
 
 
@@ -43,6 +51,20 @@ DEFAULT_OBJECT_API_VERSION = '1'
 DEFAULT_VOLUME_API_VERSION = '1'
 DEFAULT_DOMAIN = 'default'
 
+# Commands with these class name prefixes drop the cached names of the
+# resources they look up
+INVALIDATING_COMMANDS = ('Delete', 'Set', 'Unset')
+
+# Sinks of --http-log-file by --http-log-format
+HTTP_LOG_SINKS = {
+    'curl': httptrace.CurlSink,
+    'jsonl': httptrace.JSONLinesSink,
+    'har': httptrace.HARSink,
+}
+
+# Written after the output of every command in plain --batch output
+BATCH_DELIMITER = '--- [%(line)d] exit %(status)d: %(command)s\n'
+
 
 def env(*vars, **kwargs):
     """Search for the first defined of possibly many env vars
@@ -58,13 +80,21 @@ def env(*vars, **kwargs):
     return kwargs.get('default', '')
 
 
+def _is_unauthorized(ex):
+    # Each client library has its own Unauthorized exception
+    response = getattr(ex, 'response', None)
+    return (getattr(response, 'status_code', None) == 401
+            or getattr(ex, 'http_status', None) == 401
+            or getattr(ex, 'code', None) == 401)
+
+
 class OpenStackShell(app.App):
 
     CONSOLE_MESSAGE_FORMAT = '%(levelname)s: %(name)s %(message)s'
 
     log = logging.getLogger(__name__)
 
-    def __init__(self):
+    def __init__(self, stdin=None, stdout=None, stderr=None):
         # Patch command.Command to add a default auth_required = True
         command.Command.auth_required = True
         # But not help
@@ -73,7 +103,30 @@ class OpenStackShell(app.App):
         super(OpenStackShell, self).__init__(
             description=__doc__.strip(),
             version=openstackclient.__version__,
-            command_manager=commandmanager.CommandManager('openstack.cli'))
+            command_manager=commandmanager.CommandManager('openstack.cli'),
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr)
+
+        # Authenticated ClientManagers keyed by credentials, may be shared
+        # between shells by long running callers such as the daemon
+        self.client_managers = {}
+
+        # The error of the last command run, see clean_up()
+        self.last_error = None
+
+        # Set up in initialize_app(), closed when run() returns
+        self.http_tracer = None
+        self.http_log = None
+
+        # Set up in initialize_app() with --os-http-cache
+        self.http_cache = None
+
+        # Set up in initialize_app() with --timing
+        self.timer = None
+        self._command_start = None
+
+        self.resolution_cache = None
 
         # This is instantiated in initialize_app() only when using
         # password flow auth
@@ -235,6 +288,128 @@ class OpenStackShell(app.App):
                             help='Use keyring to store password, '
                                  'default=False (Env: OS_USE_KEYRING)')
 
+        parser.add_argument(
+            '--os-http-pool-size',
+            metavar='<size>',
+            type=int,
+            default=env(
+                'OS_HTTP_POOL_SIZE',
+                default=restapi.DEFAULT_POOL_SIZE),
+            help='Maximum number of HTTP connections kept open per host, '
+                 'default=' + str(restapi.DEFAULT_POOL_SIZE) +
+                 ' (Env: OS_HTTP_POOL_SIZE)')
+
+        parser.add_argument(
+            '--os-http-retries',
+            metavar='<count>',
+            type=int,
+            default=env(
+                'OS_HTTP_RETRIES',
+                default=restapi.DEFAULT_RETRIES),
+            help='Retry failed requests up to <count> times if they are '
+                 'safe to repeat, default=' + str(restapi.DEFAULT_RETRIES) +
+                 ' (Env: OS_HTTP_RETRIES)')
+
+        parser.add_argument(
+            '--http-log-file',
+            metavar='<file>',
+            default=env('OS_HTTP_LOG_FILE'),
+            help='Write a trace of the REST API requests to <file> '
+                 '(Env: OS_HTTP_LOG_FILE)')
+        parser.add_argument(
+            '--http-log-format',
+            metavar='<format>',
+            choices=sorted(HTTP_LOG_SINKS),
+            default=env('OS_HTTP_LOG_FORMAT', default='jsonl'),
+            help='Format of --http-log-file: "curl" commands, "jsonl" with '
+                 'one JSON object per request or a "har" archive, '
+                 'default=jsonl (Env: OS_HTTP_LOG_FORMAT)')
+        parser.add_argument(
+            '--http-log-body-limit',
+            metavar='<bytes>',
+            type=int,
+            default=httptrace.DEFAULT_BODY_LIMIT,
+            help='Truncate traced request and response bodies to <bytes>, '
+                 'default=' + str(httptrace.DEFAULT_BODY_LIMIT))
+
+        env_os_auth_cache = env('OS_AUTH_CACHE', default=False)
+        if type(env_os_auth_cache) == str:
+            if env_os_auth_cache.lower() in ['true', '1']:
+                env_os_auth_cache = True
+            else:
+                env_os_auth_cache = False
+        parser.add_argument('--os-auth-cache',
+                            default=env_os_auth_cache,
+                            action='store_true',
+                            help='Cache tokens and service catalogs in '
+                                 + cache.AUTH_CACHE_FILE +
+                                 ', default=False (Env: OS_AUTH_CACHE)')
+
+        env_os_http_cache = env('OS_HTTP_CACHE', default=False)
+        if type(env_os_http_cache) == str:
+            if env_os_http_cache.lower() in ['true', '1']:
+                env_os_http_cache = True
+            else:
+                env_os_http_cache = False
+        parser.add_argument('--os-http-cache',
+                            default=env_os_http_cache,
+                            action='store_true',
+                            help='Cache GET responses in '
+                                 + cache.HTTP_CACHE_DIR +
+                                 ' and revalidate them with conditional '
+                                 'requests, default=False '
+                                 '(Env: OS_HTTP_CACHE)')
+        parser.add_argument(
+            '--os-http-cache-max-age',
+            metavar='<seconds>',
+            type=int,
+            default=env('OS_HTTP_CACHE_MAX_AGE', default=0),
+            help='Use cached responses for this long without revalidating '
+                 'them, default=0 (Env: OS_HTTP_CACHE_MAX_AGE)')
+
+        parser.add_argument(
+            '--os-resolution-cache-ttl',
+            metavar='<seconds>',
+            type=int,
+            default=env(
+                'OS_RESOLUTION_CACHE_TTL',
+                default=cache.DEFAULT_RESOLUTION_TTL),
+            help='Remember the IDs of resources looked up by name for this '
+                 'long in ' + cache.RESOLUTION_CACHE_FILE + ', 0 disables, '
+                 'default=' + str(cache.DEFAULT_RESOLUTION_TTL) +
+                 ' (Env: OS_RESOLUTION_CACHE_TTL)')
+        parser.add_argument(
+            '--no-cache',
+            action='store_true',
+            help='Neither use nor update the resource name cache')
+
+        parser.add_argument(
+            '--timing',
+            action='store_true',
+            help='Print the time taken by every HTTP request and by '
+                 'authentication, API calls and local processing on exit')
+
+        parser.add_argument(
+            '--trace-file',
+            metavar='<file>',
+            help='Write a trace of the command, with spans for the HTTP '
+                 'requests and other steps, to <file> in the Chrome trace '
+                 'event format')
+
+        parser.add_argument(
+            '--batch',
+            metavar='<file>',
+            help='Run the commands in <file>, one per line, in this process '
+                 '("-" reads the commands from stdin)')
+        parser.add_argument(
+            '--batch-format',
+            metavar='<format>',
+            choices=['plain', 'json'],
+            default='plain',
+            help='Output of --batch: "plain" follows the output of each '
+                 'command with a delimiter line holding its exit status, '
+                 '"json" writes one JSON object per command, default=plain')
+
         return parser
 
     def authenticate_user(self):
@@ -290,6 +465,26 @@ class OpenStackShell(app.App):
                     "You must provide an auth url via"
                     " either --os-auth-url or via env[OS_AUTH_URL]")
 
+        key = self._client_manager_key()
+        client_manager = self.client_managers.get(key)
+        if client_manager and not self._is_expired(client_manager):
+            self.log.debug('re-using authenticated client manager')
+            self.client_manager = client_manager
+            if self.http_adapter is not client_manager.http_adapter:
+                # Also re-use the connections it already has open
+                self.http_adapter = client_manager.http_adapter
+                self.restapi = restapi.RESTApi(
+                    adapter=self.http_adapter,
+                    retry_policy=self.retry_policy,
+                    tracer=self.http_tracer,
+                    http_cache=self.http_cache,
+                )
+            return
+
+        auth_cache = None
+        if self.options.os_auth_cache:
+            auth_cache = cache.AuthCache()
+
         self.client_manager = clientmanager.ClientManager(
             token=self.options.os_token,
             url=self.options.os_url,
@@ -299,9 +494,33 @@ class OpenStackShell(app.App):
             username=self.options.os_username,
             password=self.options.os_password,
             region_name=self.options.os_region_name,
-            api_version=self.api_version)
+            api_version=self.api_version,
+            auth_cache=auth_cache,
+            http_adapter=self.http_adapter)
+        self.client_managers[key] = self.client_manager
         return
 
+    def _client_manager_key(self):
+        """Return the key identifying a complete set of credentials"""
+        return (
+            self.options.os_token,
+            self.options.os_url,
+            self.options.os_auth_url,
+            self.options.os_project_name,
+            self.options.os_project_id,
+            self.options.os_username,
+            self.options.os_password,
+            self.options.os_region_name,
+            tuple(sorted(self.api_version.items())),
+        )
+
+    def _is_expired(self, client_manager):
+        """Check whether the token of a password flow ClientManager expires"""
+        auth_ref = client_manager.auth_ref
+        if auth_ref is None:
+            return False
+        return auth_ref.will_expire_soon(cache.STALE_TOKEN_DURATION)
+
     def init_keyring_backend(self):
         """Initialize openstack backend to use for keyring"""
         return openstackkeyring.os_keyring()
@@ -338,8 +557,18 @@ class OpenStackShell(app.App):
         * authenticate against Identity if requested
         """
 
+        if self.options.trace_file:
+            timing.start_trace()
+        with timing.span('initialize_app'):
+            self._initialize_app(argv)
+
+    def _initialize_app(self, argv):
         super(OpenStackShell, self).initialize_app(argv)
 
+        if self.options.batch and argv:
+            raise exc.CommandError(
+                "--batch can not be combined with a command")
+
         # Set requests logging to a useful level
         requests_log = logging.getLogger("requests")
         if self.options.debug:
@@ -359,55 +588,279 @@ class OpenStackShell(app.App):
             'volume': self.options.os_volume_api_version,
         }
 
-        # Add the API version-specific commands
-        for api in self.api_version.keys():
-            version = '.v' + self.api_version[api].replace('.', '_')
-            cmd_group = 'openstack.' + api.replace('-', '_') + version
-            self.command_manager.add_command_group(cmd_group)
-
-        # Commands that span multiple APIs
-        self.command_manager.add_command_group(
-            'openstack.common')
-
-        # This is the naive extension implementation referred to in
-        # blueprint 'client-extensions'
-        # Extension modules can register their commands in an
-        # 'openstack.extension' entry point group:
-        # entry_points={
-        #     'openstack.extension': [
-        #         'list_repo=qaz.github.repo:ListRepo',
-        #         'show_repo=qaz.github.repo:ShowRepo',
-        #     ],
-        # }
-        self.command_manager.add_command_group(
-            'openstack.extension')
+        with timing.span('load command groups'):
+            # Add the API version-specific commands
+            for api in self.api_version.keys():
+                version = '.v' + self.api_version[api].replace('.', '_')
+                cmd_group = 'openstack.' + api.replace('-', '_') + version
+                self.command_manager.add_command_group(cmd_group)
+
+            # Commands that span multiple APIs
+            self.command_manager.add_command_group(
+                'openstack.common')
+
+            # This is the naive extension implementation referred to in
+            # blueprint 'client-extensions'
+            # Extension modules can register their commands in an
+            # 'openstack.extension' entry point group:
+            # entry_points={
+            #     'openstack.extension': [
+            #         'list_repo=qaz.github.repo:ListRepo',
+            #         'show_repo=qaz.github.repo:ShowRepo',
+            #     ],
+            # }
+            self.command_manager.add_command_group(
+                'openstack.extension')
 
         # Handle deferred help and exit
         if self.options.deferred_help:
             self.DeferredHelpAction(self.parser, self.parser, None, None)
 
+        if self.options.timing:
+            self.timer = timing.Timer()
+            self.timer.install()
+
+        # Set up the connection pools shared by all API clients
+        self.http_adapter = restapi.PooledHTTPAdapter(
+            pool_size=int(self.options.os_http_pool_size),
+        )
+
         # Set up common client session
-        self.restapi = restapi.RESTApi()
+        self.retry_policy = restapi.RetryPolicy(
+            retries=int(self.options.os_http_retries),
+        )
+        self.http_tracer = restapi.create_tracer(
+            body_limit=self.options.http_log_body_limit,
+        )
+        if self.options.http_log_file:
+            self.http_log = open(self.options.http_log_file, 'w')
+            sink = HTTP_LOG_SINKS[self.options.http_log_format]
+            self.http_tracer.add_sink(sink(self.http_log))
+        if self.options.os_http_cache:
+            self.http_cache = cache.HTTPCache(
+                scope=(
+                    self.options.os_auth_url or self.options.os_url,
+                    self.options.os_username,
+                    self.options.os_project_id or self.options.os_project_name,
+                    self.options.os_region_name,
+                    self.options.os_token,
+                ),
+                max_age=int(self.options.os_http_cache_max_age),
+            )
+        self.restapi = restapi.RESTApi(
+            adapter=self.http_adapter,
+            retry_policy=self.retry_policy,
+            tracer=self.http_tracer,
+            http_cache=self.http_cache,
+        )
+
+    def configure_resolution_cache(self, cmd):
+        """Set up the resource name cache for cmd in the current thread"""
+        ttl = int(self.options.os_resolution_cache_ttl)
+        if self.options.no_cache or ttl <= 0:
+            utils.set_resolution_cache(None)
+            return
+
+        if self.resolution_cache is None:
+            self.resolution_cache = cache.ResolutionCache(ttl=ttl)
+        scope = (
+            self.options.os_auth_url or self.options.os_url,
+            self.options.os_project_id or self.options.os_project_name,
+            self.options.os_region_name,
+        )
+        utils.set_resolution_cache(
+            self.resolution_cache,
+            scope=scope,
+            invalidate=cmd.__class__.__name__.startswith(
+                INVALIDATING_COMMANDS),
+        )
 
     def prepare_to_run_command(self, cmd):
         """Set up auth and API versions"""
         self.log.debug('prepare_to_run_command %s', cmd.__class__.__name__)
+        self.configure_resolution_cache(cmd)
+        self._command_start = time.time()
+
+        if timing.tracing() and hasattr(cmd, 'produce_output'):
+            self._trace_output(cmd)
 
         if cmd.auth_required:
-            self.authenticate_user()
-            self.restapi.set_auth(self.client_manager.identity.auth_token)
+            self._authenticate()
+            self._retry_rejected_token(cmd)
         return
 
+    def _authenticate(self):
+        with timing.span('authenticate_user'):
+            if self.timer is not None:
+                with self.timer.phase(timing.AUTH):
+                    self.authenticate_user()
+            else:
+                self.authenticate_user()
+        self.restapi.set_auth(self.client_manager._token)
+
+    def _retry_rejected_token(self, cmd):
+        """Run cmd again with a new token if its cached token is rejected
+
+        A cached token may have been revoked, e.g. by a password change,
+        before it expires.
+        """
+        run = cmd.run
+
+        def run_with_new_token(parsed_args):
+            try:
+                return run(parsed_args)
+            except Exception as e:
+                if not (_is_unauthorized(e) and
+                        self.client_manager.drop_cached_token()):
+                    raise
+            self.log.debug('cached token was rejected, authenticating again')
+            self.client_managers.pop(self._client_manager_key(), None)
+            self._authenticate()
+            return run(parsed_args)
+
+        cmd.run = run_with_new_token
+
+    def _trace_output(self, cmd):
+        """Record the output formatting of cmd as a span"""
+        produce_output = cmd.produce_output
+
+        def traced_produce_output(parsed_args, *args, **kwargs):
+            with timing.span('produce_output',
+                             formatter=parsed_args.formatter):
+                return produce_output(parsed_args, *args, **kwargs)
+
+        cmd.produce_output = traced_produce_output
+
+    def run_subcommand(self, argv):
+        with timing.span('command', argv=' '.join(argv)):
+            return super(OpenStackShell, self).run_subcommand(argv)
+
     def clean_up(self, cmd, result, err):
         self.log.debug('clean_up %s', cmd.__class__.__name__)
+        self.last_error = err
+        if self.timer is not None and self._command_start is not None:
+            self.timer.add_command(time.time() - self._command_start)
+            self._command_start = None
         if err:
             self.log.debug('got an error: %s', err)
+        self.log.debug(
+            'opened %d new HTTP connection(s)',
+            self.http_adapter.connections_opened,
+        )
+        self.log.debug(
+            'retried %d HTTP request(s), waited %.2fs before retrying',
+            self.retry_policy.retry_count,
+            self.retry_policy.sleep_time,
+        )
+
+    def run_batch(self):
+        """Run every command listed in the --batch file
+
+        Commands share this shell, so authentication and the HTTP
+        connections are set up once for the whole batch.  Blank lines and
+        lines starting with '#' are skipped.
+
+        Returns 0 if all of the commands succeeded, 1 otherwise.
+        """
+        if self.options.batch == '-':
+            lines = self.stdin
+        else:
+            lines = open(self.options.batch)
+
+        failed = 0
+        try:
+            for number, line in enumerate(lines, 1):
+                command = line.strip()
+                if not command or command.startswith('#'):
+                    continue
+                status, output, error = self._run_batch_command(command)
+                if status:
+                    failed += 1
+                self._write_batch_result(
+                    number, command, status, output, error)
+        finally:
+            if lines is not self.stdin:
+                lines.close()
+        self.log.debug('batch done, %d command(s) failed', failed)
+        return 1 if failed else 0
+
+    def _run_batch_command(self, command):
+        """Run one batch command and return (status, output, error)"""
+        try:
+            argv = shlex.split(command)
+        except ValueError as e:
+            return 2, '', 'unable to parse command: %s' % e
+
+        try:
+            self.command_manager.find_command(argv)
+        except ValueError:
+            return 2, '', 'unknown command'
+
+        self.last_error = None
+        stdout, self.stdout = self.stdout, six.StringIO()
+        try:
+            status = self.run_subcommand(argv)
+        except SystemExit as e:
+            # argparse exits on bad arguments and -h
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            # --debug re-raises command errors
+            status, self.last_error = 1, e
+        finally:
+            stdout, self.stdout = self.stdout, stdout
+        if self.last_error is not None:
+            error = six.text_type(self.last_error)
+        else:
+            error = None
+        return status or 0, stdout.getvalue(), error
+
+    def _write_batch_result(self, number, command, status, output, error):
+        if self.options.batch_format == 'json':
+            self.stdout.write(json.dumps({
+                'line': number,
+                'command': command,
+                'status': status,
+                'output': output,
+                'error': error,
+            }) + '\n')
+        else:
+            self.stdout.write(output)
+            if output and not output.endswith('\n'):
+                self.stdout.write('\n')
+            self.stdout.write(BATCH_DELIMITER % {
+                'line': number,
+                'status': status,
+                'command': command,
+            })
+        self.stdout.flush()
+
+    def run(self, argv):
+        try:
+            return super(OpenStackShell, self).run(argv)
+        finally:
+            if self.http_tracer is not None:
+                self.http_tracer.close()
+            if self.http_log is not None:
+                self.http_log.close()
+            recorder = timing.stop_trace()
+            if recorder is not None:
+                with open(self.options.trace_file, 'w') as f:
+                    recorder.write(f)
+            if self.timer is not None:
+                self.timer.uninstall()
+                self.stderr.write(self.timer.report(
+                    retries=self.retry_policy.retry_count,
+                    retry_wait=self.retry_policy.sleep_time,
+                ))
 
     def interact(self):
+        if self.options.batch:
+            return self.run_batch()
+
         # NOTE(dtroyer): Maintain the old behaviour for interactive use as
         #                this path does not call prepare_to_run_command()
         self.authenticate_user()
-        self.restapi.set_auth(self.client_manager.identity.auth_token)
+        self.restapi.set_auth(self.client_manager._token)
         super(OpenStackShell, self).interact()
 
 
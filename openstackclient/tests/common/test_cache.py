@@ -0,0 +1,312 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Test cache module"""
+
+import datetime
+import os
+
+import fixtures
+import mock
+
+from openstackclient.common import cache
+from openstackclient.tests import utils
+
+
+fake_auth_url = 'http://keystone.example.com:5000/v2.0'
+fake_token = '11223344556677889900'
+
+
+def make_access(expires_in=3600):
+    expires = datetime.datetime.utcnow() + datetime.timedelta(
+        seconds=expires_in)
+    return {
+        'version': 'v2.0',
+        'token': {
+            'id': fake_token,
+            'expires': expires.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'tenant': {'id': 'p1', 'name': 'project'},
+        },
+        'user': {'id': 'u1', 'name': 'user'},
+        'serviceCatalog': [],
+    }
+
+
+class TestFileCache(utils.TestCase):
+
+    def setUp(self):
+        super(TestFileCache, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.path = os.path.join(self.tmpdir, 'cache.json')
+
+    def test_get_missing_file(self):
+        fc = cache.FileCache(self.path)
+        self.assertEqual(fc.get('nope'), None)
+
+    def test_update_get_delete(self):
+        fc = cache.FileCache(self.path)
+        fc.update(lambda data: data.update(gopher='mac'))
+        self.assertEqual(fc.get('gopher'), 'mac')
+        self.assertEqual(cache.FileCache(self.path).get('gopher'), 'mac')
+        fc.delete('gopher')
+        self.assertEqual(fc.get('gopher'), None)
+
+    def test_corrupt_file(self):
+        with open(self.path, 'w') as f:
+            f.write('{not json')
+        fc = cache.FileCache(self.path)
+        self.assertEqual(fc.get('gopher'), None)
+        fc.update(lambda data: data.update(gopher='tosh'))
+        self.assertEqual(fc.get('gopher'), 'tosh')
+
+
+class TestAuthCache(utils.TestCase):
+
+    def setUp(self):
+        super(TestAuthCache, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.cache = cache.AuthCache(os.path.join(self.tmpdir, 'auth.json'))
+        self.key = self.cache.make_key(fake_auth_url, 'user', 'project', None)
+
+    def test_make_key(self):
+        self.assertEqual(
+            self.key,
+            self.cache.make_key(fake_auth_url, 'user', 'project', ''),
+        )
+        self.assertNotEqual(
+            self.key,
+            self.cache.make_key(fake_auth_url, 'user', 'project', 'r2'),
+        )
+        self.assertNotEqual(
+            self.key,
+            self.cache.make_key(fake_auth_url, 'user2', 'project', None),
+        )
+
+    def test_make_key_secret(self):
+        key = self.cache.make_key(fake_auth_url, 'user', 'project', None,
+                                  'secret')
+        self.assertNotEqual(key, self.key)
+        self.assertNotEqual(
+            key,
+            self.cache.make_key(fake_auth_url, 'user', 'project', None,
+                                'wrong'),
+        )
+
+    def test_set_get(self):
+        self.cache.set(self.key, make_access())
+        auth_ref = self.cache.get(self.key)
+        self.assertEqual(auth_ref.auth_token, fake_token)
+        self.assertEqual(auth_ref.project_id, 'p1')
+
+    def test_get_expiring_soon(self):
+        self.cache.set(self.key, make_access(expires_in=60))
+        self.assertEqual(self.cache.get(self.key), None)
+
+    def test_set_prunes_expired(self):
+        self.cache.set('old', make_access(expires_in=-60))
+        self.cache.set(self.key, make_access())
+        self.assertEqual(cache.FileCache(self.cache.path).get('old'), None)
+
+    def test_file_mode(self):
+        self.cache.set(self.key, make_access())
+        self.assertEqual(os.stat(self.cache.path).st_mode & 0o777, 0o600)
+
+
+class TestResolutionCache(utils.TestCase):
+
+    def setUp(self):
+        super(TestResolutionCache, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.cache = cache.ResolutionCache(
+            os.path.join(self.tmpdir, 'resolve.json'),
+            ttl=60,
+            max_entries=2,
+        )
+        self.scope = (fake_auth_url, 'project', None)
+
+    def _key(self, name):
+        return self.cache.make_key(self.scope, 'servers', name)
+
+    def test_make_key(self):
+        self.assertNotEqual(
+            self._key('web'),
+            self.cache.make_key((fake_auth_url, 'other', None),
+                                'servers', 'web'),
+        )
+        self.assertNotEqual(
+            self._key('web'),
+            self.cache.make_key(self.scope, 'volumes', 'web'),
+        )
+
+    def test_set_get(self):
+        self.cache.set(self._key('web'), 'servers', 'id1')
+        self.assertEqual(self.cache.get(self._key('web')), 'id1')
+        self.assertEqual(self.cache.get(self._key('db')), None)
+
+    @mock.patch('time.time')
+    def test_expired(self, mock_time):
+        mock_time.return_value = 1000
+        self.cache.set(self._key('web'), 'servers', 'id1')
+        mock_time.return_value = 1061
+        self.assertEqual(self.cache.get(self._key('web')), None)
+
+    @mock.patch('time.time')
+    def test_lru_eviction(self, mock_time):
+        mock_time.return_value = 1000
+        self.cache.set(self._key('a'), 'servers', 'id-a')
+        mock_time.return_value = 1001
+        self.cache.set(self._key('b'), 'servers', 'id-b')
+        mock_time.return_value = 1002
+        # Using 'a' makes 'b' the least recently used entry
+        self.cache.get(self._key('a'))
+        mock_time.return_value = 1003
+        self.cache.set(self._key('c'), 'servers', 'id-c')
+        self.assertEqual(self.cache.get(self._key('a')), 'id-a')
+        self.assertEqual(self.cache.get(self._key('b')), None)
+        self.assertEqual(self.cache.get(self._key('c')), 'id-c')
+
+    @mock.patch('time.time')
+    def test_get_read_only(self, mock_time):
+        mock_time.return_value = 1000
+        self.cache.set(self._key('web'), 'servers', 'id1')
+        with mock.patch.object(self.cache, '_write') as write:
+            self.assertEqual(self.cache.get(self._key('db')), None)
+            self.assertEqual(self.cache.get(self._key('web')), 'id1')
+            self.assertFalse(write.called)
+            # A later hit records the use
+            mock_time.return_value = 1002
+            self.assertEqual(self.cache.get(self._key('web')), 'id1')
+            self.assertEqual(write.call_count, 1)
+
+    def test_invalidate(self):
+        self.cache.set(self._key('a'), 'servers', 'id1')
+        self.cache.set(self._key('b'), 'volumes', 'id1')
+        self.cache.invalidate('servers', 'id1')
+        self.assertEqual(self.cache.get(self._key('a')), None)
+        self.assertEqual(self.cache.get(self._key('b')), 'id1')
+
+
+class TestHTTPCache(utils.TestCase):
+
+    def setUp(self):
+        super(TestHTTPCache, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.cache = cache.HTTPCache(
+            os.path.join(self.tmpdir, 'http'),
+            max_size=10,
+        )
+        self.headers = {'etag': '"v1"', 'content-type': 'application/json'}
+
+    def _key(self, url):
+        return self.cache.make_key((fake_auth_url, 'user', 'project'), url)
+
+    def _set(self, url, body=b'[1, 2]', headers=None):
+        return self.cache.set(
+            self._key(url), url, 200,
+            self.headers if headers is None else headers, body)
+
+    def test_set_get(self):
+        self._set('http://swift/c1')
+        entry = self.cache.get(self._key('http://swift/c1'))
+        self.assertEqual(entry['etag'], '"v1"')
+        self.assertEqual(self.cache.validators(entry),
+                         {'If-None-Match': '"v1"'})
+        self.assertEqual(self.cache.read_body(self._key('http://swift/c1')),
+                         b'[1, 2]')
+
+    def test_no_validators(self):
+        self.assertIsNone(self._set('http://swift/c1', headers={}))
+        self.cache.max_age = 60
+        self.assertIsNotNone(self._set('http://swift/c1', headers={}))
+
+    def test_no_store(self):
+        headers = dict(self.headers, **{'cache-control': 'no-store'})
+        self.assertIsNone(self._set('http://swift/c1', headers=headers))
+
+    @mock.patch('time.time')
+    def test_is_fresh(self, mock_time):
+        mock_time.return_value = 1000
+        entry = self._set('http://swift/c1')
+        self.assertFalse(self.cache.is_fresh(entry))
+        self.cache.max_age = 60
+        mock_time.return_value = 1059
+        self.assertTrue(self.cache.is_fresh(entry))
+
+    @mock.patch('time.time')
+    def test_lru_eviction(self, mock_time):
+        mock_time.return_value = 1000
+        self._set('http://swift/a', b'[1]')
+        mock_time.return_value = 1001
+        self._set('http://swift/b', b'[2]')
+        mock_time.return_value = 1002
+        self.cache.get(self._key('http://swift/a'))
+        mock_time.return_value = 1003
+        self._set('http://swift/c', b'[3, 4]')
+        self.assertIsNotNone(self.cache.get(self._key('http://swift/a')))
+        self.assertIsNone(self.cache.get(self._key('http://swift/b')))
+        self.assertFalse(os.path.exists(
+            os.path.join(self.tmpdir, 'http', self._key('http://swift/b'))))
+
+    def test_get_read_only(self):
+        self._set('http://swift/c1')
+        with mock.patch.object(self.cache, '_write') as write:
+            self.assertIsNone(self.cache.get(self._key('http://swift/c2')))
+            self.assertIsNotNone(self.cache.get(self._key('http://swift/c1')))
+            self.assertFalse(write.called)
+
+    def test_invalidate(self):
+        self._set('http://swift/c1?format=json', b'[]')
+        self._set('http://swift/c2', b'[]')
+        self.cache.invalidate('http://swift/c1/object')
+        self.assertIsNone(
+            self.cache.get(self._key('http://swift/c1?format=json')))
+        self.assertIsNotNone(self.cache.get(self._key('http://swift/c2')))
+
+    def test_decode_once(self):
+        entry = self._set('http://swift/c1')
+        key = self._key('http://swift/c1')
+        with mock.patch.object(self.cache, 'read_body',
+                               return_value=b'[1, 2]') as read_body:
+            data = self.cache.decode(key, entry)
+            data.append(3)
+            self.assertEqual(self.cache.decode(key, entry), [1, 2])
+        read_body.assert_called_once_with(key)
+
+
+class TestHashIndex(utils.TestCase):
+
+    def setUp(self):
+        super(TestHashIndex, self).setUp()
+        self.path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'index.sqlite')
+        self.index = cache.HashIndex(self.path)
+        self.addCleanup(self.index.close)
+
+    def test_set_get(self):
+        self.assertEqual(self.index.get('raindrop', 10, 1.5), (None, None))
+        self.index.set('raindrop', 10, 1.5, 'qaz', 'wsx')
+        self.assertEqual(self.index.get('raindrop', 10, 1.5), ('qaz', 'wsx'))
+        # A changed file has no entry
+        self.assertEqual(self.index.get('raindrop', 11, 1.5), (None, None))
+        self.assertEqual(self.index.get('raindrop', 10, 2.5), (None, None))
+
+    def test_close_commits(self):
+        self.index.set('raindrop', 10, 1.5, 'qaz')
+        self.index.close()
+        self.assertEqual(
+            cache.HashIndex(self.path).get('raindrop', 10, 1.5),
+            ('qaz', None),
+        )
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
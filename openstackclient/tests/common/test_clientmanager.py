@@ -13,10 +13,36 @@
 #   under the License.
 #
 
+import mock
+import os
+import subprocess
+import sys
+
+import openstackclient
 from openstackclient.common import clientmanager
 from openstackclient.tests import utils
 
 
+# Runs 'object list' set-up in a clean interpreter and reports which
+# client libraries got imported
+IMPORT_CHECK = """
+import sys
+from openstackclient import shell
+from openstackclient.common import clientmanager
+from openstackclient.object.v1 import object as obj
+
+cm = clientmanager.ClientManager(
+    token='token',
+    url='http://0.0.0.0',
+    api_version={'object-store': '1'},
+)
+cm.object
+for mod in %r:
+    if mod in sys.modules:
+        sys.stdout.write(mod + ' ')
+"""
+
+
 class Container(object):
     attr = clientmanager.ClientCache(lambda x: object())
 
@@ -33,3 +59,98 @@ class TestClientManager(utils.TestCase):
         # the factory one time and always returns the same value after that.
         c = Container()
         self.assertEqual(c.attr, c.attr)
+
+    def test_per_instance(self):
+        # Each ClientManager must get clients made with its own credentials
+        self.assertNotEqual(Container().attr, Container().attr)
+
+    def test_factory_path(self):
+        class PathContainer(object):
+            attr = clientmanager.ClientCache(
+                'openstackclient.tests.common.test_clientmanager.FakeFactory')
+
+        c = PathContainer()
+        self.assertEqual(c.attr, ('made', c))
+
+
+def FakeFactory(instance):
+    return ('made', instance)
+
+
+class TestClientManagerImports(utils.TestCase):
+
+    def test_object_list_imports(self):
+        # NOTE: this must run in a new interpreter, the test runner has
+        #       already imported everything
+        unwanted = (
+            'cinderclient',
+            'glanceclient',
+            'keystoneclient',
+            'novaclient',
+        )
+        env = os.environ.copy()
+        env['PYTHONPATH'] = os.path.dirname(
+            os.path.dirname(os.path.abspath(openstackclient.__file__)))
+        proc = subprocess.Popen(
+            [sys.executable, '-c', IMPORT_CHECK % (unwanted,)],
+            stdout=subprocess.PIPE,
+            env=env,
+        )
+        out = proc.communicate()[0]
+        self.assertEqual(proc.returncode, 0)
+        self.assertEqual(out.split(), [])
+
+
+class FakeAuthRef(object):
+    auth_token = 'cached-token'
+    service_catalog = 'cached-catalog'
+
+
+class TestClientManagerAuthCache(utils.TestCase):
+
+    def test_cached_token_skips_auth(self):
+        auth_cache = mock.Mock()
+        auth_cache.get.return_value = FakeAuthRef()
+        with mock.patch.object(clientmanager.ClientManager, 'identity',
+                               new_callable=mock.PropertyMock) as identity:
+            cm = clientmanager.ClientManager(
+                auth_url='http://0.0.0.0',
+                username='user',
+                password='pass',
+                project_name='project',
+                auth_cache=auth_cache,
+            )
+            self.assertFalse(identity.called)
+        self.assertEqual(cm._token, 'cached-token')
+        self.assertEqual(cm._service_catalog, 'cached-catalog')
+        self.assertFalse(auth_cache.set.called)
+        auth_cache.make_key.assert_called_with(
+            'http://0.0.0.0', 'user', 'project', None, 'pass')
+
+        # A rejected token is removed once
+        self.assertTrue(cm.drop_cached_token())
+        auth_cache.delete.assert_called_once_with(
+            auth_cache.make_key.return_value)
+        self.assertFalse(cm.drop_cached_token())
+
+    def test_cache_miss_stores_token(self):
+        auth_cache = mock.Mock()
+        auth_cache.get.return_value = None
+        auth_ref = FakeAuthRef()
+        with mock.patch.object(clientmanager.ClientManager, 'identity',
+                               new_callable=mock.PropertyMock) as identity:
+            identity.return_value.auth_ref = auth_ref
+            cm = clientmanager.ClientManager(
+                auth_url='http://0.0.0.0',
+                username='user',
+                password='pass',
+                project_name='project',
+                auth_cache=auth_cache,
+            )
+        auth_cache.set.assert_called_with(
+            auth_cache.make_key.return_value,
+            auth_ref,
+        )
+        self.assertEqual(cm._token, 'cached-token')
+        # Not from the cache, nothing to drop
+        self.assertFalse(cm.drop_cached_token())
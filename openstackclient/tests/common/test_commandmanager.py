@@ -13,7 +13,10 @@
 #   under the License.
 #
 
+import fixtures
 import mock
+import os
+import sys
 
 from openstackclient.common import commandmanager
 from openstackclient.tests import utils
@@ -69,3 +72,74 @@ class TestCommandManager(utils.TestCase):
         # Ensure that the original commands were not overwritten
         cmd_two, name, args = mgr.find_command(['two'])
         self.assertEqual(cmd_two, FAKE_CMD_TWO)
+
+
+class TestIndexedEntryPoint(utils.TestCase):
+    def test_load(self):
+        ep = commandmanager.IndexedEntryPoint(
+            'fake_cmd',
+            'openstackclient.tests.common.test_commandmanager:FakeCommand',
+        )
+        self.assertEqual(ep.load(), FakeCommand)
+
+
+class TestCommandIndex(utils.TestCase):
+    def setUp(self):
+        super(TestCommandIndex, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.source = os.path.join(self.tmpdir, 'entry_points.txt')
+        with open(self.source, 'w') as f:
+            f.write('')
+        self.entry = {
+            'version': commandmanager.COMMAND_INDEX_VERSION,
+            'path': sys.path,
+            'sources': {self.source: os.stat(self.source).st_mtime},
+            'groups': {
+                'openstack.test': {
+                    'fake_cmd': 'openstackclient.tests.common.'
+                                'test_commandmanager:FakeCommand',
+                },
+            },
+        }
+        self.path = os.path.join(self.tmpdir, 'index.json')
+
+    def _make_index(self):
+        index = commandmanager.CommandIndex(self.path)
+        index.scan = mock.Mock(return_value=self.entry)
+        return index
+
+    def test_index_built_once(self):
+        index = self._make_index()
+        eps = index.iter_entry_points('openstack.test')
+        self.assertEqual(index.scan.call_count, 1)
+        self.assertEqual([ep.name for ep in eps], ['fake_cmd'])
+        self.assertEqual(index.iter_entry_points('openstack.none'), [])
+
+        # A new process re-uses the saved index
+        index = self._make_index()
+        eps = index.iter_entry_points('openstack.test')
+        self.assertFalse(index.scan.called)
+        self.assertEqual(eps[0].load(), FakeCommand)
+
+    def test_index_invalidated(self):
+        self._make_index().load()
+
+        os.utime(self.source, (0, 0))
+        index = self._make_index()
+        index.load()
+        self.assertEqual(index.scan.call_count, 1)
+
+    def test_default_path(self):
+        # Tests never write the index in the user's home directory
+        index = commandmanager.CommandIndex()
+        self.assertEqual(index.path, commandmanager.COMMAND_INDEX_FILE)
+        self.assertNotEqual(index.path, os.path.join(
+            os.path.expanduser('~'), '.openstack-command-index.json'))
+
+    def test_command_manager_uses_index(self):
+        mgr = commandmanager.CommandManager(
+            'openstack.test',
+            command_index=self._make_index(),
+        )
+        cmd, name, args = mgr.find_command(['fake', 'cmd'])
+        self.assertEqual(cmd, FakeCommand)
@@ -0,0 +1,178 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Test daemon module"""
+
+import os
+import socket
+import threading
+
+import fixtures
+import mock
+
+from openstackclient.common import daemon
+from openstackclient.tests import utils
+
+
+class FakeApp(object):
+    """Echo the arguments, one environment variable and stdin"""
+
+    def __init__(self, stdin, stdout, stderr):
+        self.stdin = stdin
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def run(self, argv):
+        self.stdout.write(' '.join(argv) + '\n')
+        self.stdout.write(os.environ.get('OS_USERNAME', '-') + '\n')
+        self.stderr.write(self.stdin.read())
+        return len(argv)
+
+
+class TestFrames(utils.TestCase):
+
+    def test_round_trip(self):
+        a, b = socket.socketpair()
+        self.addCleanup(a.close)
+        self.addCleanup(b.close)
+        daemon.send_frame(a, {'stdout': u'caf\xe9'})
+        daemon.send_frame(a, {'exit': 2})
+        self.assertEqual(daemon.recv_frame(b), {'stdout': u'caf\xe9'})
+        self.assertEqual(daemon.recv_frame(b), {'exit': 2})
+
+    def test_closed(self):
+        a, b = socket.socketpair()
+        self.addCleanup(b.close)
+        a.close()
+        self.assertRaises(EOFError, daemon.recv_frame, b)
+
+
+class TestDaemon(utils.TestCase):
+
+    def setUp(self):
+        super(TestDaemon, self).setUp()
+        tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.path = os.path.join(tmpdir, 'daemon.sock')
+        self.daemon = daemon.Daemon(self.path, app_factory=FakeApp)
+        self.daemon.bind()
+        self.addCleanup(self.daemon.close)
+
+    def _serve_one(self):
+        def _serve():
+            conn, _addr = self.daemon.sock.accept()
+            try:
+                self.daemon.handle(conn)
+            finally:
+                conn.close()
+        thread = threading.Thread(target=_serve)
+        thread.start()
+        self.addCleanup(thread.join)
+
+    def test_socket_mode(self):
+        self.assertEqual(os.stat(self.path).st_mode & 0o077, 0)
+
+    def test_forward(self):
+        self._serve_one()
+        env = {'OS_USERNAME': 'gopher', 'HOME': '/nowhere'}
+        with mock.patch.dict(os.environ, env):
+            with mock.patch.object(daemon, '_write') as write:
+                with mock.patch.object(daemon, '_read_stdin',
+                                       return_value=u'piped'):
+                    code = daemon.forward(['server', 'show', 'x'], self.path)
+        self.assertEqual(code, 3)
+        self.assertEqual(
+            [c[0][1] for c in write.call_args_list],
+            [u'server show x\n', u'gopher\n', u'piped'],
+        )
+
+    def test_run_command_isolates_environment(self):
+        os.environ['OS_PASSWORD'] = 'daemon-secret'
+        self.addCleanup(os.environ.pop, 'OS_PASSWORD')
+
+        seen = {}
+
+        class EnvApp(FakeApp):
+            def run(self, argv):
+                seen.update(os.environ)
+                return 0
+
+        self.daemon.app_factory = EnvApp
+        code = self.daemon.run_command(
+            [], {'OS_USERNAME': 'gopher'}, '', mock.Mock(), mock.Mock())
+        self.assertEqual(code, 0)
+        self.assertEqual(seen.get('OS_USERNAME'), 'gopher')
+        self.assertNotIn('OS_PASSWORD', seen)
+        self.assertEqual(os.environ['OS_PASSWORD'], 'daemon-secret')
+        self.assertNotIn('OS_USERNAME', os.environ)
+
+    def test_run_command_cwd(self):
+        cwd = self.useFixture(fixtures.TempDir()).path
+        saved_cwd = os.getcwd()
+        seen = []
+
+        class CwdApp(FakeApp):
+            def run(self, argv):
+                seen.append(os.getcwd())
+                return 0
+
+        self.daemon.app_factory = CwdApp
+        code = self.daemon.run_command(
+            [], {}, '', mock.Mock(), mock.Mock(), cwd=cwd)
+        self.assertEqual(code, 0)
+        self.assertEqual(seen, [os.path.realpath(cwd)])
+        self.assertEqual(os.getcwd(), saved_cwd)
+
+    def test_forward_cwd(self):
+        with mock.patch.object(daemon, 'send_frame') as send_frame:
+            with mock.patch.object(daemon, 'recv_frame',
+                                   return_value={'exit': 0}):
+                with mock.patch.object(daemon, '_read_stdin',
+                                       return_value=u''):
+                    with mock.patch.object(daemon.socket, 'socket'):
+                        daemon.forward(['server', 'list'], self.path)
+        self.assertEqual(send_frame.call_args[0][1]['cwd'], os.getcwd())
+
+    def test_run_command_system_exit(self):
+        class ExitApp(FakeApp):
+            def run(self, argv):
+                raise SystemExit(2)
+
+        self.daemon.app_factory = ExitApp
+        self.assertEqual(
+            self.daemon.run_command([], {}, '', mock.Mock(), mock.Mock()),
+            2,
+        )
+
+    def test_bind_running(self):
+        other = daemon.Daemon(self.path, app_factory=FakeApp)
+        self.assertRaises(RuntimeError, other.bind)
+
+
+class TestMain(utils.TestCase):
+
+    def test_no_daemon_runs_locally(self):
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path, 'none')
+        env = {'OS_DAEMON_SOCKET': path, 'OS_TOKEN': 'token'}
+        with mock.patch.dict(os.environ, env):
+            with mock.patch('openstackclient.shell.main',
+                            return_value=5) as shell_main:
+                self.assertEqual(daemon.main(['server', 'list']), 5)
+        shell_main.assert_called_with(['server', 'list'])
+
+    def test_interactive_runs_locally(self):
+        with mock.patch.object(daemon, 'forward') as forward:
+            with mock.patch('openstackclient.shell.main', return_value=0):
+                daemon.main([])
+        self.assertFalse(forward.called)
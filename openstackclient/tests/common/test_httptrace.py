@@ -0,0 +1,177 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Test httptrace module"""
+
+import json
+import logging
+
+import mock
+import requests
+import six
+
+from openstackclient.common import httptrace
+from openstackclient.common import restapi
+from openstackclient.tests.common import test_restapi
+from openstackclient.tests import utils
+
+
+fake_url = 'http://gopher.com/v1/gophers'
+fake_headers = {
+    'X-Auth-Token': '11223344556677889900',
+    'Content-Type': 'application/json',
+}
+
+
+class TestHTTPTracer(utils.TestCase):
+
+    def setUp(self):
+        super(TestHTTPTracer, self).setUp()
+        self.sink = mock.Mock()
+        self.sink.enabled.return_value = True
+        self.tracer = httptrace.HTTPTracer([self.sink], body_limit=32)
+
+    def test_disabled(self):
+        self.sink.enabled.return_value = False
+        with mock.patch.object(httptrace, '_redact_headers') as redact:
+            self.assertIsNone(self.tracer.start('GET', fake_url, {}))
+            self.assertFalse(redact.called)
+        self.assertFalse(self.sink.request.called)
+
+    def test_trace(self):
+        started = self.tracer.start(
+            'POST',
+            fake_url,
+            fake_headers,
+            params={'limit': 1},
+            data='{"gopher": {"name": "mac", "password": "s\\"cret"}}',
+        )
+        trace = self.sink.request.call_args[0][0]
+        self.assertEqual(trace['url'], fake_url + '?limit=1')
+        self.assertEqual(trace['request_headers']['X-Auth-Token'],
+                         httptrace.REDACTED)
+        self.assertEqual(trace['request_headers']['Content-Type'],
+                         'application/json')
+        self.assertNotIn('cret', trace['request_body'])
+        self.assertIn('bytes truncated', trace['request_body'])
+
+        response = test_restapi.FakeResponse(
+            headers={'x-subject-token': 'abc'},
+            status_code=201,
+            data={'gopher': 'x' * 100},
+        )
+        response._content_consumed = True
+        self.tracer.finish(started, response)
+        self.sink.response.assert_called_once_with(trace)
+        self.assertEqual(trace['status'], 201)
+        self.assertEqual(trace['response_headers']['x-subject-token'],
+                         httptrace.REDACTED)
+        self.assertTrue(trace['response_body'].startswith('{"gopher": "xx'))
+        self.assertIsNotNone(trace['elapsed'])
+
+    def test_streamed_body_not_read(self):
+        started = self.tracer.start('GET', fake_url, {})
+        response = mock.Mock(status_code=200, headers={})
+        response._content_consumed = False
+        self.tracer.finish(started, response)
+        self.assertIsNone(started[0]['response_body'])
+
+    def test_error(self):
+        started = self.tracer.start('GET', fake_url, {})
+        self.tracer.finish(started, error=requests.ConnectionError('reset'))
+        self.assertEqual(started[0]['error'], 'reset')
+        self.assertIsNone(started[0]['status'])
+
+
+class TestSinks(utils.TestCase):
+
+    def setUp(self):
+        super(TestSinks, self).setUp()
+        self.stream = six.StringIO()
+
+    def _trace(self, sink, headers=None):
+        tracer = httptrace.HTTPTracer([sink])
+        started = tracer.start('GET', fake_url, fake_headers)
+        response = test_restapi.FakeResponse(
+            headers=headers or {'content-type': 'application/json'},
+            status_code=200,
+            data=[],
+        )
+        response._content_consumed = True
+        tracer.finish(started, response)
+        tracer.close()
+        return self.stream.getvalue()
+
+    def test_curl_stream(self):
+        output = self._trace(httptrace.CurlSink(self.stream))
+        self.assertIn(
+            "REQ: curl -i -X 'GET' '%s' -H 'Content-Type: application/json'"
+            " -H 'X-Auth-Token: %s'" % (fake_url, httptrace.REDACTED),
+            output,
+        )
+        self.assertIn('RESP: [200]', output)
+        self.assertIn('RESP BODY: []', output)
+
+    def test_curl_log_level(self):
+        logger = logging.getLogger('gopher')
+        logger.setLevel(logging.INFO)
+        self.assertFalse(httptrace.CurlSink(logger=logger).enabled())
+        logger.setLevel(logging.DEBUG)
+        self.assertTrue(httptrace.CurlSink(logger=logger).enabled())
+
+    def test_json_lines(self):
+        output = self._trace(httptrace.JSONLinesSink(self.stream))
+        trace = json.loads(output)
+        self.assertEqual(trace['method'], 'GET')
+        self.assertEqual(trace['status'], 200)
+        self.assertEqual(trace['response_body'], '[]')
+
+    def test_har(self):
+        output = self._trace(httptrace.HARSink(self.stream, version='1.0'))
+        log = json.loads(output)['log']
+        self.assertEqual(log['version'], '1.2')
+        self.assertEqual(log['creator']['version'], '1.0')
+        entry = log['entries'][0]
+        self.assertEqual(entry['request']['url'], fake_url)
+        self.assertIn(
+            {'name': 'X-Auth-Token', 'value': httptrace.REDACTED},
+            entry['request']['headers'],
+        )
+        self.assertEqual(entry['response']['status'], 200)
+        self.assertEqual(entry['response']['content']['mimeType'],
+                         'application/json')
+
+    def test_har_mime_type_case(self):
+        output = self._trace(httptrace.HARSink(self.stream),
+                             headers={'Content-Type': 'text/plain'})
+        entry = json.loads(output)['log']['entries'][0]
+        self.assertEqual(entry['response']['content']['mimeType'],
+                         'text/plain')
+
+
+@mock.patch('openstackclient.common.restapi.requests.Session')
+class TestRESTApiTrace(utils.TestCase):
+
+    def test_request_traced(self, session_mock):
+        session_mock.return_value = mock.MagicMock(
+            request=mock.MagicMock(return_value=test_restapi.FakeResponse(
+                status_code=200, data={})),
+        )
+        sink = mock.Mock()
+        api = restapi.RESTApi(tracer=httptrace.HTTPTracer([sink]))
+        api.request('GET', fake_url)
+        trace = sink.response.call_args[0][0]
+        self.assertEqual(trace['method'], 'GET')
+        self.assertEqual(trace['status'], 200)
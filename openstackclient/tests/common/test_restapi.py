@@ -19,6 +19,7 @@ import json
 import mock
 
 import requests
+import six
 
 from openstackclient.common import restapi
 from openstackclient.tests import utils
@@ -57,6 +58,7 @@ class FakeResponse(requests.Response):
 
         self.headers.update(headers)
         self._content = json.dumps(data)
+        self.raw = mock.Mock()
 
 
 @mock.patch('openstackclient.common.restapi.requests.Session')
@@ -253,6 +255,23 @@ class TestRESTApi(utils.TestCase):
         )
         self.assertEqual(gophers, [fake_gopher_mac, fake_gopher_tosh])
 
+    def test_list_stream(self, session_mock):
+        resp = FakeResponse(status_code=200, data=fake_gopher_list)
+        resp._content_consumed = True
+        session_mock.return_value = mock.MagicMock(
+            request=mock.MagicMock(return_value=resp),
+        )
+
+        api = restapi.RESTApi()
+        gophers = api.list(fake_url, response_key=fake_keys, stream=True)
+        session_mock.return_value.request.assert_called_with(
+            'GET',
+            fake_url,
+            allow_redirects=True,
+            stream=True,
+        )
+        self.assertEqual(list(gophers), [fake_gopher_mac, fake_gopher_tosh])
+
     def test_set(self, session_mock):
         new_gopher = fake_gopher_single
         new_gopher[fake_key]['name'] = 'Chip'
@@ -318,3 +337,315 @@ class TestRESTApi(utils.TestCase):
             fake_url,
         )
         self.assertEqual(gopher, fake_gopher_mac)
+
+    def test_adapter_mounted(self, session_mock):
+        adapter = restapi.PooledHTTPAdapter()
+        restapi.RESTApi(adapter=adapter)
+        session_mock.return_value.mount.assert_any_call('http://', adapter)
+        session_mock.return_value.mount.assert_any_call('https://', adapter)
+
+
+class TestPooledHTTPAdapter(utils.TestCase):
+
+    def test_pool_size(self):
+        adapter = restapi.PooledHTTPAdapter(pool_size=3)
+        self.assertEqual(adapter._pool_maxsize, 3)
+
+    def test_connections_opened(self):
+        adapter = restapi.PooledHTTPAdapter()
+        self.assertEqual(adapter.connections_opened, 0)
+
+        pool = adapter.get_connection(fake_url)
+        self.assertEqual(adapter.get_connection(fake_url + '/v2'), pool)
+        pool.num_connections = 2
+        other = adapter.get_connection('https://gopher.org')
+        other.num_connections = 1
+        self.assertEqual(adapter.connections_opened, 3)
+
+        # Evicted pools are still counted
+        adapter.poolmanager.clear()
+        self.assertEqual(adapter.connections_opened, 3)
+
+
+class TestIterJSONList(utils.TestCase):
+
+    def _response(self, body):
+        response = mock.Mock()
+        response.iter_content.side_effect = lambda size: iter(
+            [body[i:i + 3] for i in range(0, len(body), 3)])
+        return response
+
+    def _list(self, body, key=None):
+        response = self._response(body)
+        data = list(restapi.iter_json_list(response, key))
+        response.close.assert_called_once_with()
+        return data
+
+    def test_list(self):
+        body = json.dumps([fake_gopher_mac, fake_gopher_tosh]).encode('utf-8')
+        self.assertEqual(self._list(body), [fake_gopher_mac, fake_gopher_tosh])
+
+    def test_empty(self):
+        self.assertEqual(self._list(b' [ ] '), [])
+
+    def test_key(self):
+        body = json.dumps({
+            'before': {'x': [1, 2]},
+            fake_keys: [fake_gopher_mac, fake_gopher_tosh],
+            'after': 'y',
+        }, sort_keys=True).encode('utf-8')
+        self.assertEqual(self._list(body, fake_keys),
+                         [fake_gopher_mac, fake_gopher_tosh])
+
+    def test_key_missing(self):
+        self.assertRaises(KeyError, self._list, b'{"a": []}', fake_keys)
+        self.assertRaises(KeyError, self._list, b'{}', fake_keys)
+
+    def test_numbers_split(self):
+        self.assertEqual(self._list(b'[12345,678]'), [12345, 678])
+
+    def test_multibyte_split(self):
+        body = u'[{"name": "\u00e9t\u00e9"}]'.encode('utf-8')
+        self.assertEqual(self._list(body), [{'name': u'\u00e9t\u00e9'}])
+
+    def test_truncated(self):
+        self.assertRaises(ValueError, self._list, b'[{"a": 1}, {"b"')
+
+    def test_lazy(self):
+        response = self._response(b'[1, 2, x')
+        gen = restapi.iter_json_list(response)
+        self.assertEqual(next(gen), 1)
+        self.assertEqual(next(gen), 2)
+        self.assertRaises(ValueError, next, gen)
+
+
+class TestRetryPolicy(utils.TestCase):
+
+    def setUp(self):
+        super(TestRetryPolicy, self).setUp()
+        self.policy = restapi.RetryPolicy(retries=3, backoff=1.0,
+                                          max_elapsed=60.0)
+
+    def test_retryable(self):
+        self.assertTrue(self.policy.is_retryable(
+            'GET', FakeResponse(status_code=503)))
+        self.assertFalse(self.policy.is_retryable(
+            'POST', FakeResponse(status_code=503)))
+        self.assertTrue(self.policy.is_retryable(
+            'POST', FakeResponse(status_code=429)))
+        self.assertFalse(self.policy.is_retryable(
+            'GET', FakeResponse(status_code=404)))
+        # Only a rate limit with Retry-After, otherwise too large
+        self.assertTrue(self.policy.is_retryable(
+            'POST', FakeResponse(status_code=413,
+                                 headers={'Retry-After': '7'})))
+        self.assertFalse(self.policy.is_retryable(
+            'PUT', FakeResponse(status_code=413)))
+        # Connection errors
+        self.assertTrue(self.policy.is_retryable('PUT'))
+        self.assertFalse(self.policy.is_retryable('POST'))
+
+    def test_backoff(self):
+        response = FakeResponse(status_code=503)
+        for attempt, high in ((0, 1.0), (1, 2.0), (2, 4.0)):
+            delay = self.policy.get_delay('GET', attempt, 0, response)
+            self.assertTrue(high / 2 <= delay <= high)
+        self.assertEqual(self.policy.get_delay('GET', 3, 0, response), None)
+
+    def test_retry_after(self):
+        response = FakeResponse(status_code=413, headers={'Retry-After': '7'})
+        self.assertEqual(self.policy.get_delay('POST', 0, 0, response), 7.0)
+
+    def test_too_large(self):
+        response = FakeResponse(status_code=413)
+        self.assertEqual(self.policy.get_delay('PUT', 0, 0, response), None)
+
+    def test_retry_after_date(self):
+        response = FakeResponse(
+            status_code=503,
+            headers={'Retry-After': 'Fri, 31 Dec 1999 23:59:59 GMT'},
+        )
+        self.assertEqual(self.policy.retry_after(response), 0.0)
+
+    def test_max_elapsed(self):
+        response = FakeResponse(status_code=429,
+                                headers={'Retry-After': '30'})
+        self.assertEqual(self.policy.get_delay('GET', 0, 31, response), None)
+
+    @mock.patch('time.sleep')
+    def test_sleep_counted(self, sleep_mock):
+        self.policy.sleep(1.5)
+        self.policy.sleep(0.5)
+        self.assertEqual(self.policy.retry_count, 2)
+        self.assertEqual(self.policy.sleep_time, 2.0)
+        sleep_mock.assert_called_with(0.5)
+
+
+@mock.patch('openstackclient.common.restapi.requests.Session')
+class TestRESTApiRetry(utils.TestCase):
+
+    def setUp(self):
+        super(TestRESTApiRetry, self).setUp()
+        self.policy = restapi.RetryPolicy(retries=2)
+        self.sleep = mock.patch.object(self.policy, 'sleep').start()
+        self.addCleanup(mock.patch.stopall)
+
+    def _api(self, session_mock, *responses):
+        session_mock.return_value = mock.MagicMock(
+            request=mock.MagicMock(side_effect=list(responses)),
+        )
+        return restapi.RESTApi(retry_policy=self.policy)
+
+    def test_retry_then_success(self, session_mock):
+        api = self._api(
+            session_mock,
+            FakeResponse(status_code=503),
+            requests.ConnectionError('reset'),
+            FakeResponse(status_code=200, data=fake_gopher_single),
+        )
+        gopher = api.request('GET', fake_url)
+        self.assertEqual(gopher.json(), fake_gopher_single)
+        self.assertEqual(session_mock.return_value.request.call_count, 3)
+        self.assertEqual(self.sleep.call_count, 2)
+
+    def test_retries_exhausted(self, session_mock):
+        api = self._api(
+            session_mock,
+            *[FakeResponse(status_code=503) for i in range(3)]
+        )
+        self.assertRaises(requests.HTTPError, api.request, 'GET', fake_url)
+        self.assertEqual(session_mock.return_value.request.call_count, 3)
+
+    def test_post_not_retried(self, session_mock):
+        api = self._api(session_mock, requests.ConnectionError('reset'))
+        self.assertRaises(requests.ConnectionError,
+                          api.request, 'POST', fake_url, data='x')
+        self.assertFalse(self.sleep.called)
+
+    def test_too_large_not_retried(self, session_mock):
+        api = self._api(session_mock, FakeResponse(status_code=413))
+        self.assertRaises(requests.HTTPError,
+                          api.request, 'PUT', fake_url, data='x')
+        self.assertEqual(session_mock.return_value.request.call_count, 1)
+        self.assertFalse(self.sleep.called)
+
+    def test_body_rewound(self, session_mock):
+        responses = [
+            FakeResponse(status_code=503),
+            FakeResponse(status_code=201, data={}),
+        ]
+        positions = []
+
+        def request(method, url, data=None):
+            positions.append(data.tell())
+            data.read()
+            return responses.pop(0)
+
+        api = self._api(session_mock)
+        session_mock.return_value.request.side_effect = request
+        body = six.StringIO('gopher')
+        body.read(2)
+        api.request('PUT', fake_url, data=body)
+        self.assertEqual(positions, [2, 2])
+
+
+@mock.patch('openstackclient.common.restapi.requests.Session')
+class TestRESTApiCache(utils.TestCase):
+
+    def setUp(self):
+        super(TestRESTApiCache, self).setUp()
+        self.http_cache = mock.Mock(scope=('cloud',))
+        self.http_cache.make_key.return_value = 'key'
+        self.entry = {
+            'status': 200,
+            'headers': {'content-type': 'application/json'},
+            'version': 'v1',
+        }
+
+    def _api(self, session_mock, *responses):
+        session_mock.return_value = mock.MagicMock(
+            request=mock.MagicMock(side_effect=list(responses)),
+        )
+        return restapi.RESTApi(http_cache=self.http_cache)
+
+    def test_miss_stored(self, session_mock):
+        self.http_cache.get.return_value = None
+        resp = FakeResponse(
+            headers={'etag': '"v1"'}, status_code=200, data=fake_gopher_list)
+        api = self._api(session_mock, resp)
+        self.assertEqual(api.list(fake_url, response_key=fake_keys),
+                         [fake_gopher_mac, fake_gopher_tosh])
+        self.http_cache.make_key.assert_called_with(('cloud',), fake_url)
+        self.http_cache.set.assert_called_once_with(
+            'key', fake_url, 200, resp.headers, resp.content)
+
+    def test_range_not_cached(self, session_mock):
+        resp = FakeResponse(status_code=206, data=fake_gopher_list)
+        api = self._api(session_mock, resp)
+        api.request('GET', fake_url, headers={'Range': 'bytes=0-9'},
+                    stream=True)
+        session_mock.return_value.request.assert_called_with(
+            'GET',
+            fake_url,
+            headers={'Range': 'bytes=0-9'},
+            stream=True,
+        )
+        self.assertFalse(self.http_cache.get.called)
+        # Reading does not change the object
+        self.assertFalse(self.http_cache.invalidate.called)
+        self.assertFalse(self.http_cache.set.called)
+
+    def test_not_modified(self, session_mock):
+        self.http_cache.get.return_value = self.entry
+        self.http_cache.is_fresh.return_value = False
+        self.http_cache.validators.return_value = {'If-None-Match': '"v1"'}
+        self.http_cache.decode.return_value = fake_gopher_list
+        api = self._api(session_mock, FakeResponse(status_code=304))
+        gophers = api.list(fake_url, response_key=fake_keys,
+                           params={'limit': 2})
+        self.assertEqual(gophers, [fake_gopher_mac, fake_gopher_tosh])
+        session_mock.return_value.request.assert_called_with(
+            'GET',
+            fake_url,
+            allow_redirects=True,
+            params={'limit': 2},
+            headers={'If-None-Match': '"v1"'},
+        )
+        self.http_cache.make_key.assert_called_with(
+            ('cloud',), fake_url + '?limit=2')
+        self.http_cache.refresh.assert_called_once_with('key')
+        # The body is left to the cache to read, if it needs to
+        self.http_cache.decode.assert_called_once_with('key', self.entry, None)
+        self.assertFalse(self.http_cache.set.called)
+
+    def test_fresh(self, session_mock):
+        self.http_cache.get.return_value = self.entry
+        self.http_cache.is_fresh.return_value = True
+        self.http_cache.read_body.return_value = b'{}'
+        api = self._api(session_mock)
+        response = api.request('GET', fake_url)
+        self.assertFalse(session_mock.return_value.request.called)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'{}')
+
+    def test_write_invalidates(self, session_mock):
+        api = self._api(session_mock, FakeResponse(status_code=201, data={}))
+        api.request('PUT', fake_url + '/gopher', data='x')
+        self.http_cache.invalidate.assert_called_once_with(
+            fake_url + '/gopher')
+        self.assertFalse(self.http_cache.get.called)
+
+    def test_stream_not_modified(self, session_mock):
+        self.http_cache.get.return_value = self.entry
+        self.http_cache.is_fresh.return_value = False
+        self.http_cache.validators.return_value = {}
+        self.http_cache.read_body.return_value = json.dumps(fake_gopher_list)
+        api = self._api(session_mock, FakeResponse(status_code=304))
+        gophers = api.list(fake_url, response_key=fake_keys, stream=True)
+        self.assertEqual(list(gophers), [fake_gopher_mac, fake_gopher_tosh])
+        session_mock.return_value.request.assert_called_with(
+            'GET',
+            fake_url,
+            allow_redirects=True,
+            headers={},
+        )
@@ -0,0 +1,199 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Test runbook module"""
+
+import json
+import os
+import threading
+
+import fixtures
+import mock
+
+from openstackclient.common import exceptions
+from openstackclient.common import runbook
+from openstackclient.tests import utils
+
+
+class FakeCommand(object):
+    """Prints its argument, fails if it is 'fail', 'flaky' fails once"""
+
+    auth_required = True
+    lock = threading.Lock()
+    calls = []
+
+    def __init__(self, app, app_args):
+        self.app = app
+
+    def get_parser(self, prog_name):
+        parser = mock.Mock()
+        parser.parse_args.side_effect = lambda argv: argv
+        return parser
+
+    def run(self, argv):
+        with self.lock:
+            self.calls.append(argv[0])
+            attempts = self.calls.count(argv[0])
+        if argv[0] == 'fail' or (argv[0] == 'flaky' and attempts == 1):
+            raise Exception('%s failed' % argv[0])
+        self.app.stdout.write('did %s\n' % argv[0])
+        return 0
+
+
+def find_command(argv):
+    if argv[0] != 'do':
+        raise ValueError('Unknown command %r' % argv)
+    return FakeCommand, 'do', argv[1:]
+
+
+def make_steps(*specs):
+    return [
+        runbook.Step(name, ['do', name], after=after)
+        for name, after in specs
+    ]
+
+
+class TestLoadRunbook(utils.TestCase):
+
+    def setUp(self):
+        super(TestLoadRunbook, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+
+    def _write(self, name, data):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            f.write(data)
+        return path
+
+    def test_load_json(self):
+        path = self._write('book.json', json.dumps({'steps': [
+            {'name': 'vol', 'command': "openstack volume create 'my vol'"},
+            {'name': 'attach', 'command': ['server', 'add', 'volume'],
+             'after': 'vol', 'retries': 2},
+        ]}))
+        steps = runbook.load_runbook(path)
+        self.assertEqual(steps[0].argv, ['volume', 'create', 'my vol'])
+        self.assertEqual(steps[1].argv, ['server', 'add', 'volume'])
+        self.assertEqual(steps[1].after, ['vol'])
+        self.assertEqual(steps[1].retries, 2)
+
+    def test_load_list_default_names(self):
+        path = self._write('book.json', json.dumps([
+            {'command': 'server list'},
+            {'command': 'volume list', 'after': ['1']},
+        ]))
+        steps = runbook.load_runbook(path)
+        self.assertEqual([s.name for s in steps], ['1', '2'])
+
+    def test_load_no_command(self):
+        path = self._write('book.json', json.dumps([{'name': 'x'}]))
+        self.assertRaises(
+            exceptions.CommandError, runbook.load_runbook, path)
+
+    def test_load_yaml_without_pyyaml(self):
+        path = self._write('book.yaml', 'steps: []')
+        with mock.patch.object(runbook, 'yaml', None):
+            self.assertRaises(
+                exceptions.CommandError, runbook.load_runbook, path)
+
+
+class TestCheckSteps(utils.TestCase):
+
+    def test_unknown_step(self):
+        steps = make_steps(('a', ['nope']))
+        self.assertRaises(exceptions.CommandError, runbook.check_steps, steps)
+
+    def test_duplicate_step(self):
+        steps = make_steps(('a', []), ('a', []))
+        self.assertRaises(exceptions.CommandError, runbook.check_steps, steps)
+
+    def test_unsafe_step_name(self):
+        for name in ('../../x', 'a/b', '..', ''):
+            steps = make_steps((name, []))
+            self.assertRaises(
+                exceptions.CommandError, runbook.check_steps, steps)
+
+    def test_cycle(self):
+        steps = make_steps(('a', []), ('b', ['a', 'c']), ('c', ['b']))
+        e = self.assertRaises(
+            exceptions.CommandError, runbook.check_steps, steps)
+        self.assertIn('b, c', str(e))
+
+
+class TestRunbookExecutor(utils.TestCase):
+
+    def setUp(self):
+        super(TestRunbookExecutor, self).setUp()
+        FakeCommand.calls = []
+        self.app = mock.Mock()
+        self.app.command_manager.find_command.side_effect = find_command
+
+    def _run(self, steps, **kwargs):
+        executor = runbook.RunbookExecutor(
+            self.app, steps, retry_delay=0, **kwargs)
+        failed = executor.run()
+        return failed, dict((s.name, s) for s in steps)
+
+    def test_order(self):
+        steps = make_steps(
+            ('attach', ['vol', 'server']),
+            ('vol', []),
+            ('server', []),
+            ('check', ['attach']),
+        )
+        failed, result = self._run(steps, workers=4)
+        self.assertEqual(failed, 0)
+        calls = FakeCommand.calls
+        self.assertTrue(calls.index('attach') > calls.index('vol'))
+        self.assertTrue(calls.index('attach') > calls.index('server'))
+        self.assertEqual(calls[-1], 'check')
+        self.assertEqual(result['vol'].output, 'did vol\n')
+        self.assertEqual(result['vol'].status, runbook.OK)
+        self.app.authenticate_user.assert_called_once_with()
+
+    def test_failure_skips_dependents(self):
+        steps = make_steps(
+            ('fail', []),
+            ('child', ['fail']),
+            ('grandchild', ['child', 'other']),
+            ('other', []),
+        )
+        failed, result = self._run(steps)
+        self.assertEqual(failed, 3)
+        self.assertEqual(result['fail'].status, runbook.FAILED)
+        self.assertEqual(result['fail'].error, 'fail failed')
+        self.assertEqual(result['child'].status, runbook.SKIPPED)
+        self.assertEqual(result['grandchild'].status, runbook.SKIPPED)
+        self.assertEqual(result['other'].status, runbook.OK)
+        self.assertNotIn('child', FakeCommand.calls)
+
+    def test_retries(self):
+        steps = make_steps(('flaky', []), ('after', ['flaky']))
+        failed, result = self._run(steps, retries=1)
+        self.assertEqual(failed, 0)
+        self.assertEqual(result['flaky'].attempts, 2)
+        self.assertEqual(result['after'].attempts, 1)
+
+    def test_step_retries_override(self):
+        steps = make_steps(('flaky', []))
+        steps[0].retries = 0
+        failed, result = self._run(steps, retries=5)
+        self.assertEqual(failed, 1)
+        self.assertEqual(result['flaky'].attempts, 1)
+
+    def test_unknown_command(self):
+        steps = [runbook.Step('bad', ['nothing'])]
+        executor = runbook.RunbookExecutor(self.app, steps)
+        self.assertRaises(exceptions.CommandError, executor.run)
@@ -0,0 +1,167 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""Test timing module"""
+
+import json
+
+import mock
+import six
+import requests
+from requests import adapters
+
+from openstackclient.common import timing
+from openstackclient.tests.common import test_restapi
+from openstackclient.tests import utils
+
+
+UUID = '9a0dede9-1f49-4dd9-b1a6-ea1c9ef3a7c0'
+
+
+class TestUrlTemplate(utils.TestCase):
+
+    def test_ids(self):
+        self.assertEqual(
+            timing.url_template(
+                'http://nova:8774/v2/0123456789abcdef0123456789abcdef'
+                '/servers/' + UUID + '/action'),
+            'http://nova:8774/v2/{id}/servers/{id}/action',
+        )
+
+    def test_account_and_query(self):
+        self.assertEqual(
+            timing.url_template(
+                'http://swift/v1/AUTH_0123456789abcdef0123456789abcdef/c1'
+                '?format=json&marker=x'),
+            'http://swift/v1/AUTH_{id}/c1?format=&marker=',
+        )
+
+
+class TestTimer(utils.TestCase):
+
+    def setUp(self):
+        super(TestTimer, self).setUp()
+        self.timer = timing.Timer()
+
+    def test_wall_time(self):
+        self.assertEqual(
+            timing._wall_time([(0, 2), (1, 3), (5, 6), (5.5, 5.6)]), 4)
+
+    @mock.patch('time.time')
+    def test_phases(self, mock_time):
+        mock_time.return_value = 10
+        with self.timer.phase(timing.AUTH):
+            auth = self.timer.start_request('POST', 'http://keystone/tokens')
+            mock_time.return_value = 11
+            self.timer.end_request(auth, 200)
+            mock_time.return_value = 12
+        api = self.timer.start_request('GET', 'http://nova/servers')
+        mock_time.return_value = 15
+        self.timer.end_request(api, 200)
+        self.timer.add_command(6)
+
+        self.assertEqual(auth.phase, timing.AUTH)
+        self.assertEqual(api.phase, timing.API)
+        self.assertEqual(self.timer.totals(),
+                         [('auth', 2), ('api', 3), ('local', 1)])
+        report = self.timer.report(retries=1, retry_wait=0.5)
+        lines = report.splitlines()
+        # Most expensive first
+        self.assertIn('http://nova/servers', lines[1])
+        self.assertIn('http://keystone/tokens', lines[2])
+        self.assertIn('2 request(s), 1 retried, 0.500s waiting', report)
+
+    def test_install(self):
+        original = vars(adapters.HTTPAdapter)['send']
+        response = test_restapi.FakeResponse(status_code=200, data=[1])
+        response._content_consumed = True
+
+        def send(adapter, request, **kwargs):
+            adapter.build_response(request, mock.Mock())
+            return response
+
+        with mock.patch.object(adapters.HTTPAdapter, 'send', send):
+            with mock.patch.object(adapters.HTTPAdapter, 'build_response'):
+                self.timer.install()
+                try:
+                    request = requests.Request(
+                        'PUT', 'http://swift/c1/o1', data='abc').prepare()
+                    adapters.HTTPAdapter().send(request)
+                finally:
+                    self.timer.uninstall()
+                self.assertIs(vars(adapters.HTTPAdapter)['send'], send)
+        self.assertIs(vars(adapters.HTTPAdapter)['send'], original)
+
+        record = self.timer.requests[0]
+        self.assertEqual(record.method, 'PUT')
+        self.assertEqual(record.status, 200)
+        self.assertEqual(record.bytes_out, 3)
+        self.assertEqual(record.bytes_in, 3)
+        self.assertIsNotNone(record.ttfb)
+
+
+class TestTrace(utils.TestCase):
+
+    def tearDown(self):
+        timing.stop_trace()
+        super(TestTrace, self).tearDown()
+
+    def test_span_not_tracing(self):
+        self.assertFalse(timing.tracing())
+        with timing.span('find_resource', name_or_id='gopher') as args:
+            args['calls'] = 1
+        self.assertIsNone(timing.stop_trace())
+
+    def test_spans(self):
+        recorder = timing.start_trace()
+        self.assertTrue(timing.tracing())
+        with timing.span('command', argv='server list'):
+            with timing.span('GET http://nova/servers', 'http') as args:
+                args['status'] = 200
+        self.assertIs(timing.stop_trace(), recorder)
+        self.assertFalse(timing.tracing())
+
+        inner, outer = recorder.events
+        self.assertEqual(outer['name'], 'command')
+        self.assertEqual(outer['ph'], 'X')
+        self.assertEqual(outer['args'], {'argv': 'server list'})
+        self.assertEqual(inner['cat'], 'http')
+        self.assertEqual(inner['args'], {'status': 200})
+        self.assertEqual(inner['tid'], outer['tid'])
+        self.assertTrue(outer['ts'] <= inner['ts'])
+        self.assertTrue(inner['ts'] + inner['dur'] <=
+                        outer['ts'] + outer['dur'])
+
+    def test_span_error(self):
+        recorder = timing.start_trace()
+        try:
+            with timing.span('wait_for_status poll', id='1'):
+                raise ValueError('gone')
+        except ValueError:
+            pass
+        self.assertEqual(recorder.events[0]['args'],
+                         {'id': '1', 'error': 'ValueError: gone'})
+
+    def test_write(self):
+        recorder = timing.start_trace()
+        with timing.span('initialize_app'):
+            pass
+        stream = six.StringIO()
+        recorder.write(stream)
+        trace = json.loads(stream.getvalue())
+        self.assertEqual(trace['displayTimeUnit'], 'ms')
+        names = [e['name'] for e in trace['traceEvents']]
+        self.assertEqual(names, ['initialize_app', 'thread_name'])
+        self.assertEqual(trace['traceEvents'][1]['ph'], 'M')
@@ -0,0 +1,261 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import mock
+
+from keystoneclient.v3 import domains
+
+from openstackclient.common import exceptions
+from openstackclient.common import utils
+from openstackclient.tests import utils as test_utils
+
+
+UUID = '9a0dede9-1f49-4dd9-b1a6-ea1c9ef3a7c0'
+
+
+class NotFound(Exception):
+    """Stands in for the NotFound exceptions of the client libraries"""
+    http_status = 404
+
+
+class Resource(object):
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeManager(object):
+    """A manager holding resources, counting its calls"""
+
+    resource_class = Resource
+
+    def __init__(self, *resources):
+        self.resources = list(resources)
+        self.get = mock.Mock(side_effect=self._get)
+        self.list = mock.Mock(side_effect=self._list)
+
+    def _get(self, id):
+        for r in self.resources:
+            if r.id == id:
+                return r
+        raise NotFound()
+
+    def _list(self, **kwargs):
+        return self.resources
+
+    @property
+    def calls(self):
+        return self.get.call_count + self.list.call_count
+
+
+class ServerManager(FakeManager):
+    """Looks like novaclient's ServerManager to find_resource()"""
+
+    __module__ = 'novaclient.v1_1.servers'
+
+
+class CrudManager(FakeManager):
+    """Looks like a keystoneclient v3 manager to find_resource()"""
+
+    def __init__(self, *resources):
+        super(CrudManager, self).__init__(*resources)
+        list_mock = self.list
+
+        # CrudManager.list() takes the filters as keyword arguments
+        def list(**kwargs):
+            return list_mock(**kwargs)
+
+        list.mock = list_mock
+        self.list = list
+
+    @property
+    def calls(self):
+        return self.get.call_count + self.list.mock.call_count
+
+    def build_url(self, **kwargs):
+        pass
+
+
+class TestFindResource(test_utils.TestCase):
+
+    def setUp(self):
+        super(TestFindResource, self).setUp()
+        self.r1 = Resource(id=UUID, name='one')
+        self.r2 = Resource(id='2', name='two', display_name='second')
+        self.r3 = Resource(id=3, name='three')
+
+    def test_find_by_uuid(self):
+        manager = FakeManager(self.r1)
+        self.assertEqual(utils.find_resource(manager, UUID), self.r1)
+        self.assertEqual(manager.calls, 1)
+
+    def test_find_by_int(self):
+        manager = FakeManager(self.r3)
+        self.assertEqual(utils.find_resource(manager, '3'), self.r3)
+        manager.get.assert_called_once_with(3)
+
+    def test_find_by_raw_id(self):
+        manager = FakeManager(self.r2)
+        self.r2.id = 'default'
+        self.assertEqual(utils.find_resource(manager, 'default'), self.r2)
+        self.assertEqual(manager.calls, 1)
+
+    def test_find_by_name_full_list(self):
+        manager = FakeManager(self.r1, self.r2)
+        self.assertEqual(utils.find_resource(manager, 'two'), self.r2)
+        manager.list.assert_called_once_with()
+        self.assertEqual(manager.calls, 2)
+
+    def test_find_by_display_name(self):
+        manager = FakeManager(self.r1, self.r2)
+        self.assertEqual(utils.find_resource(manager, 'second'), self.r2)
+
+    def test_find_by_name_server_filter(self):
+        manager = ServerManager(self.r1, self.r2)
+        self.assertEqual(utils.find_resource(manager, 'one'), self.r1)
+        # Server IDs are UUIDs, 'one' can only be a name
+        self.assertFalse(manager.get.called)
+        manager.list.assert_called_once_with(search_opts={'name': 'one'})
+
+    def test_find_by_name_regex_chars(self):
+        self.r1.name = 'web.1'
+        manager = ServerManager(self.r1, self.r2)
+        self.assertEqual(utils.find_resource(manager, 'web.1'), self.r1)
+        manager.list.assert_called_once_with()
+
+    def test_find_by_name_inexact_filter(self):
+        # Nova's filter is a regular expression, 'one' also matches 'ones'
+        ones = Resource(id='x', name='ones')
+        manager = ServerManager(ones, self.r1)
+        self.assertEqual(utils.find_resource(manager, 'one'), self.r1)
+
+    def test_find_by_name_crud_filter(self):
+        manager = CrudManager(self.r1, self.r2)
+        self.assertEqual(utils.find_resource(manager, 'two'), self.r2)
+        manager.list.mock.assert_called_once_with(name='two')
+
+    def test_find_by_name_keystone_domain(self):
+        client = mock.Mock()
+        client.get.side_effect = [
+            NotFound(),
+            (None, {'domains': [
+                {'id': 'd1', 'name': 'default'},
+                {'id': 'd2', 'name': 'heat'},
+            ]}),
+        ]
+        manager = domains.DomainManager(client)
+        domain = utils.find_resource(manager, 'heat')
+        self.assertEqual(domain.id, 'd2')
+        # DomainManager.list() takes no filters
+        client.get.assert_called_with('/domains')
+
+    def test_not_found(self):
+        manager = FakeManager(self.r1)
+        self.assertRaises(exceptions.CommandError,
+                          utils.find_resource, manager, 'nope')
+
+    def test_not_unique(self):
+        manager = FakeManager(self.r1, Resource(id='x', name='one'))
+        self.assertRaises(exceptions.CommandError,
+                          utils.find_resource, manager, 'one')
+
+    def test_get_error(self):
+        manager = FakeManager()
+        manager.get.side_effect = ValueError('boom')
+        self.assertRaises(ValueError, utils.find_resource, manager, UUID)
+
+
+class TestFindResourceCache(test_utils.TestCase):
+
+    def setUp(self):
+        super(TestFindResourceCache, self).setUp()
+        self.cache = mock.Mock()
+        self.cache.make_key.side_effect = lambda scope, rtype, name: name
+        self.cache.get.return_value = None
+        utils.set_resolution_cache(self.cache, scope=('cloud', 'project'))
+        self.addCleanup(utils.set_resolution_cache, None)
+        self.r1 = Resource(id=UUID, name='one')
+        self.manager = ServerManager(self.r1)
+
+    def test_miss_stores_id(self):
+        self.assertEqual(utils.find_resource(self.manager, 'one'), self.r1)
+        self.cache.set.assert_called_once_with(
+            'one', 'novaclient.v1_1.servers.ServerManager', UUID)
+
+    def test_hit(self):
+        self.cache.get.return_value = UUID
+        self.assertEqual(utils.find_resource(self.manager, 'one'), self.r1)
+        self.manager.get.assert_called_once_with(UUID)
+        self.assertFalse(self.manager.list.called)
+        self.assertFalse(self.cache.set.called)
+
+    def test_hit_renamed(self):
+        self.cache.get.return_value = UUID
+        self.r1.name = 'uno'
+        self.assertRaises(exceptions.CommandError,
+                          utils.find_resource, self.manager, 'one')
+
+    def test_hit_deleted(self):
+        self.cache.get.return_value = 'gone'
+        self.assertEqual(utils.find_resource(self.manager, 'one'), self.r1)
+        self.cache.set.assert_called_once_with(
+            'one', 'novaclient.v1_1.servers.ServerManager', UUID)
+
+    def test_ids_not_cached(self):
+        utils.find_resource(self.manager, UUID)
+        self.assertFalse(self.cache.get.called)
+        self.assertFalse(self.cache.set.called)
+
+    def test_invalidate(self):
+        utils.set_resolution_cache(self.cache, invalidate=True)
+        self.cache.get.return_value = UUID
+        utils.find_resource(self.manager, 'one')
+        self.assertFalse(self.cache.get.called)
+        self.cache.invalidate.assert_called_once_with(
+            'novaclient.v1_1.servers.ServerManager', UUID)
+
+
+class TestJoinResources(test_utils.TestCase):
+
+    def setUp(self):
+        super(TestJoinResources, self).setUp()
+        self.services = FakeManager(
+            Resource(id='s1', name='nova', type='compute'),
+            Resource(id='s2', name='glance', type='image'),
+        )
+
+    def test_join(self):
+        items = [Resource(service_id='s2'), Resource(service_id='s1')]
+        result = utils.join_resources(
+            iter(items), self.services, 'service_id',
+            {'service_name': 'name', 'service_type': 'type'},
+        )
+        self.assertEqual(result, items)
+        self.assertEqual([i.service_name for i in items], ['glance', 'nova'])
+        self.assertEqual(items[0].service_type, 'image')
+        self.assertEqual(self.services.calls, 1)
+
+    def test_join_not_listed(self):
+        self.services.list.side_effect = lambda: self.services.resources[:1]
+        items = [Resource(service_id='s2'), Resource(service_id='s2')]
+        utils.join_resources(
+            items, self.services, 'service_id', {'service_name': 'name'})
+        self.assertEqual([i.service_name for i in items],
+                         ['glance', 'glance'])
+        self.services.get.assert_called_once_with('s2')
+
+    def test_join_empty(self):
+        self.assertEqual(
+            utils.join_resources([], self.services, 'service_id', {}), [])
+        self.assertEqual(self.services.calls, 0)
@@ -55,6 +55,17 @@ SERVICE = {
     'type': service_type,
 }
 
+endpoint_id = 'e-123'
+
+ENDPOINT = {
+    'id': endpoint_id,
+    'service_id': service_id,
+    'adminurl': 'http://admin',
+    'internalurl': 'http://internal',
+    'publicurl': 'http://public',
+    'region': 'RegionOne',
+}
+
 user_id = 'aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa'
 user_name = 'paul'
 user_description = 'Sir Paul'
@@ -71,6 +82,8 @@ USER = {
 
 class FakeIdentityv2Client(object):
     def __init__(self, **kwargs):
+        self.endpoints = mock.Mock()
+        self.endpoints.resource_class = fakes.FakeResource(None, {})
         self.roles = mock.Mock()
         self.roles.resource_class = fakes.FakeResource(None, {})
         self.services = mock.Mock()
@@ -0,0 +1,116 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+import copy
+
+from openstackclient.identity.v2_0 import endpoint
+from openstackclient.tests import fakes
+from openstackclient.tests.identity.v2_0 import fakes as identity_fakes
+from openstackclient.tests.identity.v2_0 import test_identity
+
+
+class TestEndpoint(test_identity.TestIdentityv2):
+
+    def setUp(self):
+        super(TestEndpoint, self).setUp()
+
+        # Get a shortcut to the EndpointManager Mock
+        self.endpoints_mock = self.app.client_manager.identity.endpoints
+        self.endpoints_mock.reset_mock()
+
+        # Get a shortcut to the ServiceManager Mock
+        self.services_mock = self.app.client_manager.identity.services
+        self.services_mock.reset_mock()
+
+
+class TestEndpointList(TestEndpoint):
+
+    def setUp(self):
+        super(TestEndpointList, self).setUp()
+
+        endpoint_2 = copy.deepcopy(identity_fakes.ENDPOINT)
+        endpoint_2['id'] = 'e-456'
+        self.endpoints_mock.list.return_value = [
+            fakes.FakeResource(
+                None,
+                copy.deepcopy(identity_fakes.ENDPOINT),
+                loaded=True,
+            ),
+            fakes.FakeResource(None, endpoint_2, loaded=True),
+        ]
+        self.services_mock.list.return_value = [
+            fakes.FakeResource(
+                None,
+                copy.deepcopy(identity_fakes.SERVICE),
+                loaded=True,
+            ),
+        ]
+
+        # Get the command object to test
+        self.cmd = endpoint.ListEndpoint(self.app, None)
+
+    def test_endpoint_list_no_options(self):
+        arglist = []
+        verifylist = []
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        # DisplayCommandBase.take_action() returns two tuples
+        columns, data = self.cmd.take_action(parsed_args)
+
+        self.endpoints_mock.list.assert_called_with()
+        # The services are listed once rather than looked up per endpoint
+        self.services_mock.list.assert_called_once_with()
+        self.assertFalse(self.services_mock.get.called)
+
+        collist = ('ID', 'Region', 'Service Name', 'Service Type')
+        self.assertEqual(columns, collist)
+        datalist = ((
+            identity_fakes.endpoint_id,
+            'RegionOne',
+            identity_fakes.service_name,
+            identity_fakes.service_type,
+        ), (
+            'e-456',
+            'RegionOne',
+            identity_fakes.service_name,
+            identity_fakes.service_type,
+        ), )
+        self.assertEqual(tuple(data), datalist)
+
+    def test_endpoint_list_long(self):
+        arglist = [
+            '--long',
+        ]
+        verifylist = [
+            ('long', True),
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        # DisplayCommandBase.take_action() returns two tuples
+        columns, data = self.cmd.take_action(parsed_args)
+
+        collist = ('ID', 'Region', 'Service Name', 'Service Type',
+                   'PublicURL', 'AdminURL', 'InternalURL')
+        self.assertEqual(columns, collist)
+        datalist = (
+            identity_fakes.endpoint_id,
+            'RegionOne',
+            identity_fakes.service_name,
+            identity_fakes.service_type,
+            'http://public',
+            'http://admin',
+            'http://internal',
+        )
+        self.assertEqual(tuple(data)[0], datalist)
@@ -73,6 +73,17 @@ SERVICE = {
     'enabled': True,
 }
 
+endpoint_id = 'e-123'
+
+ENDPOINT = {
+    'id': endpoint_id,
+    'service_id': service_id,
+    'enabled': True,
+    'interface': 'public',
+    'region': 'RegionOne',
+    'url': 'http://public',
+}
+
 user_id = 'aaaaaaaa-aaaa-aaaa-aaaa-aaaaaaaaaaaa'
 user_name = 'paul'
 user_description = 'Sir Paul'
@@ -96,6 +107,8 @@ class FakeIdentityv3Client(object):
         self.groups.resource_class = fakes.FakeResource(None, {})
         self.projects = mock.Mock()
         self.projects.resource_class = fakes.FakeResource(None, {})
+        self.endpoints = mock.Mock()
+        self.endpoints.resource_class = fakes.FakeResource(None, {})
         self.roles = mock.Mock()
         self.roles.resource_class = fakes.FakeResource(None, {})
         self.services = mock.Mock()
@@ -15,8 +15,10 @@
 
 import copy
 import mock
+import six
 
 from openstackclient.common import clientmanager
+from openstackclient.common import exceptions
 from openstackclient.object.v1 import container
 from openstackclient.tests.object import fakes as object_fakes
 from openstackclient.tests import utils
@@ -83,6 +85,7 @@ class TestContainerList(TestObject):
         c_mock.assert_called_with(
             self.app.restapi,
             AUTH_URL,
+            stream=True,
             **kwargs
         )
 
@@ -119,6 +122,7 @@ class TestContainerList(TestObject):
         c_mock.assert_called_with(
             self.app.restapi,
             AUTH_URL,
+            stream=True,
             **kwargs
         )
 
@@ -154,6 +158,7 @@ class TestContainerList(TestObject):
         c_mock.assert_called_with(
             self.app.restapi,
             AUTH_URL,
+            stream=True,
             **kwargs
         )
 
@@ -189,6 +194,7 @@ class TestContainerList(TestObject):
         c_mock.assert_called_with(
             self.app.restapi,
             AUTH_URL,
+            stream=True,
             **kwargs
         )
 
@@ -224,6 +230,7 @@ class TestContainerList(TestObject):
         c_mock.assert_called_with(
             self.app.restapi,
             AUTH_URL,
+            stream=True,
             **kwargs
         )
 
@@ -258,6 +265,7 @@ class TestContainerList(TestObject):
         c_mock.assert_called_with(
             self.app.restapi,
             AUTH_URL,
+            stream=True,
             **kwargs
         )
 
@@ -302,6 +310,7 @@ class TestContainerList(TestObject):
         c_mock.assert_called_with(
             self.app.restapi,
             AUTH_URL,
+            stream=True,
             **kwargs
         )
 
@@ -359,3 +368,156 @@ class TestContainerShow(TestObject):
             object_fakes.container_name,
         )
         self.assertEqual(data, datalist)
+
+
+@mock.patch(
+    'openstackclient.object.v1.container.lib_container.delete_container'
+)
+class TestContainerDelete(TestObject):
+
+    def setUp(self):
+        super(TestContainerDelete, self).setUp()
+
+        # Get the command object to test
+        self.cmd = container.DeleteContainer(self.app, None)
+
+    def test_container_delete(self, c_mock):
+        arglist = [
+            object_fakes.container_name,
+            object_fakes.container_name_2,
+            '--recursive',
+        ]
+        verifylist = [
+            ('containers', [object_fakes.container_name,
+                            object_fakes.container_name_2]),
+            ('recursive', True),
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        self.cmd.take_action(parsed_args)
+
+        c_mock.assert_any_call(
+            self.app.restapi,
+            AUTH_URL,
+            object_fakes.container_name,
+            recursive=True,
+            workers=container.lib_object.DEFAULT_DELETE_WORKERS,
+        )
+        c_mock.assert_called_with(
+            self.app.restapi,
+            AUTH_URL,
+            object_fakes.container_name_2,
+            recursive=True,
+            workers=container.lib_object.DEFAULT_DELETE_WORKERS,
+        )
+
+
+@mock.patch(
+    'openstackclient.object.v1.container.lib_container.show_containers'
+)
+class TestContainerDetails(TestObject):
+
+    columns = (
+        'Account',
+        'Container',
+        'Object Count',
+        'Bytes Used',
+        'Read ACL',
+        'Write ACL',
+        'Sync To',
+        'Sync Key',
+    )
+
+    def setUp(self):
+        super(TestContainerDetails, self).setUp()
+
+        # Get the command object to test
+        self.cmd = container.ListContainerDetails(self.app, None)
+        self.app.stdout = six.StringIO()
+
+    def test_container_details(self, c_mock):
+        c_mock.return_value = iter([
+            (object_fakes.container_name,
+             {'container': 'bucket', 'object_count': '1'}, None),
+            (object_fakes.container_name_2,
+             {'container': 'archive', 'object_count': '2'}, None),
+        ])
+
+        arglist = [
+            object_fakes.container_name,
+            object_fakes.container_name_2,
+            '--unordered',
+            '--workers', '4',
+        ]
+        verifylist = [
+            ('containers', [object_fakes.container_name,
+                            object_fakes.container_name_2]),
+            ('unordered', True),
+            ('workers', 4),
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        columns, data = self.cmd.take_action(parsed_args)
+
+        self.assertEqual(columns, self.columns)
+        self.assertEqual(list(data), [
+            ('', 'bucket', '1', '', '', '', '', ''),
+            ('', 'archive', '2', '', '', '', '', ''),
+        ])
+        c_mock.assert_called_with(
+            self.app.restapi,
+            AUTH_URL,
+            [object_fakes.container_name, object_fakes.container_name_2],
+            workers=4,
+            ordered=False,
+        )
+
+    def test_container_details_csv(self, c_mock):
+        c_mock.return_value = iter([
+            (object_fakes.container_name, {'container': 'bucket'}, None),
+            (object_fakes.container_name_2, {'container': 'archive'}, None),
+        ])
+
+        arglist = [
+            object_fakes.container_name,
+            object_fakes.container_name_2,
+            '-f', 'csv',
+            '-c', 'Container',
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, [])
+
+        self.cmd.run(parsed_args)
+
+        # One document with a single header
+        self.assertEqual(
+            self.app.stdout.getvalue().splitlines(),
+            ['"Container"', '"bucket"', '"archive"'],
+        )
+
+    @mock.patch(
+        'openstackclient.object.v1.container.lib_container.iter_containers'
+    )
+    def test_container_details_prefix(self, list_mock, c_mock):
+        list_mock.return_value = iter([{'name': 'archive'}])
+        c_mock.return_value = iter([
+            ('archive', None, ValueError('gone')),
+        ])
+
+        arglist = [
+            '--prefix', 'arch',
+        ]
+        verifylist = [
+            ('containers', []),
+            ('prefix', 'arch'),
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        columns, data = self.cmd.take_action(parsed_args)
+
+        self.assertRaises(exceptions.CommandError, list, data)
+        list_mock.assert_called_with(
+            self.app.restapi,
+            AUTH_URL,
+            prefix='arch',
+        )
+        self.assertEqual(list(c_mock.call_args[0][2]), ['archive'])
@@ -15,8 +15,10 @@
 
 import copy
 import mock
+import six
 
 from openstackclient.common import clientmanager
+from openstackclient.common import exceptions
 from openstackclient.object.v1 import object as obj
 from openstackclient.tests.object import fakes as object_fakes
 from openstackclient.tests import utils
@@ -52,6 +54,61 @@ class TestObjectClient(TestObject):
         self.assertEqual(self.app.client_manager.object.token, AUTH_TOKEN)
 
 
+@mock.patch(
+    'openstackclient.object.v1.object.lib_object.create_object'
+)
+class TestObjectCreate(TestObject):
+
+    def setUp(self):
+        super(TestObjectCreate, self).setUp()
+
+        # Get the command object to test
+        self.cmd = obj.CreateObject(self.app, None)
+
+    def test_object_create(self, o_mock):
+        o_mock.return_value = {
+            'container': object_fakes.container_name,
+            'object': object_fakes.object_name_1,
+            'etag': 'qaz',
+        }
+
+        arglist = [
+            object_fakes.container_name,
+            '/tmp/raindrop',
+            '--name', object_fakes.object_name_1,
+            '--segment-size', '1048576',
+            '--manifest', 'dlo',
+        ]
+        verifylist = [
+            ('container', object_fakes.container_name),
+            ('file', '/tmp/raindrop'),
+            ('name', object_fakes.object_name_1),
+            ('segment_size', 1048576),
+            ('manifest', 'dlo'),
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        # DisplayCommandBase.take_action() returns two tuples
+        columns, data = self.cmd.take_action(parsed_args)
+
+        o_mock.assert_called_with(
+            self.app.restapi,
+            AUTH_URL,
+            object_fakes.container_name,
+            '/tmp/raindrop',
+            obj=object_fakes.object_name_1,
+            segment_size=1048576,
+            segment_container=None,
+            manifest='dlo',
+            workers=10,
+        )
+        self.assertEqual(columns, ('container', 'etag', 'object'))
+        self.assertEqual(
+            data,
+            (object_fakes.container_name, 'qaz', object_fakes.object_name_1),
+        )
+
+
 @mock.patch(
     'openstackclient.object.v1.object.lib_object.list_objects'
 )
@@ -84,6 +141,7 @@ class TestObjectList(TestObject):
             self.app.restapi,
             AUTH_URL,
             object_fakes.container_name,
+            stream=True,
         )
 
         collist = ('Name',)
@@ -120,6 +178,7 @@ class TestObjectList(TestObject):
             self.app.restapi,
             AUTH_URL,
             object_fakes.container_name_2,
+            stream=True,
             **kwargs
         )
 
@@ -156,6 +215,7 @@ class TestObjectList(TestObject):
             self.app.restapi,
             AUTH_URL,
             object_fakes.container_name_2,
+            stream=True,
             **kwargs
         )
 
@@ -192,6 +252,7 @@ class TestObjectList(TestObject):
             self.app.restapi,
             AUTH_URL,
             object_fakes.container_name_2,
+            stream=True,
             **kwargs
         )
 
@@ -228,6 +289,7 @@ class TestObjectList(TestObject):
             self.app.restapi,
             AUTH_URL,
             object_fakes.container_name_2,
+            stream=True,
             **kwargs
         )
 
@@ -264,6 +326,7 @@ class TestObjectList(TestObject):
             self.app.restapi,
             AUTH_URL,
             object_fakes.container_name_2,
+            stream=True,
             **kwargs
         )
 
@@ -300,6 +363,7 @@ class TestObjectList(TestObject):
             self.app.restapi,
             AUTH_URL,
             object_fakes.container_name,
+            stream=True,
             **kwargs
         )
 
@@ -350,6 +414,7 @@ class TestObjectList(TestObject):
             self.app.restapi,
             AUTH_URL,
             object_fakes.container_name,
+            stream=True,
             **kwargs
         )
 
@@ -361,6 +426,123 @@ class TestObjectList(TestObject):
         )
         self.assertEqual(tuple(data), datalist)
 
+    def test_object_list_objects_all_shards(self, o_mock):
+        o_mock.return_value = [
+            copy.deepcopy(object_fakes.OBJECT),
+            copy.deepcopy(object_fakes.OBJECT_2),
+        ]
+
+        arglist = [
+            '--all',
+            '--shards', '8',
+            object_fakes.container_name,
+        ]
+        verifylist = [
+            ('all', True),
+            ('shards', 8),
+            ('container', object_fakes.container_name),
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        # DisplayCommandBase.take_action() returns two tuples
+        columns, data = self.cmd.take_action(parsed_args)
+
+        # Set expected values
+        kwargs = {
+            'full_listing': True,
+            'shards': 8,
+        }
+        o_mock.assert_called_with(
+            self.app.restapi,
+            AUTH_URL,
+            object_fakes.container_name,
+            stream=True,
+            **kwargs
+        )
+        self.assertEqual(len(tuple(data)), 2)
+
+
+@mock.patch(
+    'openstackclient.object.v1.object.lib_object.object_usage'
+)
+class TestObjectUsage(TestObject):
+
+    def setUp(self):
+        super(TestObjectUsage, self).setUp()
+
+        # Get the command object to test
+        self.cmd = obj.ListObjectUsage(self.app, None)
+
+    def test_object_usage(self, o_mock):
+        o_mock.return_value = iter([('a/', 2, 10), ('', 3, 15)])
+
+        arglist = [
+            object_fakes.container_name,
+            '--prefix', 'a',
+            '--depth', '2',
+        ]
+        verifylist = [
+            ('container', object_fakes.container_name),
+            ('prefix', 'a'),
+            ('delimiter', '/'),
+            ('depth', 2),
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        # DisplayCommandBase.take_action() returns two tuples
+        columns, data = self.cmd.take_action(parsed_args)
+
+        o_mock.assert_called_with(
+            self.app.restapi,
+            AUTH_URL,
+            object_fakes.container_name,
+            prefix='a',
+            delimiter='/',
+            depth=2,
+            workers=obj.lib_object.DEFAULT_USAGE_WORKERS,
+        )
+        self.assertEqual(columns, ('Prefix', 'Objects', 'Bytes'))
+        self.assertEqual(list(data), [('a/', 2, 10), ('', 3, 15)])
+
+
+@mock.patch(
+    'openstackclient.object.v1.object.lib_object.save_object'
+)
+class TestObjectSave(TestObject):
+
+    def setUp(self):
+        super(TestObjectSave, self).setUp()
+
+        # Get the command object to test
+        self.cmd = obj.SaveObject(self.app, None)
+
+    def test_object_save(self, o_mock):
+        arglist = [
+            object_fakes.container_name,
+            object_fakes.object_name_1,
+            '--file', '/tmp/raindrop',
+            '--workers', '4',
+        ]
+        verifylist = [
+            ('container', object_fakes.container_name),
+            ('object', object_fakes.object_name_1),
+            ('file', '/tmp/raindrop'),
+            ('workers', 4),
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        self.cmd.take_action(parsed_args)
+
+        o_mock.assert_called_with(
+            self.app.restapi,
+            AUTH_URL,
+            object_fakes.container_name,
+            object_fakes.object_name_1,
+            file='/tmp/raindrop',
+            range_size=obj.lib_object.DEFAULT_RANGE_SIZE,
+            workers=4,
+        )
+
 
 @mock.patch(
     'openstackclient.object.v1.object.lib_object.show_object'
@@ -411,3 +593,204 @@ class TestObjectShow(TestObject):
             object_fakes.object_name_1,
         )
         self.assertEqual(data, datalist)
+
+
+@mock.patch(
+    'openstackclient.object.v1.object.lib_object.sync_objects'
+)
+class TestObjectSync(TestObject):
+
+    def setUp(self):
+        super(TestObjectSync, self).setUp()
+
+        # Get the command object to test
+        self.cmd = obj.SyncObject(self.app, None)
+
+    def test_object_sync(self, o_mock):
+        o_mock.return_value = {'failed': 0, 'uploaded': 2}
+
+        arglist = [
+            object_fakes.container_name,
+            '/tmp/rain',
+            '--object-prefix', 'drops/',
+            '--delete',
+            '--dry-run',
+        ]
+        verifylist = [
+            ('container', object_fakes.container_name),
+            ('directory', '/tmp/rain'),
+            ('object_prefix', 'drops/'),
+            ('delete', True),
+            ('dry_run', True),
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        with mock.patch.object(obj.cache, 'HashIndex') as index_mock:
+            # DisplayCommandBase.take_action() returns two tuples
+            columns, data = self.cmd.take_action(parsed_args)
+
+        o_mock.assert_called_with(
+            self.app.restapi,
+            AUTH_URL,
+            object_fakes.container_name,
+            '/tmp/rain',
+            prefix='drops/',
+            delete=True,
+            dry_run=True,
+            hash_index=index_mock.return_value,
+            segment_size=obj.lib_object.DEFAULT_SEGMENT_SIZE,
+            workers=obj.lib_object.DEFAULT_UPLOAD_WORKERS,
+        )
+        index_mock.return_value.close.assert_called_once_with()
+        self.assertEqual(columns, ('failed', 'uploaded'))
+        self.assertEqual(data, (0, 2))
+
+    def test_object_sync_failed(self, o_mock):
+        o_mock.return_value = {'failed': 1, 'uploaded': 2}
+
+        parsed_args = self.check_parser(
+            self.cmd,
+            [object_fakes.container_name, '/tmp/rain'],
+            [],
+        )
+
+        self.app.stdout = six.StringIO()
+        with mock.patch.object(obj.cache, 'HashIndex'):
+            status = self.cmd.run(parsed_args)
+
+        # The summary is still written
+        self.assertEqual(status, 1)
+        self.assertIn('uploaded', self.app.stdout.getvalue())
+        self.assertIn('failed', self.app.stdout.getvalue())
+
+
+@mock.patch(
+    'openstackclient.object.v1.object.lib_object.delete_objects'
+)
+class TestObjectDelete(TestObject):
+
+    def setUp(self):
+        super(TestObjectDelete, self).setUp()
+
+        # Get the command object to test
+        self.cmd = obj.DeleteObject(self.app, None)
+
+    def test_object_delete(self, o_mock):
+        o_mock.return_value = {'deleted': 2, 'not-found': 0, 'failed': 0}
+
+        arglist = [
+            object_fakes.container_name,
+            object_fakes.object_name_1,
+            object_fakes.object_name_2,
+            '--bulk',
+        ]
+        verifylist = [
+            ('container', object_fakes.container_name),
+            ('objects', [object_fakes.object_name_1,
+                         object_fakes.object_name_2]),
+            ('bulk', True),
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        self.cmd.take_action(parsed_args)
+
+        o_mock.assert_called_with(
+            self.app.restapi,
+            AUTH_URL,
+            object_fakes.container_name,
+            [object_fakes.object_name_1, object_fakes.object_name_2],
+            bulk=True,
+            workers=obj.lib_object.DEFAULT_DELETE_WORKERS,
+        )
+
+    def test_object_delete_failed(self, o_mock):
+        o_mock.return_value = {'deleted': 1, 'not-found': 0, 'failed': 1}
+
+        parsed_args = self.check_parser(
+            self.cmd,
+            [object_fakes.container_name, object_fakes.object_name_1],
+            [],
+        )
+
+        self.assertRaises(
+            exceptions.CommandError,
+            self.cmd.take_action,
+            parsed_args,
+        )
+
+
+@mock.patch(
+    'openstackclient.object.v1.object.lib_object.show_objects'
+)
+class TestObjectDetails(TestObject):
+
+    def setUp(self):
+        super(TestObjectDetails, self).setUp()
+
+        # Get the command object to test
+        self.cmd = obj.ListObjectDetails(self.app, None)
+
+    @mock.patch(
+        'openstackclient.object.v1.object.lib_object.iter_objects'
+    )
+    def test_object_details_all(self, list_mock, o_mock):
+        list_mock.return_value = iter([
+            {'name': object_fakes.object_name_1},
+            {'name': object_fakes.object_name_2},
+        ])
+        o_mock.return_value = iter([
+            (object_fakes.object_name_1,
+             {'object': object_fakes.object_name_1, 'etag': 'abc'}, None),
+        ])
+
+        arglist = [
+            object_fakes.container_name,
+            '--all',
+        ]
+        verifylist = [
+            ('container', object_fakes.container_name),
+            ('objects', []),
+            ('all', True),
+        ]
+        parsed_args = self.check_parser(self.cmd, arglist, verifylist)
+
+        columns, data = self.cmd.take_action(parsed_args)
+
+        self.assertEqual(columns, (
+            'Account',
+            'Container',
+            'Object',
+            'Content-Type',
+            'Content-Length',
+            'Last-Modified',
+            'ETag',
+            'X-Object-Manifest',
+        ))
+        self.assertEqual(list(data), [
+            ('', '', object_fakes.object_name_1, '', '', '', 'abc', ''),
+        ])
+        args, kwargs = o_mock.call_args
+        self.assertEqual(args[:3], (self.app.restapi, AUTH_URL,
+                                    object_fakes.container_name))
+        self.assertEqual(
+            list(args[3]),
+            [object_fakes.object_name_1, object_fakes.object_name_2],
+        )
+        self.assertEqual(kwargs, {
+            'workers': obj.lib_object.DEFAULT_SHOW_WORKERS,
+            'ordered': True,
+        })
+
+    def test_object_details_nothing(self, o_mock):
+        parsed_args = self.check_parser(
+            self.cmd,
+            [object_fakes.container_name],
+            [('objects', [])],
+        )
+
+        self.assertRaises(
+            exceptions.CommandError,
+            self.cmd.take_action,
+            parsed_args,
+        )
+        self.assertFalse(o_mock.called)
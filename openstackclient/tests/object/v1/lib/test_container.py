@@ -17,6 +17,7 @@
 
 import mock
 
+from openstackclient.common import exceptions
 from openstackclient.object.v1.lib import container as lib_container
 from openstackclient.tests.common import test_restapi as restapi
 from openstackclient.tests import fakes
@@ -80,6 +81,22 @@ class TestContainerList(TestContainer):
         )
         self.assertEqual(data, resp)
 
+    def test_container_list_marker_quoted(self):
+        resp = [{'name': 'is-name'}]
+        self.app.restapi.request.return_value = restapi.FakeResponse(data=resp)
+
+        lib_container.list_containers(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            marker='#a&b+c',
+        )
+
+        # Check expected values
+        self.app.restapi.request.assert_called_with(
+            'GET',
+            fake_url + '?format=json&marker=%23a%26b%2Bc',
+        )
+
     def test_container_list_limit(self):
         resp = [{'name': 'is-name'}]
         self.app.restapi.request.return_value = restapi.FakeResponse(data=resp)
@@ -158,6 +175,53 @@ class TestContainerList(TestContainer):
         )
         self.assertEqual(data, resp)
 
+    def test_container_list_stream(self):
+        resp = [{'name': 'is-name'}]
+        response = restapi.FakeResponse(data=resp)
+        response._content_consumed = True
+        self.app.restapi.request.return_value = response
+
+        data = lib_container.list_containers(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            stream=True,
+        )
+
+        self.app.restapi.request.assert_called_with(
+            'GET',
+            fake_url + '?format=json',
+            stream=True,
+        )
+        self.assertEqual(list(data), resp)
+
+    def test_iter_containers(self):
+        pages = [
+            [{'name': 'is-name'}],
+            [{'name': 'is-last'}],
+            [],
+        ]
+
+        def side_effect(*args, **kwargs):
+            rv = restapi.FakeResponse(data=pages.pop(0))
+            rv._content_consumed = True
+            return rv
+
+        self.app.restapi.request.side_effect = side_effect
+
+        data = lib_container.iter_containers(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            prefix='is',
+        )
+
+        self.assertEqual([c['name'] for c in data], ['is-name', 'is-last'])
+        self.app.restapi.request.assert_called_with(
+            'GET',
+            fake_url + '?format=json&marker=is-last&prefix=is',
+            stream=True,
+        )
+        self.assertEqual(self.app.restapi.request.call_count, 3)
+
 
 class TestContainerShow(TestContainer):
 
@@ -192,3 +256,88 @@ class TestContainerShow(TestContainer):
             'sync_key': None,
         }
         self.assertEqual(data, data_expected)
+
+
+@mock.patch(
+    'openstackclient.object.v1.lib.container.lib_object.iter_objects'
+)
+@mock.patch(
+    'openstackclient.object.v1.lib.container.lib_object.delete_objects'
+)
+class TestContainerDelete(TestContainer):
+
+    def test_container_delete(self, delete_mock, iter_mock):
+        lib_container.delete_container(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+        )
+
+        self.assertFalse(delete_mock.called)
+        self.app.restapi.request.assert_called_once_with(
+            'DELETE',
+            fake_url + '/' + fake_container,
+        )
+
+    def test_container_delete_recursive(self, delete_mock, iter_mock):
+        iter_mock.return_value = iter([{'name': 'drop'}, {'name': 'hail'}])
+        delete_mock.return_value = {'deleted': 2, 'not-found': 0,
+                                    'failed': 0}
+
+        data = lib_container.delete_container(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            recursive=True,
+            workers=3,
+        )
+
+        args, kwargs = delete_mock.call_args
+        self.assertEqual(args[:3], (self.app.restapi, fake_url,
+                                    fake_container))
+        # The names are deleted as they are listed
+        self.assertEqual(list(args[3]), ['drop', 'hail'])
+        self.assertEqual(kwargs, {'bulk': True, 'workers': 3})
+        self.app.restapi.request.assert_called_once_with(
+            'DELETE',
+            fake_url + '/' + fake_container,
+        )
+        self.assertEqual(data['deleted'], 2)
+
+    def test_container_delete_recursive_failed(self, delete_mock, iter_mock):
+        delete_mock.return_value = {'deleted': 1, 'not-found': 0,
+                                    'failed': 1}
+
+        self.assertRaises(
+            exceptions.CommandError,
+            lib_container.delete_container,
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            recursive=True,
+        )
+        self.assertFalse(self.app.restapi.request.called)
+
+
+class TestContainerShowMany(TestContainer):
+
+    def test_container_show_many(self):
+        self.app.restapi.request.return_value = restapi.FakeResponse(
+            headers={'x-container-object-count': 1})
+
+        results = list(lib_container.show_containers(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            ['drops', 'hail'],
+            workers=2,
+            ordered=False,
+        ))
+
+        self.assertEqual(
+            sorted((r[0], r[1]['container'], r[2]) for r in results),
+            [('drops', 'drops', None), ('hail', 'hail', None)],
+        )
+        self.app.restapi.request.assert_any_call(
+            'HEAD',
+            fake_url + '/hail',
+        )
@@ -15,13 +15,25 @@
 
 """Test Object API library module"""
 
+import hashlib
+import json
+import os
+
+import fixtures
 import mock
+import requests
 
+from openstackclient.common import exceptions
 from openstackclient.object.v1.lib import object as lib_object
 from openstackclient.tests.common import test_restapi as restapi
 from openstackclient.tests import fakes
 from openstackclient.tests import utils
 
+try:
+    from urllib.parse import unquote
+except ImportError:
+    from urllib import unquote
+
 
 fake_account = 'q12we34r'
 fake_auth = '11223344556677889900'
@@ -83,6 +95,24 @@ class TestObjectListObjects(TestObject):
         )
         self.assertEqual(data, resp)
 
+    def test_list_objects_marker_quoted(self):
+        resp = [{'name': 'is-name'}]
+        self.app.restapi.request.return_value = restapi.FakeResponse(data=resp)
+
+        lib_object.list_objects(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            marker=u'#a&b+caf\xe9',
+        )
+
+        # Check expected values
+        self.app.restapi.request.assert_called_with(
+            'GET',
+            fake_url + '/' + fake_container +
+            '?format=json&marker=%23a%26b%2Bcaf%C3%A9',
+        )
+
     def test_list_objects_limit(self):
         resp = [{'name': 'is-name'}]
         self.app.restapi.request.return_value = restapi.FakeResponse(data=resp)
@@ -136,7 +166,7 @@ class TestObjectListObjects(TestObject):
         #                pipe '|' char in the response.
         self.app.restapi.request.assert_called_with(
             'GET',
-            fake_url + '/' + fake_container + '?format=json&delimiter=|',
+            fake_url + '/' + fake_container + '?format=json&delimiter=%7C',
         )
         self.assertEqual(data, resp)
 
@@ -204,6 +234,219 @@ class TestObjectListObjects(TestObject):
         )
         self.assertEqual(data, resp)
 
+    def test_list_objects_full_listing_stream(self):
+        pages = [
+            [{'name': 'is-name'}, {'subdir': 'is-dir/'}],
+            [{'name': 'is-last'}],
+            [],
+        ]
+
+        def side_effect(*args, **kwargs):
+            rv = restapi.FakeResponse(data=pages.pop(0))
+            rv._content_consumed = True
+            return rv
+
+        self.app.restapi.request.side_effect = side_effect
+
+        data = lib_object.list_objects(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            delimiter='/',
+            full_listing=True,
+            stream=True,
+        )
+
+        # Nothing is requested until the listing is read
+        self.assertFalse(self.app.restapi.request.called)
+        self.assertEqual(
+            [o.get('name', o.get('subdir')) for o in data],
+            ['is-name', 'is-dir/', 'is-last'],
+        )
+        self.assertEqual(
+            self.app.restapi.request.call_args_list,
+            [
+                mock.call(
+                    'GET',
+                    fake_url + '/' + fake_container +
+                    '?format=json&delimiter=/',
+                    stream=True,
+                ),
+                mock.call(
+                    'GET',
+                    fake_url + '/' + fake_container +
+                    '?format=json&marker=is-dir/&delimiter=/',
+                    stream=True,
+                ),
+                mock.call(
+                    'GET',
+                    fake_url + '/' + fake_container +
+                    '?format=json&marker=is-last&delimiter=/',
+                    stream=True,
+                ),
+            ],
+        )
+
+    def test_iter_objects_short_page(self):
+        pages = [
+            [{'name': 'is-name'}, {'name': 'is-next'}],
+            [{'name': 'is-last'}],
+        ]
+        self.app.restapi.request.side_effect = (
+            lambda *args, **kwargs: restapi.FakeResponse(data=pages.pop(0)))
+
+        data = lib_object.iter_objects(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            limit=2,
+            stream=False,
+        )
+
+        self.assertEqual(next(data), {'name': 'is-name'})
+        self.assertEqual(self.app.restapi.request.call_count, 1)
+        self.assertEqual(
+            [o['name'] for o in data],
+            ['is-next', 'is-last'],
+        )
+        # The short second page ends the listing without another request
+        self.app.restapi.request.assert_called_with(
+            'GET',
+            fake_url + '/' + fake_container +
+            '?format=json&marker=is-next&limit=2',
+        )
+        self.assertEqual(self.app.restapi.request.call_count, 2)
+
+
+def _unquote(value):
+    value = unquote(str(value))
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    return value
+
+
+def fake_listing(names):
+    """Return a restapi.request that lists names like Swift does"""
+
+    def request(method, url, **kwargs):
+        query = dict(
+            (k, _unquote(v)) for k, v in
+            (q.split('=', 1) for q in url.split('?', 1)[1].split('&'))
+        )
+        marker = query.get('marker', u'')
+        end_marker = query.get('end_marker')
+        prefix = query.get('prefix', u'')
+        delimiter = query.get('delimiter')
+        limit = int(query.get('limit', 3))
+        data = []
+        for name in sorted(names):
+            if name <= marker or not name.startswith(prefix):
+                continue
+            if end_marker and name >= end_marker:
+                break
+            if delimiter and delimiter in name[len(prefix):]:
+                subdir = name[:name.index(delimiter, len(prefix)) + 1]
+                if subdir <= marker or data and data[-1] == {'subdir': subdir}:
+                    continue
+                data.append({'subdir': subdir})
+            else:
+                data.append({'name': name, 'bytes': len(name)})
+            if len(data) == limit:
+                break
+        response = restapi.FakeResponse(data=data)
+        response._content_consumed = True
+        return response
+
+    return request
+
+
+class TestObjectListSharded(TestObject):
+
+    names = [
+        u'a', u'a/1', u'a/2', u'aa', u'b1', u'b2', u'b3',
+        u'c/x', u'c/y', u'caf\xe9', u'd', u'd/1', u'e',
+    ]
+
+    def setUp(self):
+        super(TestObjectListSharded, self).setUp()
+        self.app.restapi.request.side_effect = fake_listing(self.names)
+
+    def _list(self, **kwargs):
+        return list(lib_object.list_objects(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            full_listing=True,
+            **kwargs
+        ))
+
+    def test_shard_markers(self):
+        markers = lib_object.shard_markers(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            3,
+        )
+        self.assertEqual(markers, [u'b', u'd'])
+
+    def test_shard_markers_common_prefix(self):
+        markers = lib_object.shard_markers(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            4,
+            prefix='b',
+        )
+        self.assertEqual(markers, [u'b2', u'b3'])
+
+    def test_shard_markers_delimiter(self):
+        markers = lib_object.shard_markers(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            20,
+            delimiter='/',
+        )
+        # Never inside a subdir
+        self.assertNotIn(u'a/', markers)
+        self.assertNotIn(u'c/', markers)
+        self.assertIn(u'aa', markers)
+
+    def test_list_sharded(self):
+        for kwargs in (
+            {},
+            {'delimiter': '/'},
+            {'marker': 'a/1', 'end_marker': 'd/'},
+            {'prefix': 'b', 'limit': 2},
+        ):
+            self.assertEqual(
+                self._list(shards=4, **kwargs),
+                self._list(**kwargs),
+            )
+
+    def test_list_sharded_reserved_chars(self):
+        names = [u'#1', u'#2', u'&a', u'&b', u'+x', u'+y', u'z']
+        self.app.restapi.request.side_effect = fake_listing(names)
+        self.assertEqual(
+            [o['name'] for o in self._list(shards=3)],
+            names,
+        )
+
+    def test_list_sharded_error(self):
+        listing = self.app.restapi.request.side_effect
+
+        def request(method, url, **kwargs):
+            if url.endswith('marker=d'):
+                raise restapi.requests.ConnectionError('reset')
+            return listing(method, url, **kwargs)
+
+        self.app.restapi.request.side_effect = request
+        self.assertRaises(
+            restapi.requests.ConnectionError,
+            self._list,
+            shards=3,
+        )
+
 
 class TestObjectShowObjects(TestObject):
 
@@ -274,3 +517,626 @@ class TestObjectShowObjects(TestObject):
             'X-Tra-Header': 'yabba-dabba-do',
         }
         self.assertEqual(data, data_expected)
+
+
+class TestImapWorkers(utils.TestCase):
+
+    def _double(self, value):
+        if value == 3:
+            raise ValueError('three')
+        return value * 2
+
+    def test_ordered(self):
+        results = list(lib_object.imap_workers(
+            self._double, iter(range(5)), 3))
+
+        self.assertEqual(
+            [(item, result) for item, result, error in results],
+            [(0, 0), (1, 2), (2, 4), (3, None), (4, 8)],
+        )
+        self.assertIsInstance(results[3][2], ValueError)
+
+    def test_unordered(self):
+        results = lib_object.imap_workers(
+            self._double, range(5), 2, ordered=False)
+
+        self.assertEqual(
+            sorted((item, result) for item, result, error in results),
+            [(0, 0), (1, 2), (2, 4), (3, None), (4, 8)],
+        )
+
+    def test_items_error(self):
+        def _items():
+            yield 1
+            raise ValueError('listing')
+
+        results = lib_object.imap_workers(self._double, _items(), 2)
+
+        self.assertRaises(ValueError, list, results)
+
+
+class TestObjectShowMany(TestObject):
+
+    def test_show_objects(self):
+        def _request(method, url, **kwargs):
+            if url.endswith('/gone'):
+                raise requests.HTTPError(
+                    response=restapi.FakeResponse(status_code=404))
+            return restapi.FakeResponse(headers={'etag': url[-1]})
+        self.app.restapi.request.side_effect = _request
+
+        results = list(lib_object.show_objects(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            iter(['a', 'gone', 'b']),
+            workers=2,
+        ))
+
+        self.assertEqual([r[0] for r in results], ['a', 'gone', 'b'])
+        self.assertEqual(results[0][1]['etag'], 'a')
+        self.assertEqual(results[0][1]['object'], 'a')
+        self.assertIsNone(results[1][1])
+        self.assertIsInstance(results[1][2], requests.HTTPError)
+        self.assertEqual(results[2][1]['etag'], 'b')
+        self.app.restapi.request.assert_any_call(
+            'HEAD',
+            fake_url + '/' + fake_container + '/b',
+        )
+
+
+class TestObjectCreate(TestObject):
+
+    def setUp(self):
+        super(TestObjectCreate, self).setUp()
+        self.path = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'raindrop.txt')
+        self.content = b'0123456789' * 25
+        with open(self.path, 'wb') as f:
+            f.write(self.content)
+        self.stored = {}
+        self.existing = []
+        self.app.restapi.request.side_effect = self._request
+
+    def _request(self, method, url, data=None, headers=None, **kwargs):
+        if method == 'GET':
+            response = restapi.FakeResponse(
+                data=[] if 'marker=' in url else self.existing)
+            response._content_consumed = True
+            return response
+        if hasattr(data, 'read'):
+            data.seek(0, 2)
+            data.seek(0)
+            data = data.read()
+        self.stored[url] = data
+        return restapi.FakeResponse(
+            headers={'etag': hashlib.md5(data or b'').hexdigest()})
+
+    def _create(self, obj=fake_object, **kwargs):
+        return lib_object.create_object(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            self.path,
+            obj=obj,
+            **kwargs
+        )
+
+    def test_create_object(self):
+        data = self._create()
+
+        object_url = fake_url + '/' + fake_container + '/' + fake_object
+        self.assertEqual(self.stored, {object_url: self.content})
+        self.assertEqual(data['etag'], hashlib.md5(self.content).hexdigest())
+        self.assertEqual(data['content-length'], 250)
+        self.assertEqual(data['content-type'], 'text/plain')
+
+    def test_create_object_corrupted(self):
+        self.app.restapi.request.side_effect = None
+        self.app.restapi.request.return_value = restapi.FakeResponse(
+            headers={'etag': 'bad'})
+        self.assertRaises(exceptions.CommandError, self._create)
+
+    def test_create_object_segments(self):
+        prefix = '%s/%f/250/100/' % (fake_object, os.path.getmtime(self.path))
+        # The first segment was uploaded by an interrupted run
+        self.existing = [{
+            'name': prefix + '00000000',
+            'bytes': 100,
+            'hash': hashlib.md5(self.content[:100]).hexdigest(),
+        }]
+
+        data = self._create(segment_size=100, workers=2)
+
+        segment_url = fake_url + '/' + fake_container + '_segments/' + prefix
+        self.assertNotIn(segment_url + '00000000', self.stored)
+        self.assertEqual(self.stored[segment_url + '00000001'],
+                         self.content[100:200])
+        self.assertEqual(self.stored[segment_url + '00000002'],
+                         self.content[200:])
+        manifest = json.loads(self.stored[
+            fake_url + '/' + fake_container + '/' + fake_object +
+            '?multipart-manifest=put'])
+        self.assertEqual(
+            [(m['path'], m['size_bytes'], m['etag']) for m in manifest],
+            [
+                ('/%s_segments/%s%08d' % (fake_container, prefix, i),
+                 len(self.content[i * 100:(i + 1) * 100]),
+                 hashlib.md5(self.content[i * 100:(i + 1) * 100]).hexdigest())
+                for i in range(3)
+            ],
+        )
+        self.assertEqual(data['segments'], 3)
+
+    def test_create_object_dlo(self):
+        self._create(segment_size=100, manifest='dlo')
+
+        self.app.restapi.request.assert_called_with(
+            'PUT',
+            fake_url + '/' + fake_container + '/' + fake_object,
+            headers={
+                'Content-Type': 'text/plain',
+                'X-Object-Manifest': '%s_segments/%s/%f/250/100/' % (
+                    fake_container, fake_object, os.path.getmtime(self.path)),
+            },
+        )
+
+    def test_create_object_reserved_chars(self):
+        for name, quoted in (
+            ('a#b', 'a%23b'),
+            ('a?b', 'a%3Fb'),
+            ('100%25', '100%2525'),
+        ):
+            self.stored = {}
+            self._create(obj=name)
+            self.assertEqual(
+                list(self.stored),
+                [fake_url + '/' + fake_container + '/' + quoted],
+            )
+
+    def test_create_object_segments_reserved_chars(self):
+        prefix = 'a%%23b/%f/250/100/' % os.path.getmtime(self.path)
+
+        self._create(obj='a#b', segment_size=100, manifest='dlo')
+
+        segment_url = fake_url + '/' + fake_container + '_segments/' + prefix
+        for i in range(3):
+            self.assertIn(segment_url + '%08d' % i, self.stored)
+        self.app.restapi.request.assert_called_with(
+            'PUT',
+            fake_url + '/' + fake_container + '/a%23b',
+            headers={
+                'Content-Type': 'text/plain',
+                'X-Object-Manifest': '%s_segments/%s' % (
+                    fake_container, prefix),
+            },
+        )
+
+
+class TestObjectSave(TestObject):
+
+    def setUp(self):
+        super(TestObjectSave, self).setUp()
+        self.file = os.path.join(
+            self.useFixture(fixtures.TempDir()).path, 'raindrop.txt')
+        self.content = b'0123456789' * 25
+        self.headers = {
+            'content-length': '250',
+            'etag': hashlib.md5(self.content).hexdigest(),
+        }
+        self.objects = {}
+        self.app.restapi.request.side_effect = self._request
+
+    def _request(self, method, url, headers=None, **kwargs):
+        if method == 'HEAD':
+            return restapi.FakeResponse(headers=self.headers)
+        if url.endswith('?multipart-manifest=get'):
+            return restapi.FakeResponse(data=self.manifest)
+        content = self.objects.get(url, self.content)
+        start, end = headers['Range'][len('bytes='):].split('-')
+        response = restapi.FakeResponse(status_code=206)
+        response._content = content[int(start):int(end) + 1]
+        response._content_consumed = True
+        return response
+
+    def _save(self, **kwargs):
+        return lib_object.save_object(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            fake_object,
+            file=self.file,
+            **kwargs
+        )
+
+    def _read(self):
+        with open(self.file, 'rb') as f:
+            return f.read()
+
+    def test_save_object(self):
+        self.assertEqual(self._save(range_size=100, workers=2), self.file)
+
+        self.assertEqual(self._read(), self.content)
+        ranges = sorted(
+            c[1]['headers']['Range']
+            for c in self.app.restapi.request.call_args_list
+            if c[0][0] == 'GET'
+        )
+        self.assertEqual(
+            ranges,
+            ['bytes=0-99', 'bytes=100-199', 'bytes=200-249'],
+        )
+
+    def test_save_object_corrupted(self):
+        self.headers['etag'] = hashlib.md5(b'other').hexdigest()
+
+        self.assertRaises(exceptions.CommandError, self._save)
+        # Nothing is left behind
+        self.assertEqual(os.listdir(os.path.dirname(self.file)), [])
+
+    def test_save_object_slo(self):
+        self.headers['x-static-large-object'] = 'True'
+        self.manifest = []
+        for i in range(3):
+            name = '/%s_segments/%s/%08d' % (fake_container, fake_object, i)
+            segment = self.content[i * 100:(i + 1) * 100]
+            self.objects[fake_url + name] = segment
+            self.manifest.append({
+                'name': name,
+                'bytes': len(segment),
+                'hash': hashlib.md5(segment).hexdigest(),
+            })
+
+        self._save(range_size=60)
+
+        self.assertEqual(self._read(), self.content)
+        self.app.restapi.request.assert_any_call(
+            'GET',
+            fake_url + '/%s_segments/%s/00000002' % (
+                fake_container, fake_object),
+            headers={'Range': 'bytes=0-49'},
+            stream=True,
+        )
+
+    def test_save_object_mode(self):
+        umask = os.umask(0o027)
+        try:
+            with mock.patch('os.umask') as umask_mock:
+                self._save()
+        finally:
+            os.umask(umask)
+
+        # The umask decides the mode, it is never changed
+        self.assertFalse(umask_mock.called)
+        self.assertEqual(os.stat(self.file).st_mode & 0o777, 0o640)
+
+    def test_save_object_range_failed(self):
+        def _request(method, url, headers=None, **kwargs):
+            if headers and headers['Range'] == 'bytes=100-199':
+                raise requests.ConnectionError('reset')
+            return self._request(method, url, headers=headers, **kwargs)
+        self.app.restapi.request.side_effect = _request
+
+        self.assertRaises(
+            requests.ConnectionError,
+            self._save,
+            range_size=100,
+            workers=2,
+        )
+        self.assertEqual(os.listdir(os.path.dirname(self.file)), [])
+
+    def test_save_object_reserved_chars(self):
+        self.objects[fake_url + '/' + fake_container + '/a%23b'] = b'hash'
+        self.headers = {
+            'content-length': '4',
+            'etag': hashlib.md5(b'hash').hexdigest(),
+        }
+
+        lib_object.save_object(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            'a#b',
+            file=self.file,
+        )
+
+        self.assertEqual(self._read(), b'hash')
+        self.app.restapi.request.assert_any_call(
+            'HEAD', fake_url + '/' + fake_container + '/a%23b')
+
+
+class TestObjectSync(TestObject):
+
+    def setUp(self):
+        super(TestObjectSync, self).setUp()
+        self.directory = self.useFixture(fixtures.TempDir()).path
+        self.files = {'same': b'unchanged', 'sub/changed': b'new content'}
+        for name, content in self.files.items():
+            path = os.path.join(self.directory, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'wb') as f:
+                f.write(content)
+        self.existing = [
+            {
+                'name': 'same',
+                'bytes': 9,
+                'hash': hashlib.md5(b'unchanged').hexdigest(),
+            },
+            {'name': 'sub/changed', 'bytes': 11, 'hash': 'old'},
+            {'name': 'gone', 'bytes': 4, 'hash': 'qaz'},
+        ]
+        self.app.restapi.request.side_effect = self._request
+
+    def _request(self, method, url, data=None, **kwargs):
+        if method == 'GET':
+            response = restapi.FakeResponse(
+                data=[] if 'marker=' in url else self.existing)
+            response._content_consumed = True
+            return response
+        if hasattr(data, 'read'):
+            data = data.read()
+        return restapi.FakeResponse(
+            headers={'etag': hashlib.md5(data or b'').hexdigest()})
+
+    def _sync(self, **kwargs):
+        return lib_object.sync_objects(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            self.directory,
+            **kwargs
+        )
+
+    def _changes(self):
+        return sorted(
+            (c[0][0], c[0][1])
+            for c in self.app.restapi.request.call_args_list
+            if c[0][0] != 'GET'
+        )
+
+    def test_sync_objects(self):
+        # The workers share the mock, set up its methods beforehand
+        hash_index = mock.Mock(get=mock.Mock(), set=mock.Mock())
+        hash_index.get.return_value = (None, None)
+
+        data = self._sync(delete=True, hash_index=hash_index)
+
+        container_url = fake_url + '/' + fake_container
+        self.assertEqual(
+            self._changes(),
+            [
+                ('DELETE', container_url + '/gone'),
+                ('PUT', container_url + '/sub/changed'),
+            ],
+        )
+        self.assertEqual(data['uploaded'], 1)
+        self.assertEqual(data['uploaded-bytes'], 11)
+        self.assertEqual(data['unchanged'], 1)
+        self.assertEqual(data['unchanged-bytes'], 9)
+        self.assertEqual(data['deleted'], 1)
+        self.assertEqual(data['failed'], 0)
+        etag = hashlib.md5(b'new content').hexdigest()
+        hash_index.set.assert_any_call(
+            os.path.join(self.directory, 'sub/changed'),
+            11,
+            os.path.getmtime(os.path.join(self.directory, 'sub/changed')),
+            etag,
+            etag,
+        )
+
+    def test_sync_objects_reserved_chars(self):
+        with open(os.path.join(self.directory, 'a#b'), 'wb') as f:
+            f.write(b'hash')
+        self.existing = [{'name': '100%25', 'bytes': 1, 'hash': 'x'}]
+
+        self._sync(delete=True)
+
+        container_url = fake_url + '/' + fake_container
+        self.assertEqual(
+            self._changes(),
+            [
+                ('DELETE', container_url + '/100%2525'),
+                ('PUT', container_url + '/a%23b'),
+                ('PUT', container_url + '/same'),
+                ('PUT', container_url + '/sub/changed'),
+            ],
+        )
+
+    def test_sync_objects_indexed_etag(self):
+        # The recorded MD5 or ETag of the last upload is used
+        hash_index = mock.Mock(get=mock.Mock(), set=mock.Mock())
+        hash_index.get.side_effect = lambda path, size, mtime: {
+            'same': (hashlib.md5(b'unchanged').hexdigest(), None),
+            'changed': (None, 'old'),
+        }[os.path.basename(path)]
+
+        with mock.patch.object(lib_object, '_file_md5') as file_md5:
+            data = self._sync(hash_index=hash_index)
+
+        self.assertFalse(file_md5.called)
+        self.assertEqual(self._changes(), [])
+        self.assertEqual(data['unchanged'], 2)
+
+    def test_sync_objects_dry_run(self):
+        data = self._sync(delete=True, dry_run=True)
+
+        self.assertEqual(self._changes(), [])
+        self.assertEqual(data['uploaded'], 1)
+        self.assertEqual(data['deleted'], 1)
+
+
+class TestObjectDelete(TestObject):
+
+    def setUp(self):
+        super(TestObjectDelete, self).setUp()
+        self.info = {'bulk_delete': {'max_deletes_per_request': 2}}
+        self.bulk = True
+        self.app.restapi.request.side_effect = self._request
+
+    def _request(self, method, url, data=None, **kwargs):
+        if url.endswith('/info'):
+            if self.info is None:
+                raise requests.HTTPError(
+                    response=restapi.FakeResponse(status_code=404))
+            return restapi.FakeResponse(data=self.info)
+        if method == 'POST':
+            if not self.bulk:
+                return restapi.FakeResponse(status_code=204)
+            paths = data.split('\n')
+            errors = [[p, '409 Conflict'] for p in paths if 'busy' in p]
+            return restapi.FakeResponse(data={
+                'Number Deleted': len(paths) - len(errors),
+                'Number Not Found': 0,
+                'Errors': errors,
+            })
+        if url.endswith('/busy'):
+            raise requests.HTTPError(
+                response=restapi.FakeResponse(status_code=409))
+        if url.endswith('/gone'):
+            raise requests.HTTPError(
+                response=restapi.FakeResponse(status_code=404))
+        return restapi.FakeResponse(status_code=204)
+
+    def _delete(self, names, **kwargs):
+        return lib_object.delete_objects(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            iter(names),
+            **kwargs
+        )
+
+    def _requests(self, method):
+        return [
+            c for c in self.app.restapi.request.call_args_list
+            if c[0][0] == method
+        ]
+
+    def test_bulk_delete_size(self):
+        size = lib_object.bulk_delete_size(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+        )
+
+        self.assertEqual(size, 2)
+        self.app.restapi.request.assert_called_with(
+            'GET', 'http://gopher.com/info')
+
+    def test_bulk_delete_size_no_middleware(self):
+        self.info = {'swift': {}}
+        self.assertEqual(lib_object.bulk_delete_size(
+            self.app.restapi, fake_url), 0)
+
+    def test_bulk_delete_size_no_info(self):
+        self.info = None
+        self.assertEqual(
+            lib_object.bulk_delete_size(self.app.restapi, fake_url),
+            lib_object.DEFAULT_BULK_DELETE_SIZE,
+        )
+
+    def test_delete_objects_bulk(self):
+        data = self._delete([u'rain drop', 'busy', 'hail'], bulk=True)
+
+        posts = self._requests('POST')
+        self.assertEqual(len(posts), 2)
+        self.assertEqual(posts[0][0][1], fake_url + '?bulk-delete')
+        self.assertEqual(
+            posts[0][1]['data'],
+            '/rainbarrel/rain%20drop\n/rainbarrel/busy',
+        )
+        self.assertEqual(posts[1][1]['data'], '/rainbarrel/hail')
+        self.assertEqual(self._requests('DELETE'), [])
+        self.assertEqual(data, {'deleted': 2, 'not-found': 0, 'failed': 1})
+
+    def test_delete_objects_no_middleware(self):
+        # The cluster does not say, the first bulk request finds out
+        self.info = None
+        self.bulk = False
+
+        data = self._delete(['drop', 'busy', 'gone'], bulk=True)
+
+        self.assertEqual(len(self._requests('POST')), 1)
+        self.assertEqual(
+            sorted(c[0][1] for c in self._requests('DELETE')),
+            [
+                fake_url + '/rainbarrel/busy',
+                fake_url + '/rainbarrel/drop',
+                fake_url + '/rainbarrel/gone',
+            ],
+        )
+        self.assertEqual(data, {'deleted': 1, 'not-found': 1, 'failed': 1})
+
+    def test_delete_objects(self):
+        data = self._delete(['drop', 'hail'], workers=2)
+
+        self.assertEqual(self._requests('GET'), [])
+        self.assertEqual(self._requests('POST'), [])
+        self.assertEqual(len(self._requests('DELETE')), 2)
+        self.assertEqual(data, {'deleted': 2, 'not-found': 0, 'failed': 0})
+
+    def test_delete_objects_reserved_chars(self):
+        self._delete(['a#b', 'a?b', '100%25'], bulk=False)
+
+        self.assertEqual(
+            sorted(c[0][1] for c in self._requests('DELETE')),
+            [
+                fake_url + '/rainbarrel/100%2525',
+                fake_url + '/rainbarrel/a%23b',
+                fake_url + '/rainbarrel/a%3Fb',
+            ],
+        )
+
+
+class TestObjectUsage(TestObject):
+
+    def setUp(self):
+        super(TestObjectUsage, self).setUp()
+        self.app.restapi.request.side_effect = fake_listing([
+            'top', 'a/1', 'a/2', 'a/b/1', 'a/b/c/1', 'a/b/c/22', 'a/d/1',
+            'e/1',
+        ])
+
+    def _usage(self, **kwargs):
+        return list(lib_object.object_usage(
+            self.app.restapi,
+            self.app.client_manager.object.endpoint,
+            fake_container,
+            workers=3,
+            **kwargs
+        ))
+
+    def test_object_usage(self):
+        rows = self._usage()
+
+        self.assertEqual(sorted(rows[:-1]), [
+            ('a/', 6, 31),
+            ('a/b/', 3, 20),
+            ('a/b/c/', 2, 15),
+            ('a/d/', 1, 5),
+            ('e/', 1, 3),
+        ])
+        # Subtrees come before the directories holding them
+        self.assertTrue(rows.index(('a/b/c/', 2, 15)) <
+                        rows.index(('a/b/', 3, 20)) <
+                        rows.index(('a/', 6, 31)))
+        self.assertEqual(rows[-1], ('', 8, 37))
+
+    def test_object_usage_depth(self):
+        rows = self._usage(prefix='a/', depth=1)
+
+        self.assertEqual(sorted(rows[:-1]), [
+            ('a/b/', 3, 20),
+            ('a/d/', 1, 5),
+        ])
+        self.assertEqual(rows[-1], ('a/', 6, 31))
+        # The pseudo-directories at the depth are listed as a whole
+        self.assertFalse([
+            c for c in self.app.restapi.request.call_args_list
+            if 'prefix=a/b/c/' in c[0][1]
+        ])
+
+    def test_object_usage_error(self):
+        self.app.restapi.request.side_effect = requests.HTTPError('gone')
+
+        self.assertRaises(requests.HTTPError, self._usage)
@@ -13,8 +13,11 @@
 #   under the License.
 #
 
+import fixtures
+import json
 import mock
 import os
+import requests
 
 from openstackclient import shell
 from openstackclient.tests import utils
@@ -273,6 +276,224 @@ class TestShellTokenAuth(TestShell):
         self._assert_token_auth(flag, kwargs)
 
 
+class TestShellClientManagers(utils.TestCase):
+    def setUp(self):
+        super(TestShellClientManagers, self).setUp()
+        self.shell = make_shell()
+        self.shell.options = mock.Mock(
+            os_token=DEFAULT_TOKEN,
+            os_url=DEFAULT_SERVICE_URL,
+            os_auth_url=None,
+            os_project_name=None,
+            os_project_id=None,
+            os_username=None,
+            os_password=None,
+            os_region_name=None,
+            os_auth_cache=False,
+        )
+        self.shell.api_version = {"compute": DEFAULT_COMPUTE_API_VERSION}
+        self.shell.http_adapter = mock.Mock()
+        self.shell.retry_policy = mock.Mock()
+        patch = mock.patch("openstackclient.common.clientmanager."
+                           "ClientManager")
+        self.cm_class = patch.start()
+        self.addCleanup(patch.stop)
+
+    def _authenticate(self):
+        self.cm_class.return_value = mock.Mock(auth_ref=None)
+        self.shell.authenticate_user()
+        return self.shell.client_manager
+
+    def test_reuse_client_manager(self):
+        first = self._authenticate()
+        self.assertEqual(self._authenticate(), first)
+        self.assertEqual(self.cm_class.call_count, 1)
+
+    def test_credentials_not_shared(self):
+        first = self._authenticate()
+        self.shell.options.os_token = "other-token"
+        self.assertNotEqual(self._authenticate(), first)
+        self.assertEqual(self.cm_class.call_count, 2)
+
+    def test_expiring_token_not_reused(self):
+        first = self._authenticate()
+        first.auth_ref = mock.Mock()
+        first.auth_ref.will_expire_soon.return_value = True
+        self.assertNotEqual(self._authenticate(), first)
+
+    def test_rejected_cached_token(self):
+        first = self._authenticate()
+        first.drop_cached_token.return_value = True
+        self.shell.restapi = mock.Mock()
+        cmd = mock.Mock()
+        cmd.run.side_effect = [
+            requests.HTTPError(response=mock.Mock(status_code=401)),
+            0,
+        ]
+        run = cmd.run
+
+        self.shell._retry_rejected_token(cmd)
+        self.cm_class.return_value = mock.Mock(auth_ref=None)
+        self.assertEqual(cmd.run('args'), 0)
+
+        first.drop_cached_token.assert_called_once_with()
+        self.assertEqual(run.call_count, 2)
+        self.assertNotEqual(self.shell.client_manager, first)
+        self.shell.restapi.set_auth.assert_called_with(
+            self.shell.client_manager._token)
+
+    def test_rejected_token_not_cached(self):
+        first = self._authenticate()
+        first.drop_cached_token.return_value = False
+        cmd = mock.Mock()
+        cmd.run.side_effect = requests.HTTPError(
+            response=mock.Mock(status_code=401))
+        run = cmd.run
+
+        self.shell._retry_rejected_token(cmd)
+
+        self.assertRaises(requests.HTTPError, cmd.run, 'args')
+        self.assertEqual(run.call_count, 1)
+        self.assertEqual(self.shell.client_manager, first)
+
+
+class TestShellResolutionCache(utils.TestCase):
+    def setUp(self):
+        super(TestShellResolutionCache, self).setUp()
+        self.shell = make_shell()
+        self.shell.options = mock.Mock(
+            os_auth_url=DEFAULT_AUTH_URL,
+            os_project_id=None,
+            os_project_name=DEFAULT_PROJECT_NAME,
+            os_region_name=DEFAULT_REGION_NAME,
+            os_resolution_cache_ttl=60,
+            no_cache=False,
+        )
+        patch = mock.patch("openstackclient.common.utils."
+                           "set_resolution_cache")
+        self.set_cache = patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_show_uses_cache(self):
+        class ShowServer(object):
+            pass
+
+        self.shell.configure_resolution_cache(ShowServer())
+        self.set_cache.assert_called_with(
+            self.shell.resolution_cache,
+            scope=(DEFAULT_AUTH_URL, DEFAULT_PROJECT_NAME,
+                   DEFAULT_REGION_NAME),
+            invalidate=False,
+        )
+        self.assertEqual(self.shell.resolution_cache.ttl, 60)
+
+    def test_delete_invalidates(self):
+        class DeleteServer(object):
+            pass
+
+        self.shell.configure_resolution_cache(DeleteServer())
+        self.assertTrue(self.set_cache.call_args[1]['invalidate'])
+
+    def test_no_cache(self):
+        self.shell.options.no_cache = True
+        self.shell.configure_resolution_cache(object())
+        self.set_cache.assert_called_with(None)
+
+
+class TestShellBatch(utils.TestCase):
+    def setUp(self):
+        super(TestShellBatch, self).setUp()
+        path = self.useFixture(fixtures.TempDir()).path
+        self.batch_file = os.path.join(path, 'batch')
+        with open(self.batch_file, 'w') as f:
+            f.write("# comment\n"
+                    "server show 'my server'\n"
+                    "\n"
+                    "server show missing\n"
+                    "server show 'unbalanced\n")
+
+        def run_subcommand(argv):
+            if argv[-1] == '--bad-option':
+                raise SystemExit(2)
+            if argv[-1] == 'missing':
+                self.shell.last_error = Exception('No server with that name')
+                return 1
+            self.shell.stdout.write('name: %s\n' % argv[-1])
+            return 0
+
+        self.shell = make_shell()
+        self.shell.stdout = mock.Mock()
+        self.run_subcommand = mock.Mock(side_effect=run_subcommand)
+        self.shell.run_subcommand = self.run_subcommand
+
+        def find_command(argv):
+            if argv[0] != 'server':
+                raise ValueError('Unknown command %r' % argv)
+            return None, 'server ' + argv[1], argv[2:]
+
+        self.shell.command_manager.find_command = mock.Mock(
+            side_effect=find_command)
+        patch = mock.patch(
+            "openstackclient.shell.OpenStackShell.initialize_app")
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def _output(self):
+        return ''.join(c[0][0] for c in self.shell.stdout.write.call_args_list)
+
+    def test_batch_plain(self):
+        result = self.shell.run(['--batch', self.batch_file])
+
+        self.assertEqual(result, 1)
+        self.run_subcommand.assert_any_call(['server', 'show', 'my server'])
+        self.assertEqual(self.run_subcommand.call_count, 2)
+        self.assertEqual(
+            self._output(),
+            "name: my server\n"
+            "--- [2] exit 0: server show 'my server'\n"
+            "--- [4] exit 1: server show missing\n"
+            "--- [5] exit 2: server show 'unbalanced\n",
+        )
+
+    def test_batch_json(self):
+        self.shell.run(['--batch', self.batch_file, '--batch-format', 'json'])
+
+        results = [json.loads(l) for l in self._output().splitlines()]
+        self.assertEqual([r['line'] for r in results], [2, 4, 5])
+        self.assertEqual([r['status'] for r in results], [0, 1, 2])
+        self.assertEqual(results[0]['output'], 'name: my server\n')
+        self.assertEqual(results[0]['error'], None)
+        self.assertEqual(results[1]['error'], 'No server with that name')
+
+    def test_batch_stdin(self):
+        self.shell.stdin = ['server show a\n', 'server show b\n']
+        self.assertEqual(self.shell.run(['--batch', '-']), 0)
+        self.assertEqual(self.run_subcommand.call_count, 2)
+
+    def test_batch_bad_arguments(self):
+        self.shell.stdin = ['server show --bad-option\n', 'server show a\n']
+        self.assertEqual(self.shell.run(['--batch', '-']), 1)
+        self.assertEqual(self.run_subcommand.call_count, 2)
+        self.assertIn("--- [1] exit 2: server show --bad-option\n",
+                      self._output())
+
+    def test_batch_unknown_command(self):
+        self.shell.stdin = ['sever show a\n']
+        self.assertEqual(self.shell.run(['--batch', '-',
+                                         '--batch-format', 'json']), 1)
+        self.assertFalse(self.run_subcommand.called)
+        result = json.loads(self._output())
+        self.assertEqual(result['status'], 2)
+        self.assertEqual(result['error'], 'unknown command')
+
+    def test_batch_bad_arguments_error(self):
+        self.shell.stdin = ['server show --bad-option\n']
+        self.shell.run(['--batch', '-', '--batch-format', 'json'])
+        result = json.loads(self._output())
+        self.assertEqual(result['status'], 2)
+        self.assertIsNone(result['error'])
+
+
 class TestShellCli(TestShell):
     def setUp(self):
         super(TestShellCli, self).setUp()
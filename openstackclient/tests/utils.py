@@ -37,6 +37,13 @@ class TestCase(testtools.TestCase):
             stderr = self.useFixture(fixtures.StringStream("stderr")).stream
             self.useFixture(fixtures.MonkeyPatch("sys.stderr", stderr))
 
+        # Keep the command index out of the user's home directory
+        self.useFixture(fixtures.MonkeyPatch(
+            "openstackclient.common.commandmanager.COMMAND_INDEX_FILE",
+            os.path.join(self.useFixture(fixtures.TempDir()).path,
+                         "command-index.json"),
+        ))
+
     # 2.6 doesn't have the assert dict equals so make sure that it exists
     if tuple(sys.version_info)[0:2] < (2, 7):
 
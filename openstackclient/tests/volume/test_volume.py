@@ -22,6 +22,7 @@ from openstackclient.volume import client as volume_client
 
 AUTH_TOKEN = "foobar"
 AUTH_URL = "http://0.0.0.0"
+VOLUME_URL = "http://0.0.0.0:8776/v1/project"
 
 
 class FakeClient(object):
@@ -49,3 +50,56 @@ class TestVolume(utils.TestCase):
     def test_make_client(self):
         self.assertEqual(self.cm.volume.client.auth_token, AUTH_TOKEN)
         self.assertEqual(self.cm.volume.client.auth_url, AUTH_URL)
+
+    def test_make_client_token_flow(self):
+        client = volume_client.make_client(self.cm)
+        self.assertEqual(client.client.management_url, AUTH_URL)
+        self.assertEqual(client.client.auth_token, AUTH_TOKEN)
+
+
+class TestVolumePasswordFlow(utils.TestCase):
+    def setUp(self):
+        super(TestVolumePasswordFlow, self).setUp()
+
+        volume_client.API_VERSIONS = {
+            "1": "openstackclient.tests.volume.test_volume.FakeClient"
+        }
+
+        self.auth_ref = mock.Mock()
+        self.auth_ref.auth_token = AUTH_TOKEN
+        self.auth_cache = mock.Mock()
+        self.auth_cache.get.return_value = self.auth_ref
+
+    def _make_client_manager(self, region_name=None):
+        return clientmanager.ClientManager(
+            auth_url=AUTH_URL,
+            username='user',
+            password='pass',
+            project_name='project',
+            region_name=region_name,
+            api_version={"volume": "1"},
+            auth_cache=self.auth_cache,
+        )
+
+    def test_make_client_reuses_token(self):
+        catalog = self.auth_ref.service_catalog
+        catalog.url_for.return_value = VOLUME_URL
+
+        client = volume_client.make_client(self._make_client_manager())
+        self.assertEqual(client.client.management_url, VOLUME_URL)
+        self.assertEqual(client.client.auth_token, AUTH_TOKEN)
+        self.assertEqual(client.client.service_catalog, catalog)
+        catalog.url_for.assert_called_with(service_type='volume')
+
+    def test_make_client_region(self):
+        catalog = self.auth_ref.service_catalog
+        catalog.url_for.return_value = VOLUME_URL
+
+        client = volume_client.make_client(
+            self._make_client_manager(region_name='r2'))
+        self.assertEqual(client.client.management_url, VOLUME_URL)
+        catalog.url_for.assert_called_with(
+            service_type='volume',
+            attr='region',
+            filter_value='r2',
+        )
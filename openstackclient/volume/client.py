@@ -40,6 +40,18 @@ def make_client(instance):
         api_key=instance._password,
         project_id=instance._project_name,
         auth_url=instance._auth_url,
+        region_name=instance._region_name,
+        service_type=API_NAME,
     )
 
+    # Populate the Cinder client to skip another auth query to Identity
+    if instance._url:
+        # token flow
+        client.client.management_url = instance._url
+    else:
+        # password flow
+        client.client.management_url = instance.get_endpoint_for_service_type(
+            API_NAME)
+        client.client.service_catalog = instance._service_catalog
+    client.client.auth_token = instance._token
     return client
@@ -0,0 +1,112 @@
+#   Copyright 2013 OpenStack Foundation
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may
+#   not use this file except in compliance with the License. You may obtain
+#   a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+#
+
+"""
+Measure command loading time with and without the command index
+
+Each sample runs in a fresh interpreter so the pkg_resources metadata
+caches are cold, just like a real 'openstack' invocation.  Run it from an
+environment where python-openstackclient is installed:
+
+    $ python tools/bench_command_index.py [-n <runs>]
+"""
+
+import optparse
+import os
+import subprocess
+import sys
+import tempfile
+
+
+# The command groups OpenStackShell.initialize_app() registers by default
+GROUPS = [
+    'openstack.cli',
+    'openstack.compute.v2',
+    'openstack.identity.v2_0',
+    'openstack.image.v1',
+    'openstack.object_store.v1',
+    'openstack.volume.v1',
+    'openstack.common',
+    'openstack.extension',
+]
+
+SAMPLE = """
+import sys, time
+start = time.time()
+from openstackclient.common import commandmanager
+loaded = time.time()
+index = %(index)s
+mgr = commandmanager.CommandManager(%(groups)r[0], command_index=index)
+for group in %(groups)r[1:]:
+    mgr.add_command_group(group)
+sys.stdout.write('%%f %%f %%d' %% (
+    loaded - start, time.time() - loaded, len(mgr.commands)))
+"""
+
+
+def sample(index):
+    """Return (import time, command loading time, command count)"""
+    code = SAMPLE % {'index': index, 'groups': GROUPS}
+    out = subprocess.Popen(
+        [sys.executable, '-c', code],
+        stdout=subprocess.PIPE,
+    ).communicate()[0]
+    imported, elapsed, count = out.split()
+    return float(imported), float(elapsed), int(count)
+
+
+def report(name, samples):
+    imports = sorted(s[0] for s in samples)
+    loads = sorted(s[1] for s in samples)
+    median = len(samples) // 2
+    print('%-20s load: min %7.1fms median %7.1fms  '
+          '(imports: median %7.1fms)' % (
+              name, loads[0] * 1000, loads[median] * 1000,
+              imports[median] * 1000))
+
+
+def main(argv):
+    parser = optparse.OptionParser()
+    parser.add_option('-n', '--runs', type='int', default=10)
+    options, args = parser.parse_args(argv)
+
+    fd, path = tempfile.mkstemp(suffix='.json')
+    os.close(fd)
+    os.unlink(path)
+    try:
+        index = 'commandmanager.CommandIndex(%r)' % path
+
+        # Build the index once, then time the warm path
+        imported, elapsed, indexed_count = sample(index)
+        print('index build: %.1fms, %d commands' % (
+            elapsed * 1000, indexed_count))
+        indexed = [sample(index) for i in range(options.runs)]
+
+        scanned = [sample('False') for i in range(options.runs)]
+        scanned_count = scanned[0][2]
+        if scanned_count != indexed_count:
+            print('WARNING: scan found %d commands, index %d' % (
+                scanned_count, indexed_count))
+    finally:
+        for p in (path, path + '.lock'):
+            if os.path.exists(p):
+                os.unlink(p)
+
+    report('pkg_resources scan', scanned)
+    report('command index', indexed)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])